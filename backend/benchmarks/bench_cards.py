@@ -0,0 +1,58 @@
+"""
+Measure the memory of dealt spell cards, against the original layout.
+
+Cards used to carry every attribute of their type in their own instance
+dictionary. They now only hold their ``card_id`` and ``owner`` in slots,
+and share one ``CardType`` record per kind of card.
+
+Usage:
+    python -m benchmarks.bench_cards
+"""
+import tracemalloc
+from dataclasses import dataclass, field
+
+from sorcerer.game.cards import Firebolt
+from sorcerer.game.interface import EffectDef, TargetKind, effect
+
+CARDS = 100_000
+
+
+@dataclass(frozen=True)
+class OriginalFirebolt:
+    """
+    The original layout of a card, with the attributes of its type in its instance dictionary.
+    """
+
+    card_id: int
+    spell_id: str = "card_firebolt"
+    spell_kind: str = "direct"
+    forbidden: bool = False
+    effect_defs: tuple[EffectDef, ...] = (effect("Power", power=-5),)
+    owner: int | None = None
+    target: TargetKind = field(default=TargetKind.MONSTER)
+
+
+def measure(card_type: type) -> float:
+    """
+    Bytes allocated per card, for a deck of ``CARDS`` cards.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    deck = [card_type(card_id) for card_id in range(CARDS)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+
+    assert len(deck) == CARDS
+    return (after - before) / CARDS
+
+
+def main() -> None:
+    before = measure(OriginalFirebolt)
+    after = measure(Firebolt)
+
+    print(f"Original layout:    {before:>8.1f} bytes/card")
+    print(f"Shared card types:  {after:>8.1f} bytes/card ({before / after:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main()
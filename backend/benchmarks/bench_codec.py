@@ -0,0 +1,46 @@
+"""
+Compare the size and cost of game views encoded as JSON and as MessagePack.
+
+Usage:
+    python -m benchmarks.bench_codec
+"""
+import timeit
+
+import msgpack
+
+from benchmarks.bench_serialize import make_game
+from sorcerer import encoding
+from sorcerer.codec import JSON, MsgpackCodec, expand
+
+NUMBER = 2000
+
+
+def bench(name: str, func) -> float:
+    seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+    per_call = seconds / NUMBER * 1_000_000
+    print(f"{name:<32} {per_call:>10.1f} us/call")
+    return per_call
+
+
+def main() -> None:
+    game = make_game()
+    message = {"kind": "state", "version": 1, "game": game.get_view(0, join_key=True).to_dict()}
+    codec = MsgpackCodec()
+
+    json_message = JSON.encode(message)
+    msgpack_message = codec.encode(message)
+    json_size = len(json_message.encode("utf-8"))
+    print(f"{'JSON size':<32} {json_size:>10d} bytes")
+    for label, size in [("MessagePack size", len(msgpack_message)), ("  without tables", len(msgpack.packb(message)))]:
+        print(f"{label:<32} {size:>10d} bytes ({size / json_size:.0%})")
+    print()
+
+    bench("JSON encode", lambda: JSON.encode(message))
+    bench("MessagePack encode", lambda: codec.encode(message))
+    bench("  without tables", lambda: msgpack.packb(message))
+    bench("JSON decode", lambda: encoding.loads(json_message))
+    bench("MessagePack decode", lambda: expand(msgpack.unpackb(msgpack_message)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Measure dealing hands, against the original one card at a time algorithm.
+
+Usage:
+    python -m benchmarks.bench_deal
+"""
+import itertools
+import timeit
+
+from sorcerer.game.cards import Firebolt
+from sorcerer.game.game_session import CardLocation, GameSession
+
+NUMBER = 2000
+REPEAT = 5
+PLAYER_COUNTS = [2, 4, 6, 10]
+HAND_SIZES = [5, 8, 20]
+
+
+def deal_one_by_one(game: GameSession, hand_size: int) -> None:
+    """
+    The original dealing algorithm, drawing one card at a time.
+    """
+    players = game.players.copy()
+    index = 0
+
+    while players:
+        if not game.spells:
+            break
+
+        player = players[index]
+
+        if player.card_count < hand_size:
+            spell_card = game.try_draw_spell()
+            if spell_card:
+                player.cards.append(spell_card)
+                game._card_locations[spell_card.card_id] = CardLocation(spell_card, player)
+            index += 1
+        else:
+            players.remove(player)
+
+        if players:
+            index = index % len(players)
+
+
+def make_table(players: int, hand_size: int) -> GameSession:
+    game = GameSession("****", seed=0)
+    for index in range(players):
+        game.create_new_player(is_leader=index == 0)
+
+    count = itertools.count()
+    game.spells = [Firebolt(next(count)) for _ in range(players * hand_size)]
+    return game
+
+
+def measure(deal, players: int, hand_size: int) -> float:
+    best = float("inf")
+    for _ in range(REPEAT):
+        tables = iter([make_table(players, hand_size) for _ in range(NUMBER)])
+        best = min(best, timeit.timeit(lambda: deal(next(tables), hand_size), number=NUMBER) / NUMBER)
+    return best
+
+
+def main() -> None:
+    print("Players  Hand    one by one us    sliced us  Speedup")
+    for players, hand_size in itertools.product(PLAYER_COUNTS, HAND_SIZES):
+        before = measure(deal_one_by_one, players, hand_size)
+        after = measure(GameSession.deal_cards, players, hand_size)
+        print(f"{players:>7} {hand_size:>5} {before * 1e6:>16.1f} {after * 1e6:>12.1f} {before / after:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
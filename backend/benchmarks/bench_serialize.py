@@ -0,0 +1,50 @@
+"""
+Compare the precompiled serializers with ``dataclasses.asdict``.
+
+Usage:
+    python -m benchmarks.bench_serialize
+"""
+import timeit
+from dataclasses import asdict
+
+from sorcerer.game.cards import Firebolt
+from sorcerer.game.game_session import GameSession
+from sorcerer.serialize import to_dict
+from sorcerer.util import asdict_factory
+
+NUMBER = 2000
+
+
+def make_game() -> GameSession:
+    game = GameSession("****", seed=1)
+    for index in range(4):
+        game.create_new_player(is_leader=index == 0)
+    game.begin_game()
+
+    # Simulate a few fight rounds worth of spells attached to monsters
+    for index, monster in enumerate(game.monsters * 3):
+        monster.cards.append(Firebolt(100 + index, owner=0))
+        game.move("card_append", card_id=100 + index, monster_id=monster.monster_id)
+
+    return game
+
+
+def bench(name: str, func) -> float:
+    seconds = min(timeit.repeat(func, number=NUMBER, repeat=5))
+    per_call = seconds / NUMBER * 1_000_000
+    print(f"{name:<32} {per_call:>10.1f} us/call")
+    return per_call
+
+
+def main() -> None:
+    game = make_game()
+    view = game.get_view(0, join_key=True)
+
+    for label, obj in [("GameView", view), ("GameSession", game)]:
+        before = bench(f"{label} asdict", lambda: asdict(obj, dict_factory=asdict_factory))
+        after = bench(f"{label} serialize", lambda: to_dict(obj))
+        print(f"{label} speedup: {before / after:.1f}x\n")
+
+
+if __name__ == "__main__":
+    main()
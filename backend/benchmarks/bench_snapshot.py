@@ -0,0 +1,33 @@
+"""
+Measure the size of session snapshots, and the time to write and restore them.
+
+Usage:
+    python -m benchmarks.bench_snapshot
+"""
+import json
+import timeit
+
+from benchmarks.bench_serialize import make_game
+from sorcerer.game.snapshot import dump_session, load_session
+
+NUMBER = 2000
+SESSIONS = 5000
+
+
+def main() -> None:
+    game = make_game()
+    data = dump_session(game)
+
+    print(f"Snapshot size:      {len(data):>8} bytes")
+    print(f"JSON size:          {len(json.dumps(game.to_dict())):>8} bytes")
+
+    dump = min(timeit.repeat(lambda: dump_session(game), number=NUMBER, repeat=5)) / NUMBER
+    load = min(timeit.repeat(lambda: load_session(data), number=NUMBER, repeat=5)) / NUMBER
+
+    print(f"dump_session:       {dump * 1_000_000:>8.1f} us/session")
+    print(f"load_session:       {load * 1_000_000:>8.1f} us/session")
+    print(f"{SESSIONS} sessions:     {dump * SESSIONS * 1000:>8.1f} ms, {len(data) * SESSIONS / 1024:.0f} KiB")
+
+
+if __name__ == "__main__":
+    main()
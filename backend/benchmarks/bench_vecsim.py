@@ -0,0 +1,31 @@
+"""
+Compare the throughput of the object based and vectorized simulation engines.
+
+Usage:
+    python -m benchmarks.bench_vecsim
+"""
+import time
+
+from sorcerer import sim, vecsim
+
+POLICIES = ["random", "saboteur", "random", "random"]
+OBJECT_GAMES = 2_000
+VECTOR_GAMES = 1_000_000
+
+
+def main() -> None:
+    start = time.perf_counter()
+    sim.run_batch(OBJECT_GAMES, POLICIES, workers=1)
+    objects = OBJECT_GAMES / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    vecsim.run_batch(VECTOR_GAMES, POLICIES)
+    vectors = VECTOR_GAMES / (time.perf_counter() - start)
+
+    print(f"Object engine:      {objects:>12.0f} games/s")
+    print(f"Vectorized engine:  {vectors:>12.0f} games/s")
+    print(f"Speedup:            {vectors / objects:>12.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,15 @@ setup(
     description="Description of my package",
     packages=find_packages(),
     install_requires=[],
-    entrypoints={
+    extras_require={
+        "msgpack": ["msgpack"],
+        "orjson": ["orjson"],
+        "uvloop": ["uvloop"],
+    },
+    entry_points={
         "console_scripts": [
             "sorcerer-client = sorcerer.cli:main",
+            "sorcerer-server = sorcerer.server:run",
         ],
     },
 )
@@ -0,0 +1,88 @@
+"""
+Per-session actors, which apply the messages of a game session one at a time.
+
+Every player's connection only reads messages, and submits them to the
+actor of their session. The actor applies them in the order they were
+submitted, so the mutations of a session are never interleaved, and
+ordering is well defined even when a handler awaits.
+
+CPU heavy work that only reads a session, like bet advice, is offloaded
+to a small pool of worker threads with ``offload``. The session waits for
+it, but the other sessions on the event loop don't.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, TypeVar
+
+logger = logging.getLogger(__name__)
+
+ACTOR_QUEUE_SIZE = int(os.environ.get("SORCERER_ACTOR_QUEUE_SIZE", "256"))
+"""Messages waiting per session. Players that submit more wait, which stops reading their connection."""
+
+OFFLOAD_THREADS = int(os.environ.get("SORCERER_OFFLOAD_THREADS", "2"))
+"""Worker threads for offloaded work. Set it to 0 to run the work on the event loop instead."""
+
+_EXECUTOR = ThreadPoolExecutor(OFFLOAD_THREADS, thread_name_prefix="sorcerer-offload") if OFFLOAD_THREADS > 0 else None
+
+T = TypeVar("T")
+
+Handler = Callable[[Any, Any], Awaitable[None]]
+
+
+async def offload(func: Callable[..., T], *args: Any) -> T:
+    """
+    Run CPU heavy work on a worker thread, when offloading is enabled.
+
+    The work must not mutate any session, since snapshots and journals read sessions from the event loop.
+    """
+    if _EXECUTOR is None:
+        return func(*args)
+    return await asyncio.get_running_loop().run_in_executor(_EXECUTOR, func, *args)
+
+
+class SessionActor:
+    """
+    Applies the messages submitted to one session in order, on a task of its own.
+
+    Arguments:
+        handler: Applies one message, given the client that sent it and the message.
+        size: Messages that can wait to be applied.
+    """
+
+    def __init__(self, handler: Handler, size: int = ACTOR_QUEUE_SIZE) -> None:
+        self.handler = handler
+        self._queue: asyncio.Queue[tuple[Any, Any]] = asyncio.Queue(size)
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def closed(self) -> bool:
+        return self._task.done()
+
+    async def submit(self, client: Any, message: Any) -> None:
+        """
+        Queue a message to be applied after the ones submitted before it. Waits while the queue is full.
+        """
+        if not self.closed:
+            await self._queue.put((client, message))
+
+    def close(self) -> None:
+        """
+        Stop applying messages. Messages still waiting are discarded.
+        """
+        self._task.cancel()
+
+    async def _run(self) -> None:
+        while True:
+            client, message = await self._queue.get()
+            try:
+                await self.handler(client, message)
+            except Exception:  # pylint: disable=broad-except
+                # One broken message must not stop the whole session
+                logger.exception("Failed to apply message: %r", message)
@@ -0,0 +1,279 @@
+"""
+Monte Carlo bet advice.
+
+Estimates each monster's chance of winning the fight from a player's view
+of the game. The cards the player can't see, in the other players' hands
+and in the deck, are sampled at random from the cards left over, and the
+remaining rounds are played out with every player casting random spells.
+
+Sampling is anytime: it runs until a time budget is used up, and the
+tallies are cached by game state, so asking again for the same state
+keeps refining the same estimate instead of starting over.
+"""
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import Hashable
+
+from sorcerer.game.cards import Card, get_card_types, get_standard_deck
+from sorcerer.game.effects import breaks_rules, card_effects, judge_effect, monster_effects
+from sorcerer.game.game_session import MAX_ROUNDS, GameView, hand_size
+
+BUDGET = 0.005
+"""Default time budget in seconds."""
+
+BATCH = 16
+"""Number of playouts between checks of the time budget."""
+
+MAX_SAMPLES = 20_000
+"""Estimates stop being refined after this many playouts."""
+
+CACHE_SIZE = 1024
+"""Number of game states to keep estimates for."""
+
+_RNG = random.Random()
+
+
+@dataclass
+class MonsterAdvice:
+    monster_id: str
+    win_probability: float
+    expected_prize: float
+
+
+@dataclass
+class Advice:
+    samples: int
+    monsters: list[MonsterAdvice] = field(default_factory=list)
+
+    def best(self, count: int = 1) -> list[str]:
+        """
+        The IDs of the monsters with the highest expected prize.
+        """
+        ranked = sorted(self.monsters, key=lambda monster: monster.expected_prize, reverse=True)
+        return [monster.monster_id for monster in ranked[:count]]
+
+
+@dataclass
+class _Tally:
+    samples: int
+    wins: list[float]
+
+
+class BetAdvisor:
+    """
+    Estimates monster win probabilities, with a cache of the estimates per game state.
+
+    Advice can be asked from several threads at once. Each one samples its own copy of a cached estimate.
+    """
+
+    def __init__(self, cache_size: int = CACHE_SIZE) -> None:
+        self.cache_size = cache_size
+        self._cache: OrderedDict[Hashable, _Tally] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def advise(
+        self,
+        view: GameView,
+        *,
+        budget: float | None = BUDGET,
+        samples: int | None = None,
+        rng: random.Random | None = None,
+    ) -> Advice:
+        """
+        Estimate the win probability and expected prize of every monster in the view.
+
+        Arguments:
+            view: The game as seen by the player asking for advice.
+            budget: Seconds to spend sampling. ``None`` for no time limit.
+            samples: Number of playouts to add to the estimate. ``None`` to sample until the budget is used up.
+            rng: Random generator, for reproducible advice. Defaults to the ``random`` module.
+        """
+        if not view.monsters:
+            return Advice(samples=0)
+
+        rng = rng or _RNG
+        key = _state_key(view)
+        with self._lock:
+            cached = self._cache.get(key)
+        if cached is None:
+            tally = _Tally(samples=0, wins=[0.0] * len(view.monsters))
+        else:
+            tally = _Tally(samples=cached.samples, wins=cached.wins.copy())
+
+        playout = _Playout(view)
+        deadline = time.perf_counter() + budget if budget is not None else None
+        target = min(MAX_SAMPLES, tally.samples + samples) if samples is not None else MAX_SAMPLES
+
+        while tally.samples < target:
+            for _ in range(min(BATCH, target - tally.samples)):
+                winners = playout.run(rng)
+                for index in winners:
+                    tally.wins[index] += 1.0 / len(winners)
+                tally.samples += 1
+
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+
+        if self.cache_size > 0:
+            with self._lock:
+                self._cache[key] = tally
+                self._cache.move_to_end(key)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        return _advice(view, tally)
+
+
+def _advice(view: GameView, tally: _Tally) -> Advice:
+    samples = max(tally.samples, 1)
+    return Advice(
+        samples=tally.samples,
+        monsters=[
+            MonsterAdvice(
+                monster_id=monster.monster_id,
+                win_probability=wins / samples,
+                expected_prize=wins / samples * monster.prize,
+            )
+            for monster, wins in zip(view.monsters, tally.wins)
+        ],
+    )
+
+
+def _state_key(view: GameView) -> Hashable:
+    """
+    Everything the estimate depends on: the public game state, and the player's own hand.
+    """
+    return (
+        view.judge.judge_id if view.judge is not None else None,
+        view.game_phase,
+        view.game_round,
+        view.deck_count,
+        view.discard_count,
+        tuple(
+            (monster.monster_id, monster.health, tuple(card.spell_id for card in monster.cards))
+            for monster in view.monsters
+        ),
+        tuple(sorted(card.spell_id for card in view.cards)),
+        tuple(sorted(other.card_count for other in view.others)),
+    )
+
+
+class _Playout:
+    """
+    The parts of a game view that are the same for every sample.
+
+    Cards are represented by the index of their type, so playouts don't allocate card objects.
+    """
+
+    def __init__(self, view: GameView) -> None:
+        card_types = get_card_types()
+        type_index = {card_type: index for index, card_type in enumerate(card_types)}
+        samples = [card_type(-1) for card_type in card_types]
+
+        def index_of(cards: list[Card]) -> list[int]:
+            return [type_index[type(card)] for card in cards]
+
+        self.power = [sum(effect.round_power() for effect in card_effects(card)) for card in samples]
+        self.direct = [card.spell_kind == "direct" for card in samples]
+        self.judge = view.judge
+        self.judgement = judge_effect(view.judge) if view.judge is not None else None
+        self.illegal = [view.judge is not None and breaks_rules(view.judge, card) for card in samples]
+
+        self.start_health = [monster.health for monster in view.monsters]
+        self.start_attached = [index_of(monster.cards) for monster in view.monsters]
+        self.monster_effects = [monster_effects(monster) for monster in view.monsters]
+        self.hand = index_of(view.cards)
+        self.other_hands = [other.card_count for other in view.others]
+        self.deck_count = view.deck_count
+        self.hand_size = hand_size(view.player_count)
+        self.rounds = MAX_ROUNDS - max(view.game_round, 0)  # The game round is -1 until the first fight
+
+        # The cards not seen by the player, are somewhere in the other hands, the deck, or the discard pile.
+        unseen = Counter(index_of(get_standard_deck()))
+        unseen.subtract(self.hand)
+        unseen.subtract(card for cards in self.start_attached for card in cards)
+        self.unseen = [card for card, count in unseen.items() for _ in range(max(count, 0))]
+
+    def run(self, rng: random.Random) -> list[int]:
+        """
+        Play out the rest of the game once, and return the arena positions of the winning monsters.
+        """
+        unseen = self.unseen.copy()
+        rng.shuffle(unseen)
+
+        hands = [self.hand.copy()]
+        for count in self.other_hands:
+            hands.append(unseen[:count])
+            del unseen[:count]
+        deck = unseen[: self.deck_count]
+
+        draw = rng.random
+        health = self.start_health.copy()
+        attached = [cards.copy() for cards in self.start_attached]
+        arena = len(health)
+
+        for round in range(self.rounds):
+            if round > 0:
+                _refill(hands, deck, self.hand_size)
+
+            for hand in hands:
+                if hand:
+                    card = hand.pop(int(draw() * len(hand)))
+                    attached[int(draw() * arena)].append(card)
+
+            for index, cards in enumerate(attached):
+                if cards:
+                    health[index] += self._resolve(index, cards)
+
+        best = max(health)
+        return [index for index, value in enumerate(health) if value == best]
+
+    def _resolve(self, index: int, cards: list[int]) -> int:
+        """
+        Round end of one monster, following ``effects.end_round``. Used up spells are removed from ``cards``.
+        """
+        power, illegal = self.power, self.illegal
+        total = illegal_mana = 0
+        for card in cards:
+            total += power[card]
+            if illegal[card]:
+                illegal_mana += abs(power[card])
+
+        if self.judgement is not None and self.judge is not None and illegal_mana > self.judge.mana_limit:
+            positions = range(len(cards))
+            rejected = set(self.judgement.reject(list(positions), [pos for pos in positions if illegal[cards[pos]]]))
+            total = sum(power[cards[pos]] for pos in positions if pos not in rejected)
+            cards[:] = [cards[pos] for pos in positions if pos not in rejected]
+
+        for effect in self.monster_effects[index]:
+            total = effect.transform_power(total)
+
+        direct = self.direct
+        cards[:] = [card for card in cards if not direct[card]]
+
+        return total
+
+
+def _refill(hands: list[list[int]], deck: list[int], size: int) -> None:
+    """
+    Deal from the deck in turn, until every hand is full or the deck is empty, like ``GameSession.deal_cards``.
+    """
+    while deck and any(len(hand) < size for hand in hands):
+        for hand in hands:
+            if deck and len(hand) < size:
+                hand.append(deck.pop())
+
+
+_ADVISOR = BetAdvisor()
+
+
+def advise(view: GameView, *, budget: float | None = BUDGET) -> Advice:
+    """
+    Bet advice from the shared advisor, and its cache.
+    """
+    return _ADVISOR.advise(view, budget=budget)
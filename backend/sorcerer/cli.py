@@ -1,25 +1,81 @@
 from argparse import ArgumentParser, Namespace
+from typing import Sequence
 
-from sorcerer import client
+from sorcerer import client, loadtest, logs, sim, vecsim
 
 
-def parse_args() -> Namespace:
+def parse_args(argv: Sequence[str] | None = None) -> Namespace:
     parser = ArgumentParser()
+    logs.add_arguments(parser)
 
     subparsers = parser.add_subparsers(dest="command")
     hello_cmd = subparsers.add_parser("hello")
     hello_forever_cmd = subparsers.add_parser("hello-forever")
 
-    return parser.parse_args()
+    sim_cmd = subparsers.add_parser("sim", help="Play games headless, and report statistics")
+    sim_cmd.add_argument("-n", "--games", type=int, default=1000, help="Number of games to play")
+    sim_cmd.add_argument("-w", "--workers", type=int, default=None, help="Worker processes. Defaults to CPU count")
+    sim_cmd.add_argument("-s", "--seed", type=int, default=0, help="Base seed for reproducible batches")
+    sim_cmd.add_argument(
+        "-p",
+        "--policies",
+        nargs="+",
+        choices=sorted(sim.POLICIES),
+        default=["random"] * 4,
+        help="Policy of each seat at the table",
+    )
+    sim_cmd.add_argument(
+        "-e",
+        "--engine",
+        choices=["objects", "vector"],
+        default="objects",
+        help=(
+            "Play games as game sessions, or resolve their fights vectorized with NumPy. "
+            "Both engines play the same games for the same seed"
+        ),
+    )
+
+    load_cmd = subparsers.add_parser("load", help="Generate load against a running server")
+    load_cmd.add_argument("--uri", default="ws://localhost:8765")
+    load_cmd.add_argument("-t", "--tables", type=int, default=100, help="Number of games to play")
+    load_cmd.add_argument("-p", "--players", type=int, default=4, help="Players at each table")
+    load_cmd.add_argument("-s", "--states", type=int, default=10, help="State requests per player")
+    load_cmd.add_argument("-c", "--concurrency", type=int, default=250, help="Tables played at the same time")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "sim" and args.engine == "vector":
+        # The vectorized engine runs in this process, and only knows some policies
+        if args.workers is not None:
+            sim_cmd.error("--workers only applies to the objects engine")
+        unsupported = sorted(set(args.policies) - set(vecsim.VECTOR_POLICIES))
+        if unsupported:
+            sim_cmd.error(f"policies can't be vectorized: {', '.join(unsupported)}")
+
+    return args
 
 
 def main() -> None:
     args = parse_args()
+    listener = logs.configure_from_args(args)
+    try:
+        run(args)
+    finally:
+        listener.stop()
+
 
+def run(args: Namespace) -> None:
     if args.command == "hello":
         client.hello()
     elif args.command == "hello-forever":
         client.hello_forever()
+    elif args.command == "sim":
+        if args.engine == "vector":
+            vecsim.main(args.games, args.policies, seed=args.seed)
+        else:
+            sim.main(args.games, args.policies, seed=args.seed, workers=args.workers)
+    elif args.command == "load":
+        loadtest.main(args.uri, args.tables, args.players, args.states, args.concurrency)
 
 
 if __name__ == "__main__":
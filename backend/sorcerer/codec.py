@@ -0,0 +1,242 @@
+"""
+Wire encodings of the messages sent to clients.
+
+Clients choose an encoding in their ``init`` message. JSON text frames are
+the default. With ``"codec": "msgpack"``, messages are sent as MessagePack
+binary frames instead, with the same shapes as their JSON counterparts.
+MessagePack is an optional dependency.
+
+The binary codec also shortens the values that come from small, fixed
+sets, like message kinds, monster IDs and spell IDs, to their index in a
+table. The tables are sent to the client in a ``codec`` message before
+anything else, so the client doesn't need to know them in advance.
+Values are only shortened under their field's name, so the values that
+view patches set by path are sent in full.
+
+Whatever the codec of a connection, clients may send text frames, which
+are decoded as JSON, or binary frames, which are decoded as MessagePack.
+"""
+from __future__ import annotations
+
+from typing import Any
+
+from sorcerer import encoding, protocol
+from sorcerer.game.cards import SpellKind, get_card_types
+from sorcerer.game.game_session import Phase
+from sorcerer.game.interface import TargetKind
+from sorcerer.game.judges import get_judge_types
+from sorcerer.game.monsters import get_monster_types
+from sorcerer.protocol import Command, Kind, ProtocolError
+
+try:
+    import msgpack  # type: ignore[import-untyped]
+except ImportError:  # pragma: no cover
+    msgpack = None  # type: ignore
+
+Message = str | bytes
+
+
+def _tables() -> dict[str, list[str]]:
+    kinds = [kind.value for kind in Kind] + ["violation"]  # Game rule violations are errors of their own kind
+    # IDs are dataclass fields, so they are read from an instance of each type
+    monsters = [monster_type().monster_id for monster_type in get_monster_types()]
+    spells = [card_type.card_type.spell_id for card_type in get_card_types()]
+    phases = [phase.value for phase in Phase]
+    return {
+        "kind": kinds,
+        "monster_id": monsters,
+        "monster_ids": monsters,
+        "monster_bets": monsters,
+        "spell_id": spells,
+        "spell_kind": list(SpellKind.__args__),  # type: ignore
+        "target": [kind.value for kind in TargetKind],
+        "judge_id": [judge_type().judge_id for judge_type in get_judge_types()],
+        "game_phase": phases,
+    }
+
+
+TABLES = _tables()
+"""Values that the binary codec sends as indexes, per field name. Fields that hold lists are shortened item by item."""
+
+_INDEXES = {field: {value: index for index, value in enumerate(values)} for field, values in TABLES.items()}
+
+
+def compact(obj: Any) -> Any:
+    """
+    Replace the values of the fields in ``TABLES`` with their indexes, at any depth.
+
+    Views are trees of plain dicts and lists, so exact type checks are enough, and they are faster.
+    """
+    kind = type(obj)
+    if kind is dict:
+        result = {}
+        for key, value in obj.items():
+            kind = type(value)
+            if kind is dict:
+                value = compact(value)
+            elif kind is list:
+                index = _INDEXES.get(key)
+                if index is None:
+                    value = [compact(item) for item in value]
+                else:
+                    value = [index.get(item, item) if type(item) is str else item for item in value]
+            elif kind is str:
+                index = _INDEXES.get(key)
+                if index is not None:
+                    value = index.get(value, value)
+            result[key] = value
+        return result
+    if kind is list:
+        return [compact(item) for item in obj]
+    return obj
+
+
+def expand(obj: Any) -> Any:
+    """
+    Reverse of ``compact``. Values that are already strings are left alone.
+    """
+    kind = type(obj)
+    if kind is dict:
+        result = {}
+        for key, value in obj.items():
+            kind = type(value)
+            if kind is dict:
+                value = expand(value)
+            elif kind is list:
+                table = TABLES.get(key)
+                if table is None:
+                    value = [expand(item) for item in value]
+                else:
+                    value = [table[item] if type(item) is int and 0 <= item < len(table) else item for item in value]
+            elif kind is int:
+                table = TABLES.get(key)
+                if table is not None and 0 <= value < len(table):
+                    value = table[value]
+            result[key] = value
+        return result
+    if kind is list:
+        return [expand(item) for item in obj]
+    return obj
+
+
+class Codec:
+    """
+    A wire encoding of messages. The default codec sends JSON text frames, see ``encoding``.
+
+    Messages can be encoded in parts, and the parts spliced together, so the
+    parts that are the same for several clients are only encoded once.
+    """
+
+    name = "json"
+
+    def dumps(self, obj: Any) -> bytes:
+        return encoding.dumps(obj)
+
+    def splice(self, head: dict[str, Any], body: bytes) -> bytes:
+        return encoding.splice(head, body)
+
+    def nest(self, head: dict[str, Any], key: str, body: bytes) -> bytes:
+        return encoding.nest(head, key, body)
+
+    def frame(self, data: bytes) -> Message:
+        return data.decode("utf-8")
+
+    def encode(self, obj: Any) -> Message:
+        return self.frame(self.dumps(obj))
+
+
+class MsgpackCodec(Codec):
+    """
+    Messages as MessagePack binary frames, with compact values.
+
+    Encoded maps are spliced by rewriting their header with the total number of fields.
+    """
+
+    name = "msgpack"
+
+    def dumps(self, obj: Any) -> bytes:
+        return msgpack.packb(compact(obj))
+
+    def splice(self, head: dict[str, Any], body: bytes) -> bytes:
+        head_count, head_fields = _map_fields(self.dumps(head))
+        body_count, body_fields = _map_fields(body)
+        return _map_header(head_count + body_count) + head_fields + body_fields
+
+    def nest(self, head: dict[str, Any], key: str, body: bytes) -> bytes:
+        head_count, head_fields = _map_fields(self.dumps(head))
+        return _map_header(head_count + 1) + head_fields + msgpack.packb(key) + body
+
+    def frame(self, data: bytes) -> Message:
+        return data
+
+
+def _map_header(count: int) -> bytes:
+    if count < 16:
+        return bytes((0x80 | count,))
+    if count < 0x10000:
+        return b"\xde" + count.to_bytes(2, "big")
+    return b"\xdf" + count.to_bytes(4, "big")
+
+
+def _map_fields(data: bytes) -> tuple[int, bytes]:
+    """
+    Split an encoded map into its number of fields, and its encoded fields.
+    """
+    first = data[0]
+    if 0x80 <= first <= 0x8F:
+        return first & 0x0F, data[1:]
+    if first == 0xDE:
+        return int.from_bytes(data[1:3], "big"), data[3:]
+    if first == 0xDF:
+        return int.from_bytes(data[1:5], "big"), data[5:]
+    raise ValueError("Encoded message is not a map")
+
+
+JSON = Codec()
+
+CODECS: dict[str, Codec] = {JSON.name: JSON}
+
+if msgpack is not None:
+    CODECS[MsgpackCodec.name] = MsgpackCodec()
+
+
+def find_codec(name: str | None) -> Codec:
+    """
+    The codec that a client asked for in its ``init`` message.
+    """
+    if name is None:
+        return JSON
+
+    codec = CODECS.get(name)
+    if codec is None:
+        raise ProtocolError(f"Codec is not available: {name}", field="codec")
+    return codec
+
+
+def codec_message(codec: Codec) -> Message:
+    """
+    The first message sent with a binary codec: its tables, which are not themselves compacted.
+    """
+    return codec.frame(msgpack.packb({"kind": Kind.CODEC.value, "codec": codec.name, "tables": TABLES}))
+
+
+def decode_command(message: Message) -> Command:
+    """
+    Decode a message from a client, as JSON when it is text, or as MessagePack when it is binary.
+    """
+    if isinstance(message, str) or message[:1] == b"{":
+        return protocol.decode(message)
+
+    protocol.check_size(message)
+    if msgpack is None:
+        raise ProtocolError("Binary messages are not supported", code="malformed")
+
+    try:
+        data = msgpack.unpackb(message)
+    except (ValueError, TypeError, msgpack.UnpackException):
+        raise ProtocolError("Message is not valid MessagePack", code="malformed") from None
+
+    if not isinstance(data, dict):
+        raise ProtocolError("Message must be a map", code="malformed")
+
+    return protocol.decode_data(expand(data))
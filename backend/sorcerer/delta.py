@@ -0,0 +1,139 @@
+"""
+Structured differences between JSON documents.
+
+Used to push incremental game state updates to clients, instead of
+sending the whole game view every time. Patches follow the shape of
+JSON Patch (RFC 6902), limited to the ``add``, ``remove`` and ``replace``
+operations.
+"""
+from __future__ import annotations
+
+from copy import deepcopy
+from dataclasses import dataclass
+from typing import Any
+
+Patch = list[dict[str, Any]]
+
+
+def diff(old: Any, new: Any, path: str = "") -> Patch:
+    """
+    Compute the operations that transform the ``old`` document into the ``new`` document.
+
+    Operations must be applied in order. List elements that are removed
+    are removed from the back, so indices of earlier operations stay valid.
+    """
+    ops: Patch = []
+    _diff(old, new, path, ops)
+    return ops
+
+
+def _diff(old: Any, new: Any, path: str, ops: Patch) -> None:
+    if isinstance(old, dict) and isinstance(new, dict):
+        for key, old_value in old.items():
+            key_path = f"{path}/{_escape(key)}"
+            if key not in new:
+                ops.append({"op": "remove", "path": key_path})
+            else:
+                _diff(old_value, new[key], key_path, ops)
+
+        for key, new_value in new.items():
+            if key not in old:
+                ops.append({"op": "add", "path": f"{path}/{_escape(key)}", "value": new_value})
+
+    elif isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+
+        for index in range(common):
+            _diff(old[index], new[index], f"{path}/{index}", ops)
+
+        # Lists in the game view mostly grow at the end,
+        # like spell cards being attached to monsters.
+        for index in range(common, len(new)):
+            ops.append({"op": "add", "path": f"{path}/{index}", "value": new[index]})
+
+        for index in reversed(range(common, len(old))):
+            ops.append({"op": "remove", "path": f"{path}/{index}"})
+
+    elif type(old) is not type(new) or old != new:
+        ops.append({"op": "replace", "path": path, "value": new})
+
+
+def apply_patch(document: Any, patch: Patch) -> Any:
+    """
+    Apply the given patch to a copy of the document.
+
+    Returns the patched copy. The given document is not mutated.
+    """
+    document = deepcopy(document)
+
+    for op in patch:
+        keys = [_unescape(key) for key in op["path"].split("/")[1:]]
+
+        if not keys:
+            # Replacing the whole document
+            document = deepcopy(op["value"])
+            continue
+
+        parent = document
+        for key in keys[:-1]:
+            parent = parent[int(key)] if isinstance(parent, list) else parent[key]
+
+        key = keys[-1]
+        match op["op"]:
+            case "add":
+                if isinstance(parent, list):
+                    parent.insert(int(key), deepcopy(op["value"]))
+                else:
+                    parent[key] = deepcopy(op["value"])
+            case "remove":
+                del parent[int(key) if isinstance(parent, list) else key]
+            case "replace":
+                parent[int(key) if isinstance(parent, list) else key] = deepcopy(op["value"])
+            case _:
+                raise ValueError(f"Unsupported patch operation: {op['op']}")
+
+    return document
+
+
+def _escape(key: Any) -> str:
+    return str(key).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(key: str) -> str:
+    return key.replace("~1", "/").replace("~0", "~")
+
+
+@dataclass
+class ViewTracker:
+    """
+    Tracks the last game view sent to a client, so that the
+    next update can be sent as a patch against it.
+
+    The version increments every time the view changes. Clients apply
+    a patch only if its ``base`` matches the version they hold, and
+    otherwise request a full resync.
+    """
+
+    version: int = 0
+    last_view: dict[str, Any] | None = None
+
+    def update(self, view: dict[str, Any], *, resync: bool = False) -> dict[str, Any]:
+        """
+        Record the given view as sent, and build the message body to send.
+
+        The body contains either the full ``game`` view, or a ``patch``
+        against the ``base`` version. A full view is sent the first time,
+        and whenever ``resync`` is requested.
+        """
+        if resync or self.last_view is None:
+            self.version += 1
+            self.last_view = view
+            return {"version": self.version, "game": view}
+
+        base = self.version
+        patch = diff(self.last_view, view)
+        if patch:
+            self.version += 1
+            self.last_view = view
+
+        return {"version": self.version, "base": base, "patch": patch}
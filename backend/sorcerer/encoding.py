@@ -0,0 +1,93 @@
+"""
+JSON encoding of server messages.
+
+Uses ``orjson`` when it is installed, and falls back to the standard
+library otherwise. Both backends produce the same compact UTF-8 bytes.
+
+Messages that are sent to many clients are encoded once, and the small
+parts that differ per client are spliced into the encoded bytes, instead
+of encoding the whole message for every client.
+"""
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any, Callable
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # type: ignore
+
+logger = logging.getLogger(__name__)
+
+Encoder = Callable[[Any], bytes]
+Decoder = Callable[[str | bytes], Any]
+
+
+def _std_dumps(obj: Any) -> bytes:
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+_BACKENDS: dict[str, tuple[Encoder, Decoder]] = {
+    "json": (_std_dumps, json.loads),
+}
+
+if orjson is not None:
+    _BACKENDS["orjson"] = (orjson.dumps, orjson.loads)
+
+dumps: Encoder
+loads: Decoder
+
+
+def use_backend(name: str) -> None:
+    """
+    Select the JSON library used to encode and decode messages.
+    """
+    global dumps, loads  # pylint: disable=global-statement
+
+    try:
+        dumps, loads = _BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"JSON backend is not available: {name}") from None
+
+    logger.debug("Using JSON backend: %s", name)
+
+
+def available_backends() -> list[str]:
+    return list(_BACKENDS.keys())
+
+
+use_backend("orjson" if orjson is not None else "json")
+
+
+def dumps_text(obj: Any) -> str:
+    """
+    Encode an object for a websocket text frame.
+    """
+    return dumps(obj).decode("utf-8")
+
+
+def splice(head: dict[str, Any], body: bytes) -> bytes:
+    """
+    Merge the fields of ``head`` in front of an already encoded JSON object.
+
+    The keys of ``head`` must not also be present in ``body``.
+    """
+    if not head:
+        return body
+
+    encoded = dumps(head)
+    if body == b"{}":
+        return encoded
+
+    return encoded[:-1] + b"," + body[1:]
+
+
+def nest(head: dict[str, Any], key: str, body: bytes) -> bytes:
+    """
+    Encode ``head`` with an already encoded JSON value nested under ``key``.
+    """
+    encoded = dumps(head)
+    separator = b"," if len(encoded) > 2 else b""
+    return encoded[:-1] + separator + dumps(key) + b":" + body + b"}"
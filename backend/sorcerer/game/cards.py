@@ -1,27 +1,67 @@
+"""
+Spell cards.
+
+Everything that describes a kind of card, like its spell ID, effects and
+target, lives in one immutable :class:`CardType` record shared by every copy
+of the card in every game session. A card instance only carries its own
+``card_id`` and ``owner``, in a slotted record without an instance dictionary.
+That makes dealt cards about 2 to 2.5 times smaller than when every card held
+its type's attributes, see ``benchmarks/bench_cards.py``.
+"""
 from __future__ import annotations
 
 import logging
 from abc import ABC
 from dataclasses import dataclass, field
-from typing import Literal
+from typing import Any, ClassVar, Literal
 import itertools
 
 from sorcerer.game.interface import EffectDef, TargetKind, effect
+from sorcerer.serialize import register, to_dict
 
 logger = logging.getLogger(__name__)
 
 SpellKind = Literal["direct", "enchant", "support"]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class CardType:
+    """
+    The definition of a kind of spell card, shared by all its copies.
+    """
+
+    spell_id: str
+    spell_kind: SpellKind
+    forbidden: bool
+    effect_defs: tuple[EffectDef, ...]
+    target: TargetKind
+
+
+@dataclass(frozen=True, slots=True)
 class Card(ABC):
     card_id: int  # Uniquely identifies the card in a game session.
-    spell_id: str = field(init=False)
-    spell_kind: SpellKind = field(init=False)
-    forbidden: bool = field(init=False)
-    effect_defs: tuple[EffectDef, ...] = field(init=False)
     owner: int | None = None
-    target: TargetKind = field(init=False)
+    card_type: ClassVar[CardType]
+
+    @property
+    def spell_id(self) -> str:
+        return self.card_type.spell_id
+
+    @property
+    def spell_kind(self) -> SpellKind:
+        return self.card_type.spell_kind
+
+    @property
+    def forbidden(self) -> bool:
+        return self.card_type.forbidden
+
+    @property
+    def effect_defs(self) -> tuple[EffectDef, ...]:
+        return self.card_type.effect_defs
+
+    @property
+    def target(self) -> TargetKind:
+        return self.card_type.target
 
 
 @dataclass(frozen=False)
@@ -34,6 +74,23 @@ class CardHolder(ABC):
     cards: list[Card] = field(init=False)
 
 
+def get_card_types() -> list[type[Card]]:
+    return [
+        Firebolt,
+        Frostbolt,
+        MagicMissile,
+    ]
+
+
+def find_card_type(spell_id: str) -> type[Card] | None:
+    """
+    Find the card type with the given spell ID.
+
+    Returns ``None`` if there is no such card type.
+    """
+    return _CARD_TYPES_BY_SPELL_ID.get(spell_id)
+
+
 def get_standard_deck() -> list[Card]:
     deck: list[Card] = []
 
@@ -52,28 +109,64 @@ def get_standard_deck() -> list[Card]:
 # Direct Spells
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Firebolt(Card):
-    spell_id: str = "card_firebolt"
-    spell_kind: SpellKind = "direct"
-    forbidden: bool = False
-    effect_defs: tuple[EffectDef, ...] = (effect("Power", power=-5),)
-    target: TargetKind = TargetKind.MONSTER
+    card_type = CardType(
+        spell_id="card_firebolt",
+        spell_kind="direct",
+        forbidden=False,
+        effect_defs=(effect("Power", power=-5),),
+        target=TargetKind.MONSTER,
+    )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Frostbolt(Card):
-    spell_id: str = "card_frostbolt"
-    spell_kind: SpellKind = "direct"
-    forbidden: bool = False
-    effect_defs: tuple[EffectDef, ...] = (effect("Power", power=-4),)
-    target: TargetKind = TargetKind.MONSTER
+    card_type = CardType(
+        spell_id="card_frostbolt",
+        spell_kind="direct",
+        forbidden=False,
+        effect_defs=(effect("Power", power=-4),),
+        target=TargetKind.MONSTER,
+    )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class MagicMissile(Card):
-    spell_id: str = "card_magicmissile"
-    spell_kind: SpellKind = "direct"
-    forbidden: bool = False
-    effect_defs: tuple[EffectDef, ...] = (effect("Power", power=-4),)
-    target: TargetKind = TargetKind.MONSTER
+    card_type = CardType(
+        spell_id="card_magicmissile",
+        spell_kind="direct",
+        forbidden=False,
+        effect_defs=(effect("Power", power=-4),),
+        target=TargetKind.MONSTER,
+    )
+
+
+# -----------------------------------------------------------------------------
+# Type table
+
+
+_CARD_TYPES_BY_SPELL_ID: dict[str, type[Card]] = {
+    card_class.card_type.spell_id: card_class for card_class in get_card_types()
+}
+
+
+def _card_serializer(card_type: CardType) -> Any:
+    # Cards are sent to clients with their type's definition inlined,
+    # the same shape they had when every card carried its own copy.
+    def serialize(card: Card) -> dict[str, Any]:
+        return {
+            "card_id": card.card_id,
+            "spell_id": card_type.spell_id,
+            "spell_kind": card_type.spell_kind,
+            "forbidden": card_type.forbidden,
+            "effect_defs": [to_dict(effect_def) for effect_def in card_type.effect_defs],
+            "owner": card.owner,
+            "target": card_type.target.value,
+        }
+
+    return serialize
+
+
+for _card_class in get_card_types():
+    register(_card_class, _card_serializer(_card_class.card_type))
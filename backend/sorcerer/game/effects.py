@@ -7,49 +7,193 @@ types in the domain.
 from __future__ import annotations
 
 import logging
-from abc import ABC
+from abc import ABC, abstractmethod
 from dataclasses import dataclass, field
 from typing import Any, Callable, Sequence, TypeVar, cast
 from sorcerer.game.errors import GameError
 
 from sorcerer.game.interface import EffectDef, Target
+from sorcerer.game.judges import Judge
 from sorcerer.game.monsters import Monster
-from sorcerer.game.game_session import GameSession, PlayerSession
-from sorcerer.game.cards import Card
+from sorcerer.game.game_session import GameSession, Phase, PlayerSession
+from sorcerer.game.cards import Card, get_card_types
 from sorcerer.game.moves import Move
 
 logger = logging.getLogger(__name__)
 
 
+def cast_spell(game: GameSession, caster: PlayerSession, card_id: int, target: Target) -> Card:
+    """
+    A player casts a spell card from their hand on a target.
+
+    Returns the card that was cast.
+    """
+    # Lookup target instance
+    target_entity = game.resolve_target(target)
+
+    # Lookup card instance that player is playing
+    spell_card = game.find_player_card(caster.player_id, card_id)
+    if spell_card is None:
+        raise GameError(f"Player-{caster.player_id} does not have card {card_id}")
+
+    game.move(
+        "cast",
+        player_id=caster.player_id,
+        card_id=card_id,
+        target_kind=target.kind.value,
+        target_id=target.target_id,
+    )
+
+    on_cast(EffectContext(game, spell_card, target, target_entity, caster=caster))
+
+    return spell_card
+
+
 def on_cast(context: EffectContext):
     """
     Hook executed when a player casts a spell card.
     """
-    pairs = resolve_effects(context.spell_card.effect_defs)
-    _map_effects(pairs, lambda effect: effect.on_cast(context))
+    for effect in card_effects(context.spell_card):
+        effect.on_cast(context)
 
 
 def on_round_end(context: EffectContext):
     """
     Hook executed when a fight round ends.
     """
-    pairs = resolve_effects(context.spell_card.effect_defs)
-    _map_effects(pairs, lambda effect: effect.on_round_end(context))
+    for effect in card_effects(context.spell_card):
+        effect.on_round_end(context)
 
 
-_EffectPairs = list[tuple[type["Effect"], EffectDef]]
-"""Effect class types and the indirect data definitions that were used to look them up."""
+def end_round(game: GameSession) -> dict[str, int]:
+    """
+    Resolve the end of a fight round, for all monsters in one pass.
+
+    The power of all spells on a monster is added up, transformed by the
+    monster's own effects (undead monsters invert it), and applied to the
+    monster's health at once.
+
+    The judge tolerates spells that break their rules, until the power of
+    those spells on one monster exceeds the judge's mana limit. Then the
+    judge passes judgement, and the rejected spells have no effect.
+
+    Direct spells, and spells rejected by the judge, are used up and discarded.
+
+    The game ends with its last round.
+
+    Records a single ``end_round`` move, and returns the new health of each monster.
+    """
+    if game.phase != Phase.FIGHT:
+        raise GameError("Rounds can only end during the fight phase")
+
+    judge = game.judge
+    judgement = judge_effect(judge) if judge is not None else None
+    health: dict[str, int] = {}
+    used_up: list[Card] = []
+
+    for monster in game.monsters:
+        powers = [(card, sum(effect.round_power() for effect in card_effects(card))) for card in monster.cards]
+
+        rejected: set[int] = set()
+        if judge is not None and judgement is not None:
+            illegal = [(card, power) for card, power in powers if breaks_rules(judge, card)]
+            if sum(abs(power) for _, power in illegal) > judge.mana_limit:
+                rejected = {card.card_id for card in judgement.reject(monster.cards, [card for card, _ in illegal])}
+
+        total = sum(power for card, power in powers if card.card_id not in rejected)
+        for effect in monster_effects(monster):
+            total = effect.transform_power(total)
 
+        monster.health += total
+        health[monster.monster_id] = monster.health
 
-def _map_effects(effects: _EffectPairs, func: Callable[[Effect], None]):
+        used_up.extend(card for card in monster.cards if card.spell_kind == "direct" or card.card_id in rejected)
+
+    for card in used_up:
+        game.discard_card(card)
+
+    game.move("end_round", round=game.round, health=health, discarded=[card.card_id for card in used_up])
+
+    if game.is_last_round:
+        game.phase = Phase.END
+
+    return health
+
+
+def breaks_rules(judge: Judge, card: Card) -> bool:
+    """
+    Check whether the spell card is of a kind disallowed by the judge.
+    """
+    return card.spell_kind in judge.disallows or (judge.disallow_forbidden and card.forbidden)
+
+
+def card_effects(card: Card) -> tuple[Effect, ...]:
+    """
+    The effects of a spell card.
+
+    Effects are immutable, so they are built once per card type and
+    shared by every cast, in every game session.
+    """
+    try:
+        return _CARD_EFFECTS[type(card)]
+    except KeyError:
+        return compile_effects(type(card))
+
+
+def compile_effects(card_type: type[Card]) -> tuple[Effect, ...]:
     """
-    Map the given callable to the list of effect types given.
+    Resolve and instantiate the effects of a card type, and cache them.
+
+    Raises ``GameError`` when the card type refers to effects that don't exist.
     """
-    for effect_cls, effect_def in effects:
+    result = _CARD_EFFECTS[card_type] = _instantiate(card_type.card_type.effect_defs)
+    logger.debug("Compiled effects of %s: %s", card_type.__name__, result)
+    return result
+
+
+def monster_effects(monster: Monster) -> tuple[Effect, ...]:
+    """
+    The effects a monster has on the spells cast on it, built once per monster type.
+    """
+    try:
+        return _MONSTER_EFFECTS[type(monster)]
+    except KeyError:
+        effect_defs = (monster.effect,) if monster.effect is not None else ()
+        result = _MONSTER_EFFECTS[type(monster)] = _instantiate(effect_defs)
+        return result
+
+
+def judge_effect(judge: Judge) -> Judgement | None:
+    """
+    The judgement a judge passes on spells that break their rules, built once per judge type.
+    """
+    try:
+        return _JUDGEMENTS[type(judge)]
+    except KeyError:
+        effects = _instantiate((judge.judgement,) if judge.judgement is not None else ())
+        judgements = [effect for effect in effects if isinstance(effect, Judgement)]
+        if len(judgements) != len(effects):
+            raise GameError(f"Judge '{judge.judge_id}' has a judgement that is not a judge effect")
+
+        result = _JUDGEMENTS[type(judge)] = judgements[0] if judgements else None
+        return result
+
+
+def _instantiate(effect_defs: Sequence[EffectDef]) -> tuple[Effect, ...]:
+    effects = []
+    for effect_cls, effect_def in resolve_effects(effect_defs):
         args, kwargs = effect_def.args_kwargs
-        logger.debug("Instantiating effect: %s(*%s, **%s)", effect_cls, args, kwargs)
-        effect = effect_cls(*args, **kwargs)
-        func(effect)
+        effects.append(effect_cls(*args, **kwargs))
+    return tuple(effects)
+
+
+_CARD_EFFECTS: dict[type[Card], tuple[Effect, ...]] = {}
+_MONSTER_EFFECTS: dict[type[Monster], tuple[Effect, ...]] = {}
+_JUDGEMENTS: dict[type[Judge], Judgement | None] = {}
+
+
+_EffectPairs = list[tuple[type["Effect"], EffectDef]]
+"""Effect class types and the indirect data definitions that were used to look them up."""
 
 
 def resolve_effects(
@@ -81,11 +225,12 @@ _TYPES: dict[str, type[Effect]] = {}
 def _register(ty: type) -> type:
     _TYPES[ty.__name__] = ty
     # NOTE: Logged records will not print if this module is imported before logging is setup.
-    logger.debug("Registering effect type: %s" % ty.__name__)
+    logger.debug("Registering effect type: %s", ty.__name__)
     return ty
 
 
 TClass = TypeVar("TClass", bound=type)
+TSpell = TypeVar("TSpell")
 _TYPES_EFFECT_HANDLERS: dict[str, type[EffectHandler]] = {}
 _EFFECT_ID_FIELD = "effect_id"
 
@@ -109,7 +254,7 @@ def effect_handler(
                 annotations[_EFFECT_ID_FIELD] = str
 
         # NOTE: Logged records will not print if this module is imported before logging is setup.
-        logger.debug("Registering effect type: %s" % cls.__name__)
+        logger.debug("Registering effect type: %s", cls.__name__)
 
         return cls
 
@@ -151,6 +296,18 @@ class Effect(ABC):
         """
         ...
 
+    def round_power(self) -> int:
+        """
+        The change in health this spell effect applies to its monster when a round ends.
+        """
+        return 0
+
+    def transform_power(self, power: int) -> int:
+        """
+        Monster effect that changes the total power of the spells cast on it.
+        """
+        return power
+
 
 class EffectHandler:
     context: EffectContext
@@ -166,9 +323,6 @@ class FireballHandler(EffectHandler):
         ...
 
 
-print(f"FireballHandler: {FireballHandler().effect_id!r}")
-
-
 # =============================================================================
 # Monster Effects
 
@@ -185,22 +339,54 @@ class Undead(Effect):
     def process(self, ctx: EffectContext) -> None:
         pass
 
+    def transform_power(self, power: int) -> int:
+        return -power
+
 
 # =============================================================================
 # Judge Effects
 
 
+@dataclass(frozen=True)
+class Judgement(Effect, ABC):
+    """
+    Judge effect applied to a monster with too many spells breaking the judge's rules.
+    """
+
+    @abstractmethod
+    def reject(self, cards: Sequence[TSpell], illegal: Sequence[TSpell]) -> list[TSpell]:
+        """
+        Choose the spells on a monster that have no effect this round.
+
+        Spells are given as cards, or as any stand-in for them, like the advisor's card positions.
+        """
+
+
 @dataclass(frozen=True)
 @_register
-class Dispel(Effect):
+class Dispel(Judgement):
+    """
+    The spells breaking the rules are dispelled.
+    """
+
     effect_id: str = "effect_dispel"
 
+    def reject(self, cards: Sequence[TSpell], illegal: Sequence[TSpell]) -> list[TSpell]:
+        return list(illegal)
+
 
 @dataclass(frozen=True)
 @_register
-class Eject(Effect):
+class Eject(Judgement):
+    """
+    All spells on the monster are thrown out, legal or not.
+    """
+
     effect_id: str = "effect_eject"
 
+    def reject(self, cards: Sequence[TSpell], illegal: Sequence[TSpell]) -> list[TSpell]:
+        return list(cards)
+
 
 # =============================================================================
 # Spell Effects
@@ -222,7 +408,7 @@ class Power(Effect):
 
     def on_cast(self, ctx: EffectContext):
         if monster := ctx.target_monster:
-            monster.cards.append(ctx.spell_card)
+            ctx.game_session.attach_card(ctx.spell_card, monster)
 
             ctx.game_session.move(
                 "card_append",
@@ -231,6 +417,9 @@ class Power(Effect):
                 monster_id=monster.monster_id,
             )
 
+    def round_power(self) -> int:
+        return self.power
+
     def on_round_end(self, ctx: EffectContext):
         if monster := ctx.target_monster:
             monster.health += self.power
@@ -243,3 +432,11 @@ class Power(Effect):
                 power=self.power,
                 new_health=monster.health,
             )
+
+
+# =============================================================================
+# Card effects are validated when the module is loaded, so a card referring to
+# an effect that doesn't exist fails at startup instead of in the middle of a game.
+
+for _card_type in get_card_types():
+    compile_effects(_card_type)
@@ -1,19 +1,23 @@
 from __future__ import annotations
 
+import base64
+import hashlib
+import hmac
 import logging
 import random
+import secrets
 from datetime import datetime
 from enum import Enum
-from dataclasses import dataclass, field, asdict
-from typing import Any
+from dataclasses import dataclass, field
+from typing import Any, NamedTuple
 
 from sorcerer.game.errors import GameError
 from sorcerer.game.judges import Judge, get_judge_types
 from sorcerer.game.monsters import Monster, get_monster_types
-from sorcerer.game.cards import Card, get_standard_deck
+from sorcerer.game.cards import Card, CardHolder, get_standard_deck
 from sorcerer.game.interface import Target, TargetKind
 from sorcerer.game.moves import Move
-from sorcerer.util import asdict_factory
+from sorcerer.serialize import PRIVATE, to_dict
 
 logger = logging.getLogger(__name__)
 
@@ -22,7 +26,33 @@ MONSTER_BET_COUNT = {1, 2, 3}
 """Players can only bet on 1, 2 or 3 monsters during a round."""
 
 MAX_ROUNDS = 3
-"""Maximum number of fight rounds."""
+"""Maximum number of fight rounds. Rounds are numbered from 0, so the last one is ``MAX_ROUNDS - 1``."""
+
+
+def new_seed() -> int:
+    """
+    A random seed for a new game session.
+    """
+    return secrets.randbits(64)
+
+
+def new_secret() -> str:
+    """
+    A random secret for a new game session, that the players' resume tokens are derived from.
+    """
+    return secrets.token_urlsafe(16)
+
+
+def hand_size(player_count: int) -> int:
+    """
+    Game rule for the number of cards dealt to each player, at a table with the given number of players.
+    """
+    if player_count <= 4:
+        return 8
+    elif player_count <= 5:
+        return 6
+    else:
+        return 5
 
 
 class Phase(Enum):
@@ -34,6 +64,7 @@ class Phase(Enum):
     SETUP = "setup"  # Server selecting judge and monsters
     BETTING = "betting"  # Players choosing monster to bet on
     FIGHT = "fight"  # Players can play spells
+    END = "end"  # The last fight round was resolved
 
     def __str__(self) -> str:
         return self.value
@@ -68,9 +99,14 @@ class GameView:
     cards: list[Card] = field(default_factory=list)  # This player's cards
     monster_bets: list[str] = field(default_factory=list)
     join_key: str | None = None
+    watch_key: str | None = None
 
     def to_dict(self) -> dict[str, Any]:
-        return asdict(self, dict_factory=asdict_factory)
+        return to_dict(self)
+
+
+PRIVATE_VIEW_FIELDS = ("player_id", "others", "cards", "monster_bets")
+"""Fields of the game view that differ between players. All other fields are the same for everyone."""
 
 
 @dataclass(frozen=True)
@@ -107,6 +143,21 @@ class PlayerSession:
         return len(self.monster_bets)
 
 
+class CardLocation(NamedTuple):
+    """
+    Where a spell card currently lives in the game.
+
+    The holder is either the player with the card in their hand, or
+    the monster or judge that the card was cast on.
+
+    A named tuple rather than a dataclass, because one is created for
+    every card dealt.
+    """
+
+    card: Card
+    holder: PlayerSession | CardHolder
+
+
 @dataclass
 class GameSession:
     """
@@ -128,7 +179,61 @@ class GameSession:
     monsters: list[Monster] = field(default_factory=list)
     discarded_monsters: list[Monster] = field(default_factory=list)
     moves: list[Move] = field(default_factory=list)
+    moves_trimmed: int = 0  # Number of old moves dropped from the front of ``moves``
     created_at: datetime = field(default_factory=datetime.utcnow)
+    seed: int = field(default_factory=new_seed)
+    watch_key: str | None = None  # Spectators follow the game with this key, instead of the join key
+    secret: str = field(default_factory=new_secret, repr=False, metadata=PRIVATE)  # Never sent, see ``resume_token``
+
+    # Random generator of this session, see ``reseed``.
+    _rng: random.Random = field(init=False, default_factory=random.Random, repr=False, compare=False, metadata=PRIVATE)
+
+    # Lookup indexes, kept in sync with the lists above by the mutating methods.
+    _players_by_id: dict[int, PlayerSession] = field(
+        init=False, default_factory=dict, repr=False, compare=False, metadata=PRIVATE
+    )
+    _monsters_by_id: dict[str, Monster] = field(
+        init=False, default_factory=dict, repr=False, compare=False, metadata=PRIVATE
+    )
+    _card_locations: dict[int, CardLocation] = field(
+        init=False, default_factory=dict, repr=False, compare=False, metadata=PRIVATE
+    )
+
+    def __post_init__(self):
+        self.rebuild_indexes()
+
+    @property
+    def rng(self) -> random.Random:
+        return self._rng
+
+    def reseed(self) -> random.Random:
+        """
+        Seed the session's random generator for the next command.
+
+        The generator is derived from the session seed and the number of moves
+        made so far, so a restored or replayed session draws exactly the same
+        numbers as the original, without storing the generator's state.
+        """
+        self._rng.seed(self.seed * 1_000_003 + self.move_count)
+        return self._rng
+
+    @property
+    def move_count(self) -> int:
+        """
+        Number of moves made in this session, including the ones trimmed from the history.
+        """
+        return self.moves_trimmed + len(self.moves)
+
+    def trim_moves(self, count: int) -> list[Move]:
+        """
+        Drop up to ``count`` of the oldest moves from the history, to bound its memory.
+
+        Returns the moves that were dropped.
+        """
+        trimmed = self.moves[:count]
+        del self.moves[:count]
+        self.moves_trimmed += len(trimmed)
+        return trimmed
 
     @property
     def is_lobby_phase(self) -> bool:
@@ -142,6 +247,10 @@ class GameSession:
     def is_fight_phase(self) -> bool:
         return self.phase == Phase.FIGHT
 
+    @property
+    def is_last_round(self) -> bool:
+        return self.round >= MAX_ROUNDS - 1
+
     @property
     def player_count(self) -> int:
         """
@@ -155,17 +264,14 @@ class GameSession:
 
         Returns ``None`` if the player cannot be found.
         """
-        for player in self.players:
-            if player.player_id == player_id:
-                return player
-        return None
+        return self._players_by_id.get(player_id)
 
     def first_player(self) -> PlayerSession | None:
         """
         Determine the player that goes first.
         """
         if self.players:
-            return random.choice(self.players)
+            return self.rng.choice(self.players)
         return None
 
     def create_new_player(self, is_leader=False) -> PlayerSession:
@@ -184,9 +290,33 @@ class GameSession:
         )
 
         self.players.append(player)
+        self._players_by_id[player_id] = player
+
+        self.move("player_join", player_id=player_id, is_leader=is_leader)
 
         return player
 
+    def resume_token(self, player_id: int) -> str:
+        """
+        The token that lets a player take their seat again, after they were disconnected or the server restarted.
+
+        Tokens are derived from the session's secret, so they survive restarts without being stored.
+        """
+        message = f"{self.join_key}:{player_id}".encode("utf-8")
+        digest = hmac.new(self.secret.encode("utf-8"), message, hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest[:18]).decode("ascii")
+
+    def find_resuming_player(self, resume_token: str) -> PlayerSession | None:
+        """
+        Find the player that the given resume token belongs to.
+
+        Returns ``None`` if the token doesn't belong to any player of this session.
+        """
+        for player in self.players:
+            if hmac.compare_digest(self.resume_token(player.player_id), resume_token):
+                return player
+        return None
+
     def find_player_card(self, player_id: int, card_id: int) -> Card | None:
         """
         Find a card in a player's hand.
@@ -195,9 +325,9 @@ class GameSession:
         if player is None:
             raise GameError(f"Player does not exist: {player_id}")
 
-        for card in player.cards:
-            if card.card_id == card_id:
-                return card
+        location = self._card_locations.get(card_id)
+        if location is not None and location.holder is player:
+            return location.card
 
         return None
 
@@ -207,10 +337,62 @@ class GameSession:
 
         Returns ``None`` if the monster cannot be found.
         """
-        for monster in self.monsters:
-            if monster.monster_id == monster_id:
-                return monster
-        return None
+        return self._monsters_by_id.get(monster_id)
+
+    def find_card_location(self, card_id: int) -> CardLocation | None:
+        """
+        Find where the spell card with the given card ID lives.
+
+        Returns ``None`` if the card is not in a player's hand,
+        or cast on a monster or the judge.
+        """
+        return self._card_locations.get(card_id)
+
+    def rebuild_indexes(self) -> None:
+        """
+        Rebuild the lookup indexes from the player, monster and card lists.
+
+        Must be called after the lists are replaced wholesale.
+        """
+        self._players_by_id = {player.player_id: player for player in self.players}
+        self._monsters_by_id = {monster.monster_id: monster for monster in self.monsters}
+
+        holders: list[PlayerSession | CardHolder] = [*self.players, *self.monsters]
+        if isinstance(self.judge, CardHolder):
+            holders.append(self.judge)
+
+        self._card_locations = {card.card_id: CardLocation(card, holder) for holder in holders for card in holder.cards}
+
+    def attach_card(self, card: Card, holder: PlayerSession | CardHolder) -> None:
+        """
+        Move a spell card to the given holder, taking it from wherever it was before.
+        """
+        self._release_card(card)
+        holder.cards.append(card)
+        self._card_locations[card.card_id] = CardLocation(card, holder)
+
+    def discard_card(self, card: Card) -> None:
+        """
+        Move a spell card from wherever it lives onto the discard pile.
+        """
+        self._release_card(card)
+        self.discarded_spells.append(card)
+
+    def _release_card(self, card: Card) -> None:
+        """
+        Take a spell card out of its holder's cards, and out of the location index.
+        """
+        location = self._card_locations.get(card.card_id)
+        if location is None or location.card is not card:
+            return
+
+        del self._card_locations[card.card_id]
+
+        cards = location.holder.cards
+        for index, other in enumerate(cards):
+            if other is card:
+                del cards[index]
+                break
 
     def choose_monsters(self, count: int = 5) -> list[Monster]:
         monsters = get_monster_types()
@@ -220,7 +402,7 @@ class GameSession:
             if not monsters:
                 break
 
-            monster_type = random.choice(monsters)
+            monster_type = self.rng.choice(monsters)
 
             # Ensure the same monster is not chosen multiple times
             monsters.remove(monster_type)
@@ -231,7 +413,7 @@ class GameSession:
 
     def shuffle_spells(self):
         """Shuffle the deck of card spells."""
-        random.shuffle(self.spells)
+        self.rng.shuffle(self.spells)
 
     def try_draw_spell(self) -> Card | None:
         """
@@ -243,16 +425,25 @@ class GameSession:
             return self.spells.pop()
         return None
 
+    def draw_spells(self, count: int) -> list[Card]:
+        """
+        Draw up to ``count`` spells from the top of the deck, in the order they are drawn.
+
+        The top of the deck is the end of the list, so drawing removes one slice from the end.
+        """
+        if count <= 0 or not self.spells:
+            return []
+
+        drawn = self.spells[-count:]
+        del self.spells[-count:]
+        drawn.reverse()
+        return drawn
+
     def determine_hand_size(self) -> int:
         """
         Game rule for the number of cards dealt to each player.
         """
-        if self.player_count <= 4:
-            return 8
-        elif self.player_count <= 5:
-            return 6
-        else:
-            return 5
+        return hand_size(self.player_count)
 
     def all_players_bet(self) -> bool:
         """
@@ -268,51 +459,77 @@ class GameSession:
         If the spell deck is empty, dealing will stop.
 
         This algorithm mimics how dealing works at a table, drawing one card for each
-        player in turn.
+        player in turn. Every player's shortfall is known up front, so all the cards
+        are drawn from the deck in one slice, and handed out in slices.
         """
-        # Shallow copy the player container, because we
-        # will be mutating it during iteration.
-        players = self.players.copy()
-        index = 0
+        shortfalls = [(player, hand_size - player.card_count) for player in self.players]
+        drawn = self.draw_spells(sum(shortfall for _, shortfall in shortfalls if shortfall > 0))
+
+        locations = self._card_locations
 
-        while players:
-            if not self.spells:
-                logger.debug("Game %s spell deck is empty", id(self))
+        # Between two shortfall levels, the same players receive a card every time
+        # around the table, so each of them takes every n-th card of that band.
+        offset = previous = 0
+        for level in sorted({shortfall for _, shortfall in shortfalls if shortfall > 0}):
+            if offset >= len(drawn):
                 break
 
-            player = players[index]
+            receiving = [player for player, shortfall in shortfalls if shortfall >= level]
+            band = drawn[offset : offset + len(receiving) * (level - previous)]
 
-            if player.card_count < hand_size:
-                spell_card = self.try_draw_spell()
-                if spell_card:
-                    player.cards.append(spell_card)
-                index += 1
-            else:
-                # Don't increment the index.
-                #
-                # Because the current player was removed,
-                # the next player moved up to the current index.
-                players.remove(player)
+            for index, player in enumerate(receiving):
+                spell_cards = band[index :: len(receiving)]
+                player.cards.extend(spell_cards)
+                for spell_card in spell_cards:
+                    locations[spell_card.card_id] = CardLocation(spell_card, player)
+
+            offset += len(band)
+            previous = level
 
-            # List length will be zero when the last player is removed.
-            if players:
-                index = index % len(players)
+        if not self.spells:
+            logger.debug("Game %s spell deck is empty", id(self))
 
-    def begin_game(self):
+    def begin_game(
+        self,
+        *,
+        judge: Judge | None = None,
+        monsters: list[Monster] | None = None,
+        spells: list[Card] | None = None,
+    ):
+        """
+        Set up the game, and move on to the betting phase.
+
+        The judge, monsters and spell deck order are chosen at random,
+        unless they are given. Replays give the choices of the original game.
+        """
         self.phase = Phase.SETUP
         logger.debug("Game %s beginning", id(self))
+        self.reseed()
 
         # 1: Choose Judge
-        judge_type = random.choice(get_judge_types())
-        logger.debug("Game %s chose judge: %s", id(self), judge_type.__name__)
-        self.judge = judge_type()
+        if judge is None:
+            judge_type = self.rng.choice(get_judge_types())
+            logger.debug("Game %s chose judge: %s", id(self), judge_type.__name__)
+            judge = judge_type()
+        self.judge = judge
 
         # 2: Choose Monsters
-        self.monsters = self.choose_monsters()
+        self.monsters = self.choose_monsters() if monsters is None else monsters
+        self.rebuild_indexes()
 
         # 3: Fill Spell Deck
-        self.spells = get_standard_deck()
-        self.shuffle_spells()
+        if spells is None:
+            self.spells = get_standard_deck()
+            self.shuffle_spells()
+        else:
+            self.spells = spells
+
+        self.move(
+            "begin_game",
+            judge_id=self.judge.judge_id,
+            monster_ids=[monster.monster_id for monster in self.monsters],
+            deck=[[card.card_id, card.spell_id] for card in self.spells],
+        )
 
         # 4. Deal Cards
         hand_size = self.determine_hand_size()
@@ -320,9 +537,20 @@ class GameSession:
 
         self.phase = Phase.BETTING
 
-    def begin_round(self, round: int):
+    def begin_round(self, round: int, first_player_id: int | None = None):
         """
         Begin a fight round.
+
+        The player that goes first is chosen at random, unless given.
+        """
+        self._begin_round(round, first_player_id)
+        self.move("begin_round", round=round, turn=self.turn)
+
+    def check_round_start(self) -> None:
+        """
+        Check that a new fight round can begin, without changing anything.
+
+        Raises ``GameError`` when the game rules don't allow it.
         """
         if self.phase not in (Phase.BETTING, Phase.FIGHT):
             raise GameError("Game must be in betting or fight phase to start a new round")
@@ -331,8 +559,11 @@ class GameSession:
         if not self.all_players_bet():
             raise GameError("Not all players have placed their bets")
 
-        if self.round >= MAX_ROUNDS:
-            raise GameError("TODO: Game end not implemented yet")
+        if self.phase == Phase.FIGHT and self.is_last_round:
+            raise GameError("The last round is being played")
+
+    def _begin_round(self, round: int, first_player_id: int | None) -> None:
+        self.check_round_start()
 
         self.phase = Phase.FIGHT
         logger.debug("Round %d starting", round)
@@ -340,19 +571,24 @@ class GameSession:
         self.round = round
 
         # Reset round turns by starting with first player
-        first_player = self.first_player()
-        assert first_player is not None, "Round started with no players"
-        self.turn = first_player.player_id
-
-    def next_round(self):
+        if first_player_id is None:
+            self.reseed()
+            first_player = self.first_player()
+            assert first_player is not None, "Round started with no players"
+            first_player_id = first_player.player_id
+        self.turn = first_player_id
+
+    def next_round(self, first_player_id: int | None = None):
         """
         Advance the game to the next round.
         """
-        self.begin_round(self.round + 1)
+        self._begin_round(self.round + 1, first_player_id)
 
         # Refill player's cards
         self.deal_cards(self.determine_hand_size())
 
+        self.move("next_round", turn=self.turn)
+
     def place_player_bets(self, player_id: int, monster_bets: list[str]) -> None:
         """
         Place the player's bet on their selected monsters,
@@ -372,14 +608,15 @@ class GameSession:
             raise GameError("Bet cannot contain more than 3 monsters")
 
         # Rule: Player can only bet on monsters that are in the arena.
-        game_monsters = set(monster.monster_id for monster in self.monsters)
         for monster_id in monster_bets:
-            if monster_id not in game_monsters:
+            if monster_id not in self._monsters_by_id:
                 raise GameError(f"Monster '{monster_id}' is not in the current game")
 
         # Rule: Players can change their bets in the betting phase.
         player.monster_bets = monster_bets
 
+        self.move("place_bets", player_id=player_id, monster_bets=list(monster_bets))
+
     def resolve_target(self, target: Target) -> None | Any:
         """
         Given a spell target, determine the precise instance.
@@ -426,12 +663,16 @@ class GameSession:
 
         return None
 
-    def resolve_spell_card(self, spell_id: int) -> Card | None:
-        # The many places where spells can live
-        # On monsters
-        # On the judge
-        # In a player's hand
-        raise NotImplementedError("TODO")
+    def resolve_spell_card(self, card_id: int) -> Card | None:
+        """
+        Find a spell card in a player's hand, on a monster, or on the judge.
+
+        Returns ``None`` if the card cannot be found.
+        """
+        location = self._card_locations.get(card_id)
+        if location is None:
+            return None
+        return location.card
 
     def move(self, move_id: str, *args, **kwargs):
         self.moves.append(Move(move_id, *args, **kwargs))
@@ -441,6 +682,7 @@ class GameSession:
 
     def incr(self) -> int:
         self.counter += 1
+        self.move("incr")
         return self.counter
 
     def get_view(
@@ -492,7 +734,8 @@ class GameSession:
             monster_bets=monster_bets,
             created_at=self.created_at,
             join_key=self.join_key if join_key else None,
+            watch_key=self.watch_key if watch_key else None,
         )
 
     def to_dict(self) -> dict[str, Any]:
-        return asdict(self, dict_factory=asdict_factory)
+        return to_dict(self)
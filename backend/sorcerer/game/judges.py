@@ -24,6 +24,15 @@ def get_judge_types() -> list[type[Judge]]:
     ]
 
 
+def find_judge_type(judge_id: str) -> type[Judge] | None:
+    """
+    Find the judge type with the given judge ID.
+
+    Returns ``None`` if there is no such judge type.
+    """
+    return _JUDGE_TYPES_BY_ID.get(judge_id)
+
+
 @dataclass(frozen=True)
 class Moira(Judge):
     judge_id: str = "judge_moira"
@@ -32,3 +41,7 @@ class Moira(Judge):
     mana_limit: int = 12
     judgement: EffectDef = effect("Dispel")
     disallows: tuple[SpellKind, ...] = ("direct",)
+
+
+# IDs are dataclass fields, so they are read from an instance of each type.
+_JUDGE_TYPES_BY_ID: dict[str, type[Judge]] = {judge_type().judge_id: judge_type for judge_type in get_judge_types()}
@@ -43,6 +43,15 @@ def get_monster_types() -> list[type[Monster]]:
     ]
 
 
+def find_monster_type(monster_id: str) -> type[Monster] | None:
+    """
+    Find the monster type with the given monster ID.
+
+    Returns ``None`` if there is no such monster type.
+    """
+    return _MONSTER_TYPES_BY_ID.get(monster_id)
+
+
 class DarkElf(Monster):
     monster_id: str = "monster_darkelf"
     name: str = "Dark Elf"
@@ -121,3 +130,9 @@ class Succubus(Monster):
     prize: int = 5
     power: int = 6
     effect: EffectDef | None = None
+
+
+# IDs are dataclass fields, so they are read from an instance of each type.
+_MONSTER_TYPES_BY_ID: dict[str, type[Monster]] = {
+    monster_type().monster_id: monster_type for monster_type in get_monster_types()
+}
@@ -1,7 +1,7 @@
-from dataclasses import asdict, dataclass
+from dataclasses import dataclass
 from typing import Any
 
-from sorcerer.util import asdict_factory
+from sorcerer.serialize import to_dict
 
 
 @dataclass
@@ -22,7 +22,4 @@ class Move:
         return type(self).__qualname__ + f"({self.move_id}, {sig})"
 
     def to_dict(self) -> dict[str, Any]:
-        return asdict(self, dict_factory=asdict_factory)
-
-
-print(Move("effect", effect_id="effect_power", monster_id="monster_demon", power=-4))
+        return to_dict(self)
@@ -0,0 +1,168 @@
+"""
+Rebuild game sessions from their move history.
+
+Game sessions record the commands applied to them as moves, including
+the outcome of random choices like the deck order. Replaying the
+commands in order rebuilds the exact same session.
+
+When the session's seed is known, random choices are drawn again from
+the session's generator, and checked against the recorded outcomes, so
+the replayed session continues exactly like the original would have.
+Without the seed, the recorded outcomes are used as they are.
+
+Moves that record the effects of commands, like spells being attached
+to monsters, are produced again by the replay, and otherwise ignored.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import datetime
+from typing import Any, Callable, Iterable
+
+from sorcerer.game.cards import Card, find_card_type
+from sorcerer.game.effects import cast_spell, end_round
+from sorcerer.game.errors import GameError
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.interface import Target, TargetKind
+from sorcerer.game.judges import find_judge_type
+from sorcerer.game.monsters import Monster, find_monster_type
+from sorcerer.game.moves import Move
+
+logger = logging.getLogger(__name__)
+
+
+class ReplayError(Exception):
+    """
+    A move history cannot be replayed.
+    """
+
+
+def replay(
+    join_key: str,
+    moves: Iterable[Move],
+    *,
+    start_money: int = GameSession.start_money,
+    created_at: datetime | None = None,
+    seed: int | None = None,
+) -> GameSession:
+    """
+    Rebuild a game session by applying the commands in its move history.
+    """
+    game = GameSession(join_key, start_money=start_money)
+    if created_at is not None:
+        game.created_at = created_at
+    if seed is not None:
+        game.seed = seed
+
+    for index, move in enumerate(moves):
+        command = _COMMANDS.get(move.move_id)
+        if command is None:
+            continue
+
+        try:
+            command(game, seed is not None, **move.kwargs)
+        except (GameError, KeyError, TypeError, ValueError) as err:
+            raise ReplayError(f"Move {index} ({move!r}) cannot be replayed: {err}") from err
+
+    return game
+
+
+def _player_join(game: GameSession, seeded: bool, *, player_id: int, is_leader: bool) -> None:
+    player = game.create_new_player(is_leader=is_leader)
+    if player.player_id != player_id:
+        raise ReplayError(f"Player joined with ID {player.player_id}, expected {player_id}")
+
+
+def _begin_game(
+    game: GameSession,
+    seeded: bool,
+    *,
+    judge_id: str,
+    monster_ids: list[str],
+    deck: list[list[Any]],
+) -> None:
+    if seeded:
+        game.begin_game()
+        _check(game, "begin_game", judge_id=judge_id, monster_ids=monster_ids, deck=deck)
+        return
+
+    judge_type = find_judge_type(judge_id)
+    if judge_type is None:
+        raise ReplayError(f"Unknown judge: {judge_id}")
+
+    monsters: list[Monster] = []
+    for monster_id in monster_ids:
+        monster_type = find_monster_type(monster_id)
+        if monster_type is None:
+            raise ReplayError(f"Unknown monster: {monster_id}")
+        monsters.append(monster_type())
+
+    spells: list[Card] = []
+    for card_id, spell_id in deck:
+        card_type = find_card_type(spell_id)
+        if card_type is None:
+            raise ReplayError(f"Unknown spell: {spell_id}")
+        spells.append(card_type(card_id))
+
+    game.begin_game(judge=judge_type(), monsters=monsters, spells=spells)
+
+
+def _place_bets(game: GameSession, seeded: bool, *, player_id: int, monster_bets: list[str]) -> None:
+    game.place_player_bets(player_id, monster_bets)
+
+
+def _begin_round(game: GameSession, seeded: bool, *, round: int, turn: int) -> None:
+    if seeded:
+        game.begin_round(round)
+        _check(game, "begin_round", round=round, turn=turn)
+    else:
+        game.begin_round(round, first_player_id=turn)
+
+
+def _next_round(game: GameSession, seeded: bool, *, turn: int) -> None:
+    if seeded:
+        game.next_round()
+        _check(game, "next_round", turn=turn)
+    else:
+        game.next_round(first_player_id=turn)
+
+
+def _incr(game: GameSession, seeded: bool) -> None:
+    game.incr()
+
+
+def _cast(game: GameSession, seeded: bool, *, player_id: int, card_id: int, target_kind: str, target_id: Any) -> None:
+    caster = game.find_player(player_id)
+    if caster is None:
+        raise ReplayError(f"Unknown caster: Player-{player_id}")
+
+    cast_spell(game, caster, card_id, Target(TargetKind(target_kind), target_id))
+
+
+def _end_round(game: GameSession, seeded: bool, *, round: int, health: dict[str, int], discarded: list[int]) -> None:
+    if game.round != round:
+        raise ReplayError(f"Round {round} ended during round {game.round}")
+
+    if end_round(game) != health:
+        raise ReplayError(f"Round {round} ended with different monster health")
+
+
+def _check(game: GameSession, move_id: str, **recorded: Any) -> None:
+    """
+    Check that a command replayed from the seed made the same random choices as the original.
+    """
+    move = game.moves[-1]
+    if move.move_id != move_id or move.kwargs != recorded:
+        raise ReplayError(f"Replayed {move_id} differs from the recorded move, is the seed right?")
+
+
+_COMMANDS: dict[str, Callable[..., None]] = {
+    "player_join": _player_join,
+    "begin_game": _begin_game,
+    "place_bets": _place_bets,
+    "begin_round": _begin_round,
+    "next_round": _next_round,
+    "incr": _incr,
+    "cast": _cast,
+    "end_round": _end_round,
+}
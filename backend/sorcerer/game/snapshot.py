@@ -0,0 +1,290 @@
+"""
+Compact binary snapshots of game sessions.
+
+A snapshot captures everything needed to restore a session after a server
+restart: players and their hands, the deck order, monsters with the spells
+cast on them, the judge, and the move history.
+
+Layout::
+
+    magic "SRC" | version (u8) | string table | session body
+
+Integers are variable length, and strings like spell and monster IDs are
+written once to the string table and referenced by index. Card, monster and
+judge attributes that are fixed by their type are not stored, only their IDs.
+"""
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+from typing import Any, Callable, TypeVar
+
+from sorcerer import encoding
+from sorcerer.game.cards import Card, find_card_type
+from sorcerer.game.game_session import GameSession, Phase, PlayerSession
+from sorcerer.game.judges import find_judge_type
+from sorcerer.game.monsters import Monster, find_monster_type
+from sorcerer.game.moves import Move
+from sorcerer.serialize import convert
+
+MAGIC = b"SRC"
+VERSION = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+T = TypeVar("T")
+
+
+class SnapshotError(Exception):
+    """
+    A snapshot is corrupt, or was written by an unsupported version.
+    """
+
+
+# =============================================================================
+# Primitives
+
+
+class _Writer:
+    def __init__(self) -> None:
+        self.body = bytearray()
+        self.strings: dict[str, int] = {}
+
+    def uint(self, value: int) -> None:
+        """Unsigned LEB128 variable length integer."""
+        while value > 0x7F:
+            self.body.append((value & 0x7F) | 0x80)
+            value >>= 7
+        self.body.append(value)
+
+    def sint(self, value: int) -> None:
+        """Signed integer, zigzag encoded so small negative numbers stay small."""
+        self.uint(value * 2 if value >= 0 else -value * 2 - 1)
+
+    def flag(self, value: bool) -> None:
+        self.body.append(1 if value else 0)
+
+    def text(self, value: str) -> None:
+        index = self.strings.get(value)
+        if index is None:
+            index = self.strings[value] = len(self.strings)
+        self.uint(index)
+
+    def opt_uint(self, value: int | None) -> None:
+        self.uint(0 if value is None else value + 1)
+
+    def opt_text(self, value: str | None) -> None:
+        if value is None:
+            self.uint(0)
+        else:
+            self.uint(1)
+            self.text(value)
+
+    def blob(self, value: bytes) -> None:
+        self.uint(len(value))
+        self.body += value
+
+    def seq(self, items: list[T], write: Callable[[T], None]) -> None:
+        self.uint(len(items))
+        for item in items:
+            write(item)
+
+    def finish(self) -> bytes:
+        header = _Writer()
+        header.body += MAGIC
+        header.body.append(VERSION)
+        header.uint(len(self.strings))
+        for value in self.strings:  # dicts keep insertion order, which is the index order
+            header.blob(value.encode("utf-8"))
+        return bytes(header.body + self.body)
+
+
+class _Reader:
+    def __init__(self, data: bytes) -> None:
+        if data[: len(MAGIC)] != MAGIC:
+            raise SnapshotError("Not a game session snapshot")
+
+        self.data = memoryview(data)
+        self.offset = len(MAGIC)
+
+        self.version = self.data[self.offset]
+        self.offset += 1
+        if self.version != VERSION:
+            raise SnapshotError(f"Unsupported snapshot version: {self.version}")
+
+        self.strings = [bytes(self._raw_bytes()).decode("utf-8") for _ in range(self.uint())]
+
+    def uint(self) -> int:
+        result = shift = 0
+        while True:
+            byte = self.data[self.offset]
+            self.offset += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    def sint(self) -> int:
+        value = self.uint()
+        return (value >> 1) ^ -(value & 1)
+
+    def flag(self) -> bool:
+        value = self.data[self.offset]
+        self.offset += 1
+        return value != 0
+
+    def text(self) -> str:
+        return self.strings[self.uint()]
+
+    def opt_uint(self) -> int | None:
+        value = self.uint()
+        return None if value == 0 else value - 1
+
+    def opt_text(self) -> str | None:
+        return self.text() if self.uint() else None
+
+    def _raw_bytes(self) -> memoryview:
+        size = self.uint()
+        value = self.data[self.offset : self.offset + size]
+        self.offset += size
+        return value
+
+    def blob(self) -> bytes:
+        return bytes(self._raw_bytes())
+
+    def seq(self, read: Callable[[], T]) -> list[T]:
+        return [read() for _ in range(self.uint())]
+
+
+# =============================================================================
+# Game types
+
+
+def _lookup(find: Callable[[str], type[T] | None], type_id: str) -> type[T]:
+    found = find(type_id)
+    if found is None:
+        raise SnapshotError(f"Unknown type in snapshot: {type_id}")
+    return found
+
+
+def dump_session(game: GameSession) -> bytes:
+    """
+    Capture the state of a game session in a compact binary snapshot.
+    """
+    out = _Writer()
+
+    def card(value: Card) -> None:
+        out.uint(value.card_id)
+        out.text(value.spell_id)
+        out.opt_uint(value.owner)
+
+    def monster(value: Monster) -> None:
+        out.text(value.monster_id)
+        out.sint(value.health)
+        out.seq(value.cards, card)
+
+    def judge(value: Any) -> None:
+        out.text(value.judge_id)
+
+    def player(value: PlayerSession) -> None:
+        out.uint(value.player_id)
+        out.sint(value.money)
+        out.flag(value.is_leader)
+        out.seq(value.cards, card)
+        out.seq(value.monster_bets, out.text)
+
+    def move(value: Move) -> None:
+        out.text(value.move_id)
+        out.blob(encoding.dumps([convert(value.args), convert(value.kwargs)]))
+
+    out.text(game.join_key)
+    out.sint(game.start_money)
+    out.uint(game.counter)
+    out.uint(game.player_counter)
+    out.text(game.phase.value)
+    out.sint(game.round)
+    out.sint(game.turn)
+    out.sint((game.created_at - _EPOCH) // _MICROSECOND)
+    out.uint(game.seed)
+    out.opt_text(game.judge.judge_id if game.judge is not None else None)
+    out.seq(game.discarded_judges, judge)
+    out.seq(game.players, player)
+    out.seq(game.spells, card)
+    out.seq(game.discarded_spells, card)
+    out.seq(game.monsters, monster)
+    out.seq(game.discarded_monsters, monster)
+    out.seq(game.moves, move)
+    out.uint(game.moves_trimmed)
+    out.opt_text(game.watch_key)
+    out.text(game.secret)
+
+    return out.finish()
+
+
+def load_session(data: bytes) -> GameSession:
+    """
+    Restore a game session from a snapshot created by :func:`dump_session`.
+    """
+    try:
+        src = _Reader(data)
+    except (IndexError, ValueError) as err:
+        raise SnapshotError(f"Corrupt snapshot header: {err}") from err
+
+    def card() -> Card:
+        card_id = src.uint()
+        card_type = _lookup(find_card_type, src.text())
+        return card_type(card_id, owner=src.opt_uint())
+
+    def monster() -> Monster:
+        instance = _lookup(find_monster_type, src.text())()
+        instance.health = src.sint()
+        instance.cards = src.seq(card)
+        return instance
+
+    def judge() -> Any:
+        return _lookup(find_judge_type, src.text())()
+
+    def player() -> PlayerSession:
+        return PlayerSession(
+            player_id=src.uint(),
+            money=src.sint(),
+            is_leader=src.flag(),
+            cards=src.seq(card),
+            monster_bets=src.seq(src.text),
+        )
+
+    def move() -> Move:
+        move_id = src.text()
+        args, kwargs = encoding.loads(src.blob())
+        return Move(move_id, *args, **kwargs)
+
+    try:
+        game = GameSession(src.text())
+        game.start_money = src.sint()
+        game.counter = src.uint()
+        game.player_counter = src.uint()
+        game.phase = Phase(src.text())
+        game.round = src.sint()
+        game.turn = src.sint()
+        game.created_at = _EPOCH + src.sint() * _MICROSECOND
+        game.seed = src.uint()
+
+        judge_id = src.opt_text()
+        game.judge = _lookup(find_judge_type, judge_id)() if judge_id is not None else None
+
+        game.discarded_judges = src.seq(judge)
+        game.players = src.seq(player)
+        game.spells = src.seq(card)
+        game.discarded_spells = src.seq(card)
+        game.monsters = src.seq(monster)
+        game.discarded_monsters = src.seq(monster)
+        game.moves = src.seq(move)
+        game.moves_trimmed = src.uint()
+        game.watch_key = src.opt_text()
+        game.secret = src.text()
+    except (IndexError, TypeError, ValueError) as err:
+        # Type errors come from move blobs that don't decode to arguments
+        raise SnapshotError(f"Corrupt snapshot: {err}") from err
+
+    game.rebuild_indexes()
+    return game
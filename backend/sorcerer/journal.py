@@ -0,0 +1,253 @@
+"""
+Append-only on-disk journal of game session moves.
+
+Every session gets one journal file. The first line is a header with the
+session's initial settings, followed by one JSON line per move. A final
+line marks the session as closed, once the game is over.
+
+New moves are collected from the live sessions in batches, and written on
+a worker thread. Each file is fsynced once per batch, so many moves share
+the cost of one disk flush.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Iterator, Mapping
+
+from sorcerer import encoding
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.moves import Move
+from sorcerer.game.replay import ReplayError, replay
+
+logger = logging.getLogger(__name__)
+
+JOURNAL_SUFFIX = ".journal"
+JOURNAL_VERSION = 1
+
+
+class JournalError(Exception):
+    """
+    A journal file is corrupt, or was written by an unsupported version.
+    """
+
+
+class Journal:
+    """
+    A directory of session journals, one file per join key.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._offsets: dict[str, int] = {}  # Number of moves already journaled per join key, see ``move_count``
+        self._lock = asyncio.Lock()
+
+    def path(self, join_key: str) -> Path:
+        # Join keys are URL safe base64, which is also safe for file names.
+        return self.directory / f"{join_key}{JOURNAL_SUFFIX}"
+
+    def resume(self, game: GameSession) -> None:
+        """
+        Continue journaling a session that was restored, after its existing moves.
+
+        Sessions without a journal file get a new journal with their whole history.
+        A line that a crash left half written is cut off first, so the next moves
+        start on a line of their own, instead of being fused with it.
+        """
+        path = self.path(game.join_key)
+        if path.exists():
+            _repair(path)
+            self._offsets[game.join_key] = game.move_count
+
+    def journaled(self, join_key: str) -> int:
+        """
+        Number of moves of the session that were collected for its journal.
+
+        Those moves can be trimmed from the session, because the journal keeps them.
+        """
+        return self._offsets.get(join_key, 0)
+
+    def collect(self, games: Mapping[str, GameSession]) -> dict[str, list[bytes]]:
+        """
+        Encode the moves made since the last collection, for all the given sessions.
+
+        Sessions that were journaled before, but are no longer given, are closed.
+        """
+        batch: dict[str, list[bytes]] = {}
+
+        for join_key, game in games.items():
+            offset = self._offsets.get(join_key)
+            lines = []
+
+            if offset is None:
+                offset = 0
+                lines.append(encoding.dumps(_header(game)))
+
+            if offset < game.moves_trimmed:
+                logger.error("Moves of game %s were trimmed before they were journaled", join_key)
+                offset = game.moves_trimmed
+
+            if offset < game.move_count:
+                lines.extend(encoding.dumps(move.to_dict()) for move in game.moves[offset - game.moves_trimmed :])
+
+            if lines:
+                batch[join_key] = lines
+                self._offsets[join_key] = game.move_count
+
+        for join_key in [join_key for join_key in self._offsets if join_key not in games]:
+            batch[join_key] = [encoding.dumps({"closed": True})]
+            del self._offsets[join_key]
+
+        return batch
+
+    async def sync(self, games: Mapping[str, GameSession]) -> int:
+        """
+        Append new moves of the given sessions to their journals.
+
+        Returns the number of lines written.
+        """
+        async with self._lock:
+            batch = self.collect(games)
+            if batch:
+                await asyncio.to_thread(self._write, batch)
+            return sum(len(lines) for lines in batch.values())
+
+    def _write(self, batch: Mapping[str, list[bytes]]) -> None:
+        for join_key, lines in batch.items():
+            with open(self.path(join_key), "ab") as fp:
+                fp.write(b"\n".join(lines) + b"\n")
+                fp.flush()
+                os.fsync(fp.fileno())
+
+    async def sync_forever(self, get_games: Callable[[], Mapping[str, GameSession]], interval: float) -> None:
+        """
+        Background task that periodically journals the moves of the sessions returned by ``get_games``.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.sync(get_games())
+            except OSError as err:
+                logger.error("Failed to write session journals: %s", err)
+
+    def restore(self, owns: Callable[[str], bool] | None = None) -> dict[str, GameSession]:
+        """
+        Replay the journals of sessions that were not closed.
+
+        Arguments:
+            owns: Whether to restore the session with a given join key.
+        """
+        games = {}
+
+        for path in self.directory.glob(f"*{JOURNAL_SUFFIX}"):
+            if owns is not None and not owns(path.stem):
+                continue
+
+            try:
+                header, moves, closed = read_journal(path)
+                if closed:
+                    continue
+                game = replay_journal(header, moves)
+            except (JournalError, ReplayError) as err:
+                logger.warning("Skipping journal %s: %s", path, err)
+                continue
+
+            games[game.join_key] = game
+
+        return games
+
+
+def _header(game: GameSession) -> dict[str, Any]:
+    return {
+        "journal": JOURNAL_VERSION,
+        "join_key": game.join_key,
+        "start_money": game.start_money,
+        "created_at": game.created_at.isoformat(),
+        "seed": game.seed,
+        "watch_key": game.watch_key,
+        "secret": game.secret,
+    }
+
+
+def _lines(path: Path) -> Iterator[dict[str, Any]]:
+    with open(path, "rb") as fp:
+        for line in fp:
+            # A crash can leave the last line half written.
+            try:
+                yield encoding.loads(line)
+            except ValueError:
+                logger.warning("Journal %s ends with a partial line", path)
+                return
+
+
+def _repair(path: Path) -> None:
+    """
+    End a journal file on its last complete line.
+    """
+    with open(path, "rb+") as fp:
+        data = fp.read()
+        end = data.rfind(b"\n") + 1
+        if end == len(data):
+            return
+
+        try:
+            encoding.loads(data[end:])
+        except ValueError:
+            logger.warning("Cutting off the partial line at the end of journal %s", path)
+            fp.truncate(end)
+        else:
+            # Only the line break is missing
+            fp.write(b"\n")
+
+        fp.flush()
+        os.fsync(fp.fileno())
+
+
+def read_journal(path: Path) -> tuple[dict[str, Any], list[Move], bool]:
+    """
+    Read a journal file.
+
+    Returns the header, the moves, and whether the session was closed.
+    """
+    lines = _lines(path)
+
+    header = next(lines, None)
+    if header is None or header.get("journal") != JOURNAL_VERSION:
+        raise JournalError("Missing or unsupported journal header")
+
+    moves = []
+    closed = False
+    for line in lines:
+        if line.get("closed"):
+            closed = True
+            break
+        try:
+            moves.append(Move(line["move_id"], *line["args"], **line["kwargs"]))
+        except (KeyError, TypeError) as err:
+            raise JournalError(f"Malformed move: {line}") from err
+
+    return header, moves, closed
+
+
+def replay_journal(header: dict[str, Any], moves: list[Move]) -> GameSession:
+    """
+    Rebuild a game session from a journal.
+    """
+    try:
+        join_key = header["join_key"]
+        start_money = header["start_money"]
+        created_at = datetime.fromisoformat(header["created_at"])
+        seed = header["seed"]
+        watch_key = header["watch_key"]
+        secret = header["secret"]
+    except (KeyError, TypeError, ValueError) as err:
+        raise JournalError(f"Malformed journal header: {header}") from err
+
+    game = replay(join_key, moves, start_money=start_money, created_at=created_at, seed=seed)
+    game.watch_key = watch_key
+    game.secret = secret  # Players resume their seats with the same tokens as before the restart
+    return game
@@ -0,0 +1,124 @@
+"""
+Lifecycle of game sessions: admission, expiry, and bounded move history.
+
+Sessions are expired when nobody has played in them for a while, or when
+they are simply too old, so abandoned games don't pile up in memory. The
+number of live sessions is capped, and new games are refused once the cap
+is reached.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from typing import Callable
+
+from sorcerer.game.game_session import GameSession
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SessionTimes:
+    created: float
+    last_active: float
+
+
+class SessionManager:
+    """
+    Tracks when each session was created and last played in, and decides which sessions expire.
+
+    Arguments:
+        idle_ttl: Seconds without activity after which a session expires.
+        max_age: Seconds after its creation at which a session expires, even when active.
+        max_sessions: Number of sessions admitted at once.
+        max_moves: Number of moves kept in each session's history. Older moves are trimmed.
+        clock: Source of the current time in seconds.
+    """
+
+    def __init__(
+        self,
+        *,
+        idle_ttl: float,
+        max_age: float,
+        max_sessions: int,
+        max_moves: int,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.idle_ttl = idle_ttl
+        self.max_age = max_age
+        self.max_sessions = max_sessions
+        self.max_moves = max_moves
+        self.clock = clock
+        self._times: dict[str, SessionTimes] = {}
+
+    def __len__(self) -> int:
+        return len(self._times)
+
+    def __contains__(self, join_key: str) -> bool:
+        return join_key in self._times
+
+    def admit(self, join_key: str) -> bool:
+        """
+        Start tracking a new session, unless the server already has too many.
+        """
+        if len(self._times) >= self.max_sessions:
+            logger.warning("Refused game %s, %d sessions are already running", join_key, len(self._times))
+            return False
+
+        self.add(join_key)
+        return True
+
+    def add(self, join_key: str) -> None:
+        """
+        Start tracking a session, regardless of the cap. Used for sessions restored at startup.
+        """
+        now = self.clock()
+        self._times[join_key] = SessionTimes(created=now, last_active=now)
+
+    def touch(self, join_key: str) -> None:
+        """
+        Record activity in the session.
+        """
+        times = self._times.get(join_key)
+        if times is not None:
+            times.last_active = self.clock()
+
+    def remove(self, join_key: str) -> None:
+        self._times.pop(join_key, None)
+
+    def expired(self) -> list[str]:
+        """
+        The join keys of the sessions that were idle or alive for too long.
+        """
+        now = self.clock()
+        return [
+            join_key
+            for join_key, times in self._times.items()
+            if now - times.last_active > self.idle_ttl or now - times.created > self.max_age
+        ]
+
+    def trim(self, game: GameSession, archived: int | None = None) -> int:
+        """
+        Drop the oldest moves of a session whose history grew past ``max_moves``.
+
+        Half of the allowed history is kept, so trimming doesn't happen after every move.
+
+        Arguments:
+            game: The session to trim.
+            archived: Number of the session's moves that are kept elsewhere, like in its journal.
+                Only those are trimmed. ``None`` when the moves aren't archived, and can be dropped.
+
+        Returns the number of moves trimmed.
+        """
+        if len(game.moves) <= self.max_moves:
+            return 0
+
+        count = len(game.moves) - self.max_moves // 2
+        if archived is not None:
+            count = min(count, archived - game.moves_trimmed)
+
+        if count <= 0:
+            return 0
+
+        return len(game.trim_moves(count))
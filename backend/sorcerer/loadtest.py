@@ -0,0 +1,223 @@
+"""
+Load generator for the game server.
+
+Spins up many websocket clients that play through the real protocol:
+create games, join them with the join key, begin, bet, start the fight,
+cast spells, and poll the game state. The latency of every request is
+recorded per message kind.
+
+Meant to be run against a local server, to track regressions between releases.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from websockets.client import connect, WebSocketClientProtocol
+from websockets.exceptions import ConnectionClosed
+
+from sorcerer import encoding
+
+logger = logging.getLogger(__name__)
+
+ERROR_KINDS = ("error", "violation")
+
+TIMEOUT = 10.0
+"""Seconds to wait for a reply before a request counts as timed out."""
+
+
+@dataclass
+class Recorder:
+    """
+    Collects request latencies and message counts.
+    """
+
+    latencies: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    errors: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    timeouts: dict[str, int] = field(default_factory=lambda: defaultdict(int))
+    sent: int = 0
+    received: int = 0
+
+    def record(self, kind: str, seconds: float) -> None:
+        self.latencies[kind].append(seconds)
+
+    def report(self, elapsed: float) -> str:
+        lines = [
+            f"Elapsed:       {elapsed:.2f}s",
+            f"Sent:          {self.sent} ({self.sent / elapsed:.0f} msg/s)",
+            f"Received:      {self.received} ({self.received / elapsed:.0f} msg/s)",
+            "",
+            "Kind              Count  Errors  Timeouts    p50 ms    p95 ms    p99 ms",
+        ]
+
+        kinds = sorted(set(self.latencies) | set(self.errors) | set(self.timeouts))
+        for kind in kinds:
+            samples = sorted(self.latencies[kind])
+            p50, p95, p99 = (percentile(samples, p) * 1000 for p in (50, 95, 99))
+            lines.append(
+                f"{kind:<14} {len(samples):>8} {self.errors[kind]:>7} {self.timeouts[kind]:>9}"
+                f" {p50:>9.2f} {p95:>9.2f} {p99:>9.2f}"
+            )
+
+        return "\n".join(lines)
+
+
+def percentile(samples: list[float], percent: float) -> float:
+    """
+    Nearest rank percentile of sorted samples.
+    """
+    if not samples:
+        return 0.0
+    rank = max(0, min(len(samples) - 1, round(percent / 100 * len(samples)) - 1))
+    return samples[rank]
+
+
+class LoadClient:
+    """
+    One simulated player connection.
+    """
+
+    def __init__(self, websocket: WebSocketClientProtocol, recorder: Recorder) -> None:
+        self.websocket = websocket
+        self.recorder = recorder
+        self.game: dict[str, Any] | None = None  # Last full game view received
+        self._inbox: asyncio.Queue[dict[str, Any]] = asyncio.Queue()
+        self._reader = asyncio.create_task(self._read())
+
+    @classmethod
+    async def connect(cls, uri: str, recorder: Recorder) -> LoadClient:
+        return cls(await connect(uri), recorder)
+
+    async def close(self) -> None:
+        self._reader.cancel()
+        await self.websocket.close()
+
+    async def _read(self) -> None:
+        try:
+            async for message in self.websocket:
+                self.recorder.received += 1
+                data = encoding.loads(message)
+                if "game" in data:
+                    self.game = data["game"]
+                self._inbox.put_nowait(data)
+        except ConnectionClosed:
+            pass
+
+    async def request(self, kind: str, payload: dict[str, Any], expect: Iterable[str]) -> dict[str, Any] | None:
+        """
+        Send a message, and wait for the first reply of an expected kind.
+
+        The round trip is recorded under the kind of the request.
+        """
+        start = time.perf_counter()
+        await self.websocket.send(encoding.dumps_text({"kind": kind, **payload}))
+        self.recorder.sent += 1
+
+        reply = await self.wait_for(expect, label=kind)
+        if reply is not None:
+            self.recorder.record(kind, time.perf_counter() - start)
+        return reply
+
+    async def wait_for(self, expect: Iterable[str], label: str) -> dict[str, Any] | None:
+        """
+        Wait for a message of an expected kind, skipping other messages like broadcasts.
+
+        Returns ``None`` when the server replied with an error, or timed out.
+        """
+        try:
+            return await asyncio.wait_for(self._receive(set(expect), label), TIMEOUT)
+        except asyncio.TimeoutError:
+            self.recorder.timeouts[label] += 1
+            return None
+
+    async def _receive(self, expect: set[str], label: str) -> dict[str, Any] | None:
+        while True:
+            data = await self._inbox.get()
+            if data.get("kind") in expect:
+                return data
+            if data.get("kind") in ERROR_KINDS:
+                logger.debug("%s failed: %s", label, data.get("message"))
+                self.recorder.errors[label] += 1
+                return None
+
+
+async def play_table(uri: str, players: int, states: int, recorder: Recorder) -> None:
+    """
+    Play through one game at one table, from the lobby to the first fight round.
+    """
+    leader = await LoadClient.connect(uri, recorder)
+    clients = [leader]
+
+    try:
+        init = await leader.request("init", {}, expect=["init"])
+        if init is None:
+            return
+
+        for _ in range(players - 1):
+            client = await LoadClient.connect(uri, recorder)
+            clients.append(client)
+            await client.request("init", {"join": init["join"]}, expect=["joined"])
+
+        # Begin the game. Everyone is sent their view when setup is done.
+        await leader.request("begin", {}, expect=["state"])
+        await asyncio.gather(*(client.wait_for(["state"], label="begin") for client in clients[1:]))
+
+        await asyncio.gather(*(_bet(client) for client in clients))
+
+        await leader.request("next_round", {}, expect=["next_round"])
+        await asyncio.gather(*(client.wait_for(["next_round"], label="next_round") for client in clients[1:]))
+
+        await asyncio.gather(*(_cast(client) for client in clients))
+
+        for _ in range(states):
+            await asyncio.gather(*(client.request("state", {}, expect=["state"]) for client in clients))
+
+    finally:
+        # The leader leaving ends the game on the server
+        for client in reversed(clients):
+            await client.close()
+
+
+async def _bet(client: LoadClient) -> None:
+    if client.game and client.game["monsters"]:
+        monster_ids = [monster["monster_id"] for monster in client.game["monsters"][:2]]
+        await client.request("bet", {"monster_ids": monster_ids}, expect=["bet"])
+
+
+async def _cast(client: LoadClient) -> None:
+    if client.game and client.game["cards"] and client.game["monsters"]:
+        card = client.game["cards"][0]
+        monster = client.game["monsters"][-1]
+        target = {"kind": card["target"], "target_id": monster["monster_id"]}
+        await client.request("action", {"card_id": card["card_id"], "target": target}, expect=["action"])
+
+
+async def run(uri: str, tables: int, players: int, states: int, concurrency: int) -> Recorder:
+    """
+    Play the given number of tables, with at most ``concurrency`` tables in flight at a time.
+    """
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def table() -> None:
+        async with semaphore:
+            try:
+                await play_table(uri, players, states, recorder)
+            except (OSError, ConnectionClosed) as err:
+                logger.warning("Table failed: %s", err)
+                recorder.errors["connect"] += 1
+
+    await asyncio.gather(*(table() for _ in range(tables)))
+    return recorder
+
+
+def main(uri: str, tables: int, players: int, states: int, concurrency: int) -> None:
+    start = time.perf_counter()
+    recorder = asyncio.run(run(uri, tables, players, states, concurrency))
+    elapsed = time.perf_counter() - start
+
+    print(recorder.report(elapsed))
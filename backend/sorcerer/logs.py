@@ -0,0 +1,138 @@
+"""
+Logging setup for the server and the command line tools.
+
+Records are put on a queue by the thread that logs them, and written out by
+a listener thread, so a slow terminal or disk never blocks the event loop.
+Levels can be set per module, and records can be written as JSON lines for
+log collectors.
+
+Messages that are logged for every player message should go through a
+``Sampler``, so only a fraction of them are formatted and written.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+from argparse import ArgumentParser, Namespace
+from datetime import datetime, timezone
+from typing import IO, Mapping
+
+LOG_LEVEL = os.environ.get("SORCERER_LOG_LEVEL", "INFO")
+"""Level of the root logger."""
+
+LOG_LEVELS = os.environ.get("SORCERER_LOG_LEVELS", "")
+"""Levels of single modules, like ``sorcerer.server=DEBUG,sorcerer.journal=WARNING``."""
+
+LOG_FORMAT = os.environ.get("SORCERER_LOG_FORMAT", "text")
+"""Either ``text`` for people, or ``json`` for log collectors."""
+
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+_RECORD_FIELDS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as one JSON object per line. Values passed with ``extra`` become fields of the object.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        data.update((key, value) for key, value in vars(record).items() if key not in _RECORD_FIELDS)
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str)
+
+
+class Sampler:
+    """
+    Lets through one in every ``every`` calls, to log a sample of frequent events.
+    """
+
+    __slots__ = ("every", "_count")
+
+    def __init__(self, every: int) -> None:
+        self.every = max(every, 1)
+        self._count = 0
+
+    def __call__(self) -> bool:
+        self._count += 1
+        if self._count >= self.every:
+            self._count = 0
+            return True
+        return False
+
+
+def parse_levels(levels: str) -> dict[str, str]:
+    """
+    Parse per module levels, written as comma separated ``module=LEVEL`` pairs.
+    """
+    result = {}
+    for item in filter(None, (item.strip() for item in levels.split(","))):
+        name, sep, level = item.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Log level must be written as module=LEVEL: {item!r}")
+        result[name.strip()] = level.strip().upper()
+    return result
+
+
+def configure(
+    level: str = LOG_LEVEL,
+    levels: Mapping[str, str] | None = None,
+    *,
+    json_format: bool = LOG_FORMAT == "json",
+    stream: IO[str] | None = None,
+) -> logging.handlers.QueueListener:
+    """
+    Send all records through a queue to a listener thread, which writes them to ``stream``.
+
+    Replaces the handlers of the root logger. Returns the started listener, which
+    should be stopped on shutdown to flush the records left in the queue.
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(TEXT_FORMAT))
+
+    log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level.upper())
+
+    for name, module_level in (parse_levels(LOG_LEVELS) if levels is None else levels).items():
+        logging.getLogger(name).setLevel(module_level)
+
+    listener.start()
+    return listener
+
+
+def add_arguments(parser: ArgumentParser) -> None:
+    """
+    Add the logging options to a command line parser. Their defaults come from the environment.
+    """
+    parser.add_argument("--log-level", default=LOG_LEVEL, help="Level of all the loggers")
+    parser.add_argument(
+        "--log-levels",
+        type=parse_levels,
+        default=None,
+        help="Levels of single modules, like sorcerer.server=DEBUG,sorcerer.journal=WARNING",
+    )
+    parser.add_argument("--log-format", choices=["text", "json"], default=LOG_FORMAT)
+
+
+def configure_from_args(args: Namespace) -> logging.handlers.QueueListener:
+    """
+    Configure logging from the options added by ``add_arguments``.
+    """
+    return configure(args.log_level, args.log_levels, json_format=args.log_format == "json")
@@ -0,0 +1,267 @@
+"""
+Server metrics, in the Prometheus text exposition format.
+
+Metrics are plain counters updated in place, so they are cheap enough to
+leave on. Labelled metrics hand out one child per label value, which
+callers look up once and keep, instead of on every update.
+
+The metrics are served over HTTP by ``serve_metrics``, for a scraper to
+collect.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import math
+from bisect import bisect_left
+from typing import Callable, Iterator
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+"""Default histogram buckets, in seconds."""
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if isinstance(value, int) or value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _CounterValue:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+
+class _HistogramValue:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # The last one counts values above all the buckets
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metric:
+    """
+    Base of the metric types. Metrics with label names have one child per combination of label values.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = labels
+        self._children: dict[tuple[str, ...], object] = {}
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def _child(self, values: tuple[str, ...]) -> object:
+        if len(values) != len(self.label_names):
+            raise ValueError(f"Metric {self.name} expects labels {self.label_names}, got {values}")
+
+        child = self._children.get(values)
+        if child is None:
+            child = self._children[values] = self._new_child()
+        return child
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self.samples()
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def labels(self, *values: str) -> _CounterValue:
+        return self._child(values)  # type: ignore
+
+    def inc(self, amount: float = 1) -> None:
+        self.labels().inc(amount)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            yield f"{self.name}{_labels(self.label_names, values)} {_format(child.value)}"  # type: ignore
+
+
+class Gauge(Metric):
+    """
+    A value that goes up and down. Gauges with a ``func`` read their value when collected.
+    """
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        func: Callable[[], float] | None = None,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.func = func
+
+    def _new_child(self) -> _CounterValue:
+        return _CounterValue()
+
+    def labels(self, *values: str) -> _CounterValue:
+        return self._child(values)  # type: ignore
+
+    def set(self, value: float) -> None:
+        self.labels().value = value
+
+    def samples(self) -> Iterator[str]:
+        if self.func is not None:
+            yield f"{self.name} {_format(self.func())}"
+            return
+
+        for values, child in self._children.items():
+            yield f"{self.name}{_labels(self.label_names, values)} {_format(child.value)}"  # type: ignore
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramValue:
+        return _HistogramValue(self.buckets)
+
+    def labels(self, *values: str) -> _HistogramValue:
+        return self._child(values)  # type: ignore
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def samples(self) -> Iterator[str]:
+        for values, child in self._children.items():
+            assert isinstance(child, _HistogramValue)
+            cumulative = 0
+            for bound, count in zip((*self.buckets, math.inf), child.counts):
+                cumulative += count
+                le = _labels(self.label_names, values, f'le="{_format(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+
+            labels = _labels(self.label_names, values)
+            yield f"{self.name}_sum{labels} {_format(child.sum)}"
+            yield f"{self.name}_count{labels} {child.count}"
+
+
+class Registry:
+    """
+    The metrics collected together by a scrape.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric already registered: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = [line for metric in self._metrics.values() for line in metric.render()]
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+def counter(name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, help, labels))  # type: ignore
+
+
+def gauge(name: str, help: str, labels: tuple[str, ...] = (), func: Callable[[], float] | None = None) -> Gauge:
+    return REGISTRY.register(Gauge(name, help, labels, func))  # type: ignore
+
+
+def histogram(
+    name: str,
+    help: str,
+    labels: tuple[str, ...] = (),
+    buckets: tuple[float, ...] = LATENCY_BUCKETS,
+) -> Histogram:
+    return REGISTRY.register(Histogram(name, help, labels, buckets))  # type: ignore
+
+
+LOOP_LAG = histogram("sorcerer_event_loop_lag_seconds", "Delay of the event loop in running a scheduled callback.")
+
+
+async def monitor_loop_lag(interval: float, lag: Histogram = LOOP_LAG) -> None:
+    """
+    Background task that measures how late the event loop wakes it up, which grows when handlers block the loop.
+    """
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval
+        await asyncio.sleep(interval)
+        lag.observe(max(loop.time() - expected, 0.0))
+
+
+async def serve_metrics(host: str, port: int, registry: Registry = REGISTRY) -> None:
+    """
+    Background task that serves the metrics of the registry over HTTP, on any path.
+    """
+
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            # Only the request line and headers are read, scrapes have no body.
+            while (await reader.readline()).strip():
+                pass
+
+            body = registry.render().encode("utf-8")
+            writer.write(
+                b"HTTP/1.1 200 OK\r\n"
+                b"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+                b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n"
+                b"Connection: close\r\n\r\n" + body
+            )
+            await writer.drain()
+        except ConnectionError as err:
+            logger.debug("Metrics scrape failed: %s", err)
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    logger.info("Serving metrics on %s:%d", host, port)
+    async with server:
+        await server.serve_forever()
@@ -0,0 +1,134 @@
+"""
+Outbound messages of one client, queued and sent by a writer task of its own.
+
+Handlers queue messages without waiting for the network, so a slow client
+never holds up the others, or the player whose message is being handled.
+Each queue is bounded:
+
+- A full view of the game supersedes the views still queued before it,
+  since it replaces everything they would have shown.
+- When the queue is still full, the client is either disconnected, or its
+  oldest messages are dropped. Dropped view patches leave a gap in the view
+  versions, which makes the client ask for a full resync.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from collections import deque
+
+from websockets.exceptions import ConnectionClosed
+from websockets.server import WebSocketServerProtocol
+
+from sorcerer import metrics
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SIZE = int(os.environ.get("SORCERER_OUTBOX_SIZE", "64"))
+"""Messages queued per client, before the client is considered too slow."""
+
+OUTBOX_POLICY = os.environ.get("SORCERER_OUTBOX_POLICY", "disconnect")
+"""What happens to clients that are too slow: ``disconnect`` them, or ``drop`` their oldest messages."""
+
+POLICIES = ("disconnect", "drop")
+
+_DEPTH = metrics.histogram(
+    "sorcerer_outbox_depth",
+    "Messages waiting in a client's outbox, when one more is queued.",
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64, 128),
+).labels()
+_COALESCED = metrics.counter("sorcerer_outbox_coalesced_total", "Queued views superseded by a full view.").labels()
+_DROPPED = metrics.counter("sorcerer_outbox_dropped_total", "Messages dropped from full outboxes.").labels()
+_DISCONNECTED = metrics.counter(
+    "sorcerer_outbox_disconnects_total", "Clients disconnected for being too slow."
+).labels()
+
+
+class Outbox:
+    """
+    Bounded queue of the messages to send to one client.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocketServerProtocol,
+        size: int = OUTBOX_SIZE,
+        policy: str = OUTBOX_POLICY,
+    ) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown outbox policy: {policy}")
+
+        self.websocket = websocket
+        self.size = size
+        self.policy = policy
+        self.closed = False
+        self._queue: deque[tuple[bool, str | bytes]] = deque()  # Whether each message is a game view, and the message
+        self._ready = asyncio.Event()
+        self._writer: asyncio.Task | None = None
+        self._closing: asyncio.Task | None = None
+
+    def __len__(self) -> int:
+        return len(self._queue)
+
+    def put(self, message: str | bytes, *, view: bool = False, full: bool = False) -> None:
+        """
+        Queue a message, without waiting for it to be sent.
+
+        Arguments:
+            message: The encoded message, text or binary.
+            view: Whether the message is a view of the game, or a patch of one.
+            full: Whether the view is complete, and so supersedes the views queued before it.
+        """
+        if self.closed:
+            return
+
+        _DEPTH.observe(len(self._queue))
+
+        if full and self._queue:
+            kept = [item for item in self._queue if not item[0]]
+            _COALESCED.inc(len(self._queue) - len(kept))
+            self._queue = deque(kept)
+
+        if len(self._queue) >= self.size:
+            if self.policy == "disconnect":
+                self._disconnect()
+                return
+
+            _DROPPED.inc()
+            self._queue.popleft()
+
+        self._queue.append((view, message))
+        self._ready.set()
+
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._write())
+
+    def close(self) -> None:
+        """
+        Stop sending. Messages still queued are discarded.
+        """
+        self.closed = True
+        self._queue.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+
+    def _disconnect(self) -> None:
+        _DISCONNECTED.inc()
+        logger.warning("Disconnecting client %s, %d messages behind", self.websocket.remote_address, len(self._queue))
+        self.close()
+        self._closing = asyncio.get_running_loop().create_task(self.websocket.close(1013, "Client is too slow"))
+
+    async def _write(self) -> None:
+        while not self.closed:
+            if not self._queue:
+                self._ready.clear()
+                await self._ready.wait()
+                continue
+
+            _, message = self._queue.popleft()
+            try:
+                await self.websocket.send(message)
+            except ConnectionClosed:
+                self.closed = True
+                self._queue.clear()
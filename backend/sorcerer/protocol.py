@@ -0,0 +1,260 @@
+"""
+Messages exchanged by the server and its clients.
+
+Every kind of message that players send has a schema: a command class,
+whose fields are the fields of the message. Each schema is compiled once
+into a decoder, which checks the message's fields and builds the command,
+so handlers work with typed values instead of probing dictionaries.
+
+Messages that are too large, or don't look like a JSON object, are
+rejected before they are parsed.
+"""
+from __future__ import annotations
+
+from dataclasses import MISSING, dataclass, fields
+from enum import Enum
+from typing import Any, Callable, ClassVar
+
+from sorcerer import encoding
+from sorcerer.game.interface import Target, TargetKind
+
+MAX_COMMAND_SIZE = 4096
+"""Length of the largest message a player can send, in characters or bytes. Commands are much smaller."""
+
+ERROR_CODES = ("too_large", "malformed", "unknown_kind", "invalid")
+
+
+class Kind(Enum):
+    INIT = "init"  # First player initialises the game, or others join.
+    JOINED = "joined"  # Notify all players that someone has joined.
+    BEGIN = "begin"  # First player begins the game after other palyers have joined.
+    NEXT_ROUND = "next_round"  # Betting is done and round starts.
+    SETUP = "setup"  # Signal players that the server is setting up the game.
+    STATE = "state"  # Player requested the latest state.
+    BET = "bet"  # Player places a bet. Only valid during the "betting" phase.
+    ACTION = "action"  # Player has played a card
+    ADVICE = "advice"  # Player asks which monsters to bet on
+    WATCH = "watch"  # Public view of the game, sent to spectators
+    CODEC = "codec"  # Tables of the binary codec, sent first to the clients that asked for it
+    INCR = "incr"
+    ERR = "error"
+
+    def __str__(self) -> str:
+        return str(self.value)
+
+
+class ProtocolError(Exception):
+    """
+    A message that doesn't follow the protocol.
+
+    Arguments:
+        message: What is wrong, for people.
+        code: What is wrong, for programs. One of ``ERROR_CODES``.
+        field: The field of the message that is wrong, if any.
+    """
+
+    def __init__(self, message: str, *, code: str = "invalid", field: str | None = None) -> None:
+        super().__init__(message)
+        self.message = message
+        self.code = code
+        self.field = field
+
+    def to_dict(self) -> dict[str, Any]:
+        data = {
+            "kind": Kind.ERR.value,
+            "code": self.code,
+            "message": self.message,
+        }
+        if self.field is not None:
+            data["field"] = self.field
+        return data
+
+
+# =============================================================================
+# Commands
+
+
+@dataclass(frozen=True, slots=True)
+class Command:
+    kind: ClassVar[Kind]
+
+
+@dataclass(frozen=True, slots=True)
+class Init(Command):
+    kind = Kind.INIT
+    join: str | None = None
+    watch: str | None = None
+    codec: str | None = None  # Encoding of the messages sent to the client, JSON when not given
+    resume: str | None = None  # Resume token of a player taking their seat again, with the join key
+
+
+@dataclass(frozen=True, slots=True)
+class Incr(Command):
+    kind = Kind.INCR
+
+
+@dataclass(frozen=True, slots=True)
+class Begin(Command):
+    kind = Kind.BEGIN
+
+
+@dataclass(frozen=True, slots=True)
+class NextRound(Command):
+    kind = Kind.NEXT_ROUND
+
+
+@dataclass(frozen=True, slots=True)
+class State(Command):
+    kind = Kind.STATE
+    resync: bool = False
+
+
+@dataclass(frozen=True, slots=True)
+class Advice(Command):
+    kind = Kind.ADVICE
+
+
+@dataclass(frozen=True, slots=True)
+class Bet(Command):
+    kind = Kind.BET
+    monster_ids: tuple[str, ...]
+
+
+@dataclass(frozen=True, slots=True)
+class Action(Command):
+    kind = Kind.ACTION
+    card_id: int
+    target: Target
+
+
+COMMANDS: tuple[type[Command], ...] = (Init, Incr, Begin, NextRound, State, Advice, Bet, Action)
+
+
+# =============================================================================
+# Decoders
+
+
+def _bool(name: str, value: Any) -> bool:
+    if not isinstance(value, bool):
+        raise ProtocolError(f"{name} must be a boolean", field=name)
+    return value
+
+
+def _int(name: str, value: Any) -> int:
+    if not isinstance(value, int) or isinstance(value, bool):
+        raise ProtocolError(f"{name} must be an integer", field=name)
+    return value
+
+
+def _str(name: str, value: Any) -> str:
+    if not isinstance(value, str):
+        raise ProtocolError(f"{name} must be a string", field=name)
+    return value
+
+
+def _str_tuple(name: str, value: Any) -> tuple[str, ...]:
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ProtocolError(f"{name} must be an array of strings", field=name)
+    return tuple(value)
+
+
+def _target(name: str, value: Any) -> Target:
+    if not isinstance(value, dict):
+        raise ProtocolError(f"{name} must be an object", field=name)
+
+    try:
+        kind = TargetKind(value.get("kind"))
+    except ValueError:
+        raise ProtocolError(f"Unknown target kind: {value.get('kind')}", field=f"{name}.kind") from None
+
+    target_id = value.get("target_id")
+    if target_id is not None and (not isinstance(target_id, (int, str)) or isinstance(target_id, bool)):
+        raise ProtocolError(f"{name}.target_id must be a string or an integer", field=f"{name}.target_id")
+
+    return Target(kind, target_id)
+
+
+# Field decoders by annotation. Annotations are strings, because of ``from __future__ import annotations``.
+_FIELD_DECODERS: dict[str, Callable[[str, Any], Any]] = {
+    "bool": _bool,
+    "int": _int,
+    "str": _str,
+    "str | None": _str,
+    "tuple[str, ...]": _str_tuple,
+    "Target": _target,
+}
+
+Decoder = Callable[[dict[str, Any]], Command]
+
+
+def compile_decoder(command_type: type[Command]) -> Decoder:
+    """
+    Build the function that checks the fields of a message, and creates the command.
+
+    Missing and null fields take the field's default. Fields that aren't part of the schema are ignored.
+    """
+    schema = []
+    for spec in fields(command_type):
+        if not isinstance(spec.type, str) or spec.type not in _FIELD_DECODERS:
+            raise TypeError(f"Unsupported field type in {command_type.__name__}.{spec.name}: {spec.type}")
+        schema.append((spec.name, _FIELD_DECODERS[spec.type], spec.default))
+
+    def decode(data: dict[str, Any]) -> Command:
+        values = {}
+        for name, decode_field, default in schema:
+            value = data.get(name)
+            if value is None:
+                if default is MISSING:
+                    raise ProtocolError(f"Missing field: {name}", field=name)
+                values[name] = default
+            else:
+                values[name] = decode_field(name, value)
+        return command_type(**values)
+
+    return decode
+
+
+_DECODERS: dict[str, Decoder] = {command_type.kind.value: compile_decoder(command_type) for command_type in COMMANDS}
+
+
+def check_size(message: str | bytes) -> None:
+    """
+    Reject messages that are too large, before anything else is done with them.
+    """
+    if len(message) > MAX_COMMAND_SIZE:
+        raise ProtocolError("Message is too large", code="too_large")
+
+
+def decode(message: str | bytes) -> Command:
+    """
+    Decode a message from a client into its command.
+
+    Raises ``ProtocolError`` for messages that are too large, malformed, or don't match their schema.
+    """
+    check_size(message)
+
+    # Cheap check for garbage, before parsing
+    if message[:1] not in ("{", b"{"):
+        raise ProtocolError("Message must be a JSON object", code="malformed")
+
+    try:
+        data = encoding.loads(message)
+    except ValueError:
+        raise ProtocolError("Message is not valid JSON", code="malformed") from None
+
+    if not isinstance(data, dict):
+        raise ProtocolError("Message must be a JSON object", code="malformed")
+
+    return decode_data(data)
+
+
+def decode_data(data: dict[str, Any]) -> Command:
+    """
+    Decode an already parsed message into its command.
+    """
+    kind = data.get("kind")
+    decoder = _DECODERS.get(kind) if isinstance(kind, str) else None
+    if decoder is None:
+        raise ProtocolError(f"Unknown message kind: {kind}", code="unknown_kind", field="kind")
+
+    return decoder(data)
@@ -0,0 +1,164 @@
+"""
+Fast conversion of game dataclasses into JSON compatible dictionaries.
+
+``dataclasses.asdict`` walks every value recursively, deep copies it, and
+checks its type on every call. Instead, a specialised function is generated
+once per dataclass type from its field type annotations, and reused for
+every instance of that type.
+
+Containers are always rebuilt, so the result never shares mutable state with
+the game, but immutable leaf values are not copied.
+"""
+from __future__ import annotations
+
+import dataclasses
+import logging
+import types
+import typing
+from datetime import datetime
+from enum import Enum
+from typing import Any, Callable, Literal, Union
+
+logger = logging.getLogger(__name__)
+
+Serializer = Callable[[Any], dict[str, Any]]
+
+_SERIALIZERS: dict[type, Serializer] = {}
+_PRIMITIVES = (str, int, float, bool, type(None))
+
+PRIVATE = {"serialize": False}
+"""Metadata of the dataclass fields that are left out, like lookup indexes. Pass it to ``dataclasses.field``."""
+
+
+def to_dict(obj: Any) -> dict[str, Any]:
+    """
+    Convert a dataclass instance to a dictionary, using the serializer of its exact type.
+    """
+    try:
+        return _SERIALIZERS[type(obj)](obj)
+    except KeyError:
+        return serializer(type(obj))(obj)
+
+
+def serializer(cls: type) -> Serializer:
+    """
+    Get the serializer for the given dataclass type, compiling it on first use.
+    """
+    func = _SERIALIZERS.get(cls)
+    if func is None:
+        if not dataclasses.is_dataclass(cls):
+            raise TypeError(f"Type '{cls.__qualname__}' is not a dataclass")
+        func = _SERIALIZERS[cls] = _compile(cls)
+    return func
+
+
+def register(cls: type, func: Serializer) -> None:
+    """
+    Register a hand written serializer for a type, instead of generating one from its fields.
+    """
+    _SERIALIZERS[cls] = func
+
+
+def convert(value: Any) -> Any:
+    """
+    Convert a value of unknown type into a JSON compatible value.
+
+    This is the slow path, used for fields annotated with ``Any``, or
+    annotations that can't be resolved.
+    """
+    if isinstance(value, _PRIMITIVES):
+        return value
+    elif isinstance(value, Enum):
+        return value.value
+    elif isinstance(value, datetime):
+        return value.isoformat()
+    elif isinstance(value, (list, tuple)):
+        return [convert(item) for item in value]
+    elif isinstance(value, dict):
+        return {key: convert(item) for key, item in value.items()}
+    elif dataclasses.is_dataclass(value):
+        return to_dict(value)
+    return value
+
+
+def _compile(cls: type) -> Serializer:
+    try:
+        hints = typing.get_type_hints(cls)
+    except Exception:  # pylint: disable=broad-except
+        logger.warning("Type hints of '%s' cannot be resolved, serializing dynamically", cls.__qualname__)
+        hints = {}
+
+    namespace: dict[str, Any] = {}
+    items = []
+
+    for field in dataclasses.fields(cls):
+        if field.metadata.get("serialize") is False:
+            continue
+
+        access = f"obj.{field.name}"
+        items.append(f"{field.name!r}: {_expression(hints.get(field.name, Any), access, namespace)}")
+
+    source = f"def serialize(obj):\n    return {{{', '.join(items)}}}\n"
+    exec(source, namespace)  # pylint: disable=exec-used
+
+    func = namespace["serialize"]
+    func.__qualname__ = f"serialize_{cls.__qualname__}"
+    return func
+
+
+def _expression(hint: Any, access: str, namespace: dict[str, Any]) -> str:
+    """
+    Generate the expression that converts the value at ``access`` according to its type hint.
+    """
+    if hint in _PRIMITIVES or typing.get_origin(hint) is Literal:
+        return access
+
+    if isinstance(hint, type):
+        if issubclass(hint, Enum):
+            return f"{access}.value"
+        if issubclass(hint, datetime):
+            return f"{access}.isoformat()"
+        if dataclasses.is_dataclass(hint):
+            # Dispatch on the instance's type, because fields can hold subclasses
+            namespace["to_dict"] = to_dict
+            return f"to_dict({access})"
+
+    origin = typing.get_origin(hint)
+    args = typing.get_args(hint)
+
+    if origin in (Union, types.UnionType):
+        # Optional values are the only unions used by the game types.
+        non_null = [arg for arg in args if arg is not type(None)]
+        if len(non_null) == 1:
+            inner = _expression(non_null[0], "v", namespace)
+            if inner == "v":
+                return access
+            converter = _name(namespace, f"lambda v: None if v is None else {inner}")
+            return f"{converter}({access})"
+
+    elif origin in (list, tuple) and args:
+        item_hint = args[0]
+        if origin is tuple and not (len(args) == 2 and args[1] is Ellipsis) and len(set(args)) != 1:
+            item_hint = Any
+        inner = _expression(item_hint, "v", namespace)
+        if inner == "v":
+            return f"list({access})"
+        return f"[{inner} for v in {access}]"
+
+    elif origin is dict and args:
+        inner = _expression(args[1], "v", namespace)
+        if inner == "v":
+            return f"dict({access})"
+        return f"{{k: {inner} for k, v in {access}.items()}}"
+
+    namespace["convert"] = convert
+    return f"convert({access})"
+
+
+def _name(namespace: dict[str, Any], source: str) -> str:
+    """
+    Compile a helper converter into the namespace, and return its name.
+    """
+    name = f"_convert_{len(namespace)}"
+    namespace[name] = eval(source, namespace)  # pylint: disable=eval-used
+    return name
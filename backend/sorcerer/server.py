@@ -1,20 +1,32 @@
-import json
 import logging
 import asyncio
+import os
 import secrets
-from enum import Enum
-from dataclasses import dataclass
-from typing import Iterable, Generator
+import time
+from argparse import ArgumentParser, Namespace
+from multiprocessing.connection import Connection
+from pathlib import Path
+from dataclasses import dataclass, field
+from typing import Any, Collection, Sequence
 
-import websockets
-from websockets.exceptions import ConnectionClosedOK
 from websockets.server import serve, WebSocketServerProtocol
 
+from sorcerer import advisor, logs, metrics, protocol
+from sorcerer.delta import ViewTracker
 from sorcerer.game.errors import GameError
-from sorcerer.game.game_session import GameSession, PlayerSession
-from sorcerer.game.effects import EffectContext, on_cast
+from sorcerer.game.game_session import PRIVATE_VIEW_FIELDS, GameSession, Phase, PlayerSession
+from sorcerer.game.effects import cast_spell, end_round
+from sorcerer.serialize import convert, to_dict
+from sorcerer.shard import shard_for, take_over
+from sorcerer.journal import Journal
+from sorcerer.actor import SessionActor, offload
+from sorcerer.codec import JSON, Codec, Message, codec_message, decode_command, find_codec
+from sorcerer.lifecycle import SessionManager
+from sorcerer.outbox import Outbox
+from sorcerer.protocol import Action, Advice, Begin, Bet, Incr, Init, Kind, NextRound, ProtocolError, State
+from sorcerer.spectate import SPECTATOR_ID, SpectatorFeed
+from sorcerer.storage import SnapshotStore
 
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 
@@ -22,170 +34,409 @@ logger = logging.getLogger(__name__)
 class Client:
     player: PlayerSession
     websocket: WebSocketServerProtocol
+    codec: Codec = JSON  # Encoding of the messages sent to this client
+    views: ViewTracker = field(default_factory=ViewTracker)  # Last game view sent to this client
+    advice: dict[int, dict[str, Any]] = field(default_factory=dict)  # Last advice sent, by the game's move count
+    outbox: Outbox = field(init=False)  # Messages waiting to be sent to this client
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "outbox", Outbox(self.websocket))
+
+    def send(self, data: dict[str, Any]) -> None:
+        """
+        Encode a message for this client alone, and queue it.
+        """
+        self.outbox.put(self.codec.encode(data))
 
 
 StatePair = tuple[GameSession, set[Client]]
 
 STATE: dict[str, StatePair] = {}
 
-Message = str
+WATCH_KEYS: dict[str, str] = {}
+"""Join key of the game that each watch key lets spectators follow."""
 
+ACTORS: dict[str, SessionActor] = {}
+"""Actor that applies the messages of each game, per join key."""
 
-class Kind(Enum):
-    INIT = "init"  # First player initialises the game, or others join.
-    JOINED = "joined"  # Notify all players that someone has joined.
-    BEGIN = "begin"  # First player begins the game after other palyers have joined.
-    NEXT_ROUND = "next_round"  # Betting is done and round starts.
-    SETUP = "setup"  # Signal players that the server is setting up the game.
-    STATE = "state"  # Player requested the latest state.
-    BET = "bet"  # Player places a bet. Only valid during the "betting" phase.
-    ACTION = "action"  # Player has played a card
-    INCR = "incr"
-    ERR = "error"
+FEEDS: dict[str, SpectatorFeed] = {}
+"""Views shared by the spectators of each game, per join key. Only games with spectators have one."""
 
-    def __str__(self) -> str:
-        return str(self.value)
+HOST = os.environ.get("SORCERER_HOST", "localhost")
+"""Interface the server listens on."""
 
+PORT = int(os.environ.get("SORCERER_PORT", "8765"))
 
-def error(message: str) -> Message:
-    return json.dumps(
-        {
-            "kind": Kind.ERR.value,
-            "message": message,
+MAX_MESSAGE_SIZE = int(os.environ.get("SORCERER_MAX_MESSAGE_SIZE", str(2**20)))
+"""Bytes in the largest message accepted from a player. Bigger messages close the connection."""
+
+COMPRESSION = os.environ.get("SORCERER_COMPRESSION", "deflate")
+"""Either ``deflate`` to compress messages with permessage-deflate, or ``none`` to save the CPU time."""
+
+PING_INTERVAL = float(os.environ.get("SORCERER_PING_INTERVAL", "20"))
+"""Seconds between keepalive pings. Pings are disabled when 0."""
+
+PING_TIMEOUT = float(os.environ.get("SORCERER_PING_TIMEOUT", "20"))
+"""Seconds to wait for a pong, before closing the connection."""
+
+WRITE_LIMIT = int(os.environ.get("SORCERER_WRITE_LIMIT", str(2**16)))
+"""Bytes buffered for each connection, before sending waits for the buffer to drain."""
+
+BACKLOG = int(os.environ.get("SORCERER_BACKLOG", "100"))
+"""Connections waiting to be accepted, before new ones are refused."""
+
+UVLOOP = os.environ.get("SORCERER_UVLOOP", "").lower() in ("1", "true", "yes")
+"""Run the server on the uvloop event loop, when it is installed."""
+
+SHARD_INDEX = 0
+SHARD_COUNT = 1
+"""When running as a worker in sharded mode, the shard that this process owns."""
+
+SHARD_PIPE: Connection | None = None
+"""When running as a worker in sharded mode, the pipe that the front listener hands over this shard's clients on."""
+
+SNAPSHOT_DIR = os.environ.get("SORCERER_SNAPSHOT_DIR")
+"""Directory where game sessions are snapshotted. Snapshots are disabled when not set."""
+
+SNAPSHOT_INTERVAL = float(os.environ.get("SORCERER_SNAPSHOT_INTERVAL", "5"))
+"""Seconds between session snapshots."""
+
+JOURNAL_DIR = os.environ.get("SORCERER_JOURNAL_DIR")
+"""Directory where the moves of game sessions are journaled. Journaling is disabled when not set."""
+
+JOURNAL_INTERVAL = float(os.environ.get("SORCERER_JOURNAL_INTERVAL", "0.05"))
+"""Seconds between journal writes. Moves made in between are written and fsynced together."""
+
+SESSION_IDLE_TTL = float(os.environ.get("SORCERER_SESSION_IDLE_TTL", "1800"))
+"""Seconds without any message from the players, after which a game session is closed."""
+
+SESSION_MAX_AGE = float(os.environ.get("SORCERER_SESSION_MAX_AGE", "21600"))
+"""Seconds after its creation at which a game session is closed, even when still played."""
+
+MAX_SESSIONS = int(os.environ.get("SORCERER_MAX_SESSIONS", "10000"))
+"""Number of game sessions this process runs at once. New games are refused past it."""
+
+MAX_MOVES = int(os.environ.get("SORCERER_MAX_MOVES", "10000"))
+"""Number of moves kept in memory per game session. Older moves are trimmed, once journaled."""
+
+REAP_INTERVAL = float(os.environ.get("SORCERER_REAP_INTERVAL", "30"))
+"""Seconds between checks for expired game sessions."""
+
+SESSIONS = SessionManager(
+    idle_ttl=SESSION_IDLE_TTL,
+    max_age=SESSION_MAX_AGE,
+    max_sessions=MAX_SESSIONS,
+    max_moves=MAX_MOVES,
+)
+
+METRICS_PORT = os.environ.get("SORCERER_METRICS_PORT")
+"""Local port where metrics are served over HTTP. Metrics are not served when not set."""
+
+LOG_SAMPLE = int(os.environ.get("SORCERER_LOG_SAMPLE", "100"))
+"""Only one in this many received messages is logged, at debug level."""
+
+LOOP_LAG_INTERVAL = 0.5
+"""Seconds between measurements of the event loop lag."""
+
+_LOG_RECEIVED = logs.Sampler(LOG_SAMPLE)
+
+
+@dataclass
+class ServerConfig:
+    """
+    Networking options of the server. The defaults come from the environment.
+    """
+
+    host: str = HOST
+    port: int = PORT
+    max_message_size: int = MAX_MESSAGE_SIZE
+    compression: str = COMPRESSION
+    ping_interval: float = PING_INTERVAL
+    ping_timeout: float = PING_TIMEOUT
+    write_limit: int = WRITE_LIMIT
+    backlog: int = BACKLOG
+    uvloop: bool = UVLOOP
+
+    def serve_options(self) -> dict[str, Any]:
+        """
+        Keyword arguments of ``websockets.serve``, without the host and port.
+        """
+        if self.compression not in ("deflate", "none"):
+            raise ValueError(f"Unknown compression: {self.compression}")
+
+        return {
+            "max_size": self.max_message_size,
+            "compression": "deflate" if self.compression == "deflate" else None,
+            "ping_interval": self.ping_interval or None,
+            "ping_timeout": self.ping_timeout or None,
+            "write_limit": self.write_limit,
+            "backlog": self.backlog,
         }
-    )
 
 
-def broadcast(clients: Iterable[Client], kind: Kind, data: dict) -> None:
-    data["kind"] = kind.value
-    message = json.dumps(data)
-    websockets.broadcast(get_websockets(clients), message)  # type: ignore
+_HANDLE_TIME = metrics.histogram("sorcerer_message_seconds", "Time to handle a player message.", ("kind",))
+_GAME_ERRORS = metrics.counter("sorcerer_game_errors_total", "Player messages that broke a game rule.", ("kind",))
+_PROTOCOL_ERRORS = metrics.counter("sorcerer_protocol_errors_total", "Messages that broke the protocol.", ("code",))
+_FAN_OUT = metrics.histogram(
+    "sorcerer_broadcast_recipients",
+    "Number of clients a message was broadcast to.",
+    buckets=(1, 2, 3, 4, 5, 6, 8, 10, 20, 50, 100),
+)
+_ENCODE_TIME = metrics.histogram("sorcerer_serialize_seconds", "Time to encode outgoing messages.")
+
+# Looked up once, so handling a message updates metrics without allocating.
+HANDLE_TIMES = {kind: _HANDLE_TIME.labels(kind.value) for kind in Kind}
+GAME_ERRORS = {kind: _GAME_ERRORS.labels(kind.value) for kind in Kind}
+PROTOCOL_ERRORS = {code: _PROTOCOL_ERRORS.labels(code) for code in protocol.ERROR_CODES}
+FAN_OUT = _FAN_OUT.labels()
+ENCODE_TIME = _ENCODE_TIME.labels()
 
 
-def get_websockets(
-    clients: Iterable[Client],
-) -> Generator[WebSocketServerProtocol, None, None]:
+def error(message: str) -> dict[str, Any]:
+    return {
+        "kind": Kind.ERR.value,
+        "message": message,
+    }
+
+
+def broadcast(clients: Collection[Client], kind: Kind, data: dict) -> None:
+    """
+    Send the same message to all the given clients. The message is encoded once per codec.
+    """
+    started = time.perf_counter()
+    messages: dict[str, Message] = {}
     for client in clients:
-        yield client.websocket
+        codec = client.codec
+        message = messages.get(codec.name)
+        if message is None:
+            message = messages[codec.name] = codec.frame(codec.splice({"kind": kind.value}, codec.dumps(data)))
+        client.outbox.put(message)
+    ENCODE_TIME.observe(time.perf_counter() - started)
+    FAN_OUT.observe(len(clients))
 
 
-async def play(
-    websocket: WebSocketServerProtocol,
-    player: PlayerSession,
-    game: GameSession,
-    clients: set[Client],
-) -> None:
+def broadcast_view(clients: Collection[Client], game: GameSession, kind: Kind) -> None:
     """
-    Game message pump.
+    Send every player their own full view of the game.
+
+    The parts of the view that are the same for all players, like the
+    monsters and judge, are encoded once. Only each player's private
+    fields, like their hand and bets, are encoded per player.
     """
-    async for message in websocket:
-        try:
-            data = json.loads(message)
-            logger.debug("Player-%d recv: %s", player.player_id, data)
-
-            try:
-                message_kind = Kind(data.get("kind"))
-            except ValueError:
-                logger.warning("Unknown message kind: %s", data.get("kind"))
-                await websocket.send(json.dumps({"kind": "error", "message": "Unknown message kind"}))
-                continue
-
-            if message_kind == Kind.INCR:
-                new_count = game.incr()
-                data = {"count": new_count, "player_id": player.player_id}
-                broadcast(clients, Kind.INCR, data)
-            elif message_kind == Kind.BEGIN:
-                # All players are ready. Begin the game.
-                if player.is_leader:
-                    broadcast(
-                        clients,
-                        Kind.SETUP,
-                        {"message": "Server is setting up the game"},
-                    )
-                    game.begin_game()
-                else:
-                    await websocket.send(error("Only the leader can begin the game"))
-            elif message_kind == Kind.STATE:
-                game_view = game.get_view(player.player_id, join_key=True)
-                await websocket.send(json.dumps({"kind": str(Kind.STATE), "game": game_view.to_dict()}))
-            elif message_kind == Kind.BET:
-                if not game.is_betting_phase:
-                    logger.warning(
-                        "Player-%d placed bet outside of betting phase",
-                        player.player_id,
-                    )
-                    await websocket.send(error("Bet must specify Monster IDs"))
-
-                elif monster_ids := data.get("monster_ids"):
-                    if isinstance(monster_ids, list):
-                        monser_bets = [str(monster_id) for monster_id in monster_ids]
-                        game.place_player_bets(player.player_id, monser_bets)
-
-                        game_view = game.get_view(player.player_id, join_key=True)
-                        await websocket.send(json.dumps({"kind": str(Kind.BET), "game": game_view.to_dict()}))
-                    else:
-                        await websocket.send(error("monster_ids must be an array"))
-
-                else:
-                    await websocket.send(error("Bet must specify Monster IDs"))
-
-            elif message_kind == Kind.NEXT_ROUND:
-                if not player.is_leader:
-                    logger.warning(
-                        "Player-%d attempted to begin fight phase, but isn't leader",
-                        player.player_id,
-                    )
-                    await websocket.send(error("You are not the leader"))
-
-                elif not game.is_betting_phase:
-                    logger.warning(
-                        "Player-%d began fight outside of betting phase",
-                        player.player_id,
-                    )
-                    await websocket.send(error("Game must be in betting phase"))
+    started = time.perf_counter()
+    public = game.get_view(SPECTATOR_ID, join_key=True, watch_key=True).to_dict()
+    for name in PRIVATE_VIEW_FIELDS:
+        del public[name]
+    public_bodies: dict[str, bytes] = {}  # Encoded once per codec
 
-                game.begin_round(0)
-                broadcast(clients, Kind.NEXT_ROUND, {})
+    for client in clients:
+        codec = client.codec
+        public_body = public_bodies.get(codec.name)
+        if public_body is None:
+            public_body = public_bodies[codec.name] = codec.dumps(public)
 
-            elif message_kind == Kind.ACTION:
-                card_id = data["card_id"]
-                target = data.get["target"]
+        game_view = game.get_view(client.player.player_id, join_key=True, watch_key=True)
+        private = {name: convert(getattr(game_view, name)) for name in PRIVATE_VIEW_FIELDS}
 
-                # Lookup target instance
-                target_entity = game.resolve_target(target)
+        # Following STATE replies are patches against this view
+        version = client.views.update({**private, **public}, resync=True)["version"]
 
-                # Lookup card instance that player is playing
-                spell_card = game.find_player_card(player.player_id, card_id)
+        game_body = codec.splice(private, public_body)
+        message = codec.nest({"kind": kind.value, "version": version}, "game", game_body)
+        client.outbox.put(codec.frame(message), view=True, full=True)
 
-                if spell_card is None:
-                    raise GameError(f"Player-{player.player_id} does not have card {card_id}")
+    ENCODE_TIME.observe(time.perf_counter() - started)
+    FAN_OUT.observe(len(clients))
 
-                context = EffectContext(game, spell_card, target, target_entity, caster=player)
-                on_cast(context)
 
-        except GameError as err:
-            logger.debug("Player-%d violated a game rule: %s", player.player_id, err.message)
-            data = err.to_dict()
-            message = json.dumps(data)
-            await websocket.send(message)
+def send_view(client: Client, game: GameSession, kind: Kind, *, resync: bool = False) -> None:
+    """
+    Send the player's view of the game, as a patch against the last view they received.
+    """
+    started = time.perf_counter()
+    game_view = game.get_view(client.player.player_id, join_key=True, watch_key=True)
+    data = client.views.update(game_view.to_dict(), resync=resync)
+    data["kind"] = kind.value
+    message = client.codec.encode(data)
+    ENCODE_TIME.observe(time.perf_counter() - started)
+    client.outbox.put(message, view=True, full=resync)
 
-        except json.JSONDecodeError:
-            # Not a JSON payload. Just Echo.
-            await websocket.send(message)
 
-        except ConnectionClosedOK:
-            logger.info("Connection closed OK")
+def owns(join_key: str) -> bool:
+    """
+    Whether the game with the given join key, or watch key, belongs to this process's shard.
+    """
+    return shard_for(join_key, SHARD_COUNT) == SHARD_INDEX
+
+
+def new_join_key() -> str:
+    """
+    Generate a join key for a new game, that maps to this process's shard.
+
+    Watch keys are generated the same way, so spectators are routed to the same shard as players.
+    """
+    while True:
+        join_key = secrets.token_urlsafe(12)
+        if shard_for(join_key, SHARD_COUNT) == SHARD_INDEX:
+            return join_key
+
+
+async def play(
+    client: Client,
+    game: GameSession,
+    clients: set[Client],
+) -> None:
+    """
+    Game message pump. Messages are applied by the session's actor, in the order they arrive.
+    """
+    async for message in client.websocket:
+        actor = ACTORS.get(game.join_key)
+        if actor is None or actor.closed:
+            # The session was closed
             break
 
+        SESSIONS.touch(game.join_key)
+        await actor.submit(client, message)
 
-async def start(websocket: WebSocketServerProtocol) -> None:
-    join_key = secrets.token_urlsafe(12)
-    game = GameSession(join_key)
+
+async def apply(
+    client: Client,
+    game: GameSession,
+    clients: set[Client],
+    message: str | bytes,
+) -> None:
+    """
+    Apply one message of a player to the game.
+    """
+    player = client.player
+    started = time.perf_counter()
+    message_kind = None
+    try:
+        command = decode_command(message)
+        message_kind = command.kind
+        if logger.isEnabledFor(logging.DEBUG) and _LOG_RECEIVED():
+            logger.debug("Player-%d recv: %s", player.player_id, command)
+
+        if isinstance(command, Incr):
+            new_count = game.incr()
+            data = {"count": new_count, "player_id": player.player_id}
+            broadcast(clients, Kind.INCR, data)
+        elif isinstance(command, Begin):
+            # All players are ready. Begin the game.
+            if player.is_leader:
+                broadcast(
+                    clients,
+                    Kind.SETUP,
+                    {"message": "Server is setting up the game"},
+                )
+                game.begin_game()
+                broadcast_view(clients, game, Kind.STATE)
+            else:
+                client.send(error("Only the leader can begin the game"))
+        elif isinstance(command, State):
+            # Clients ask for a full resync when they missed a version.
+            send_view(client, game, Kind.STATE, resync=command.resync)
+        elif isinstance(command, Advice):
+            # Advice is sampled once per move, so players that keep asking don't keep the CPU busy
+            move_count = game.move_count
+            reply = client.advice.get(move_count)
+            if reply is None:
+                # Sampling only reads the view, so it can run on a worker thread
+                advice = await offload(advisor.advise, game.get_view(player.player_id))
+                reply = {"kind": Kind.ADVICE.value, **to_dict(advice)}
+                client.advice.clear()
+                client.advice[move_count] = reply
+            client.send(reply)
+        elif isinstance(command, Bet):
+            if not game.is_betting_phase:
+                logger.warning(
+                    "Player-%d placed bet outside of betting phase",
+                    player.player_id,
+                )
+                client.send(error("Bet must specify Monster IDs"))
+
+            elif command.monster_ids:
+                game.place_player_bets(player.player_id, list(command.monster_ids))
+                send_view(client, game, Kind.BET)
+
+            else:
+                client.send(error("Bet must specify Monster IDs"))
+
+        elif isinstance(command, NextRound):
+            if not player.is_leader:
+                logger.warning(
+                    "Player-%d attempted to begin fight phase, but isn't leader",
+                    player.player_id,
+                )
+                client.send(error("You are not the leader"))
+
+            elif game.is_betting_phase:
+                game.begin_round(0)
+                broadcast_view(clients, game, Kind.NEXT_ROUND)
+
+            elif game.phase == Phase.FIGHT:
+                # Resolve all the spells of the round at once, and send everyone a single update.
+                # The next round is checked first, so a refused command changes nothing.
+                last_round = game.is_last_round
+                if not last_round:
+                    game.check_round_start()
+
+                end_round(game)
+                if not last_round:
+                    game.next_round()
+                broadcast_view(clients, game, Kind.NEXT_ROUND)
+
+            elif game.phase == Phase.END:
+                client.send(error("The game is over"))
+
+            else:
+                logger.warning(
+                    "Player-%d began fight outside of betting phase",
+                    player.player_id,
+                )
+                client.send(error("Game must be in betting or fight phase"))
+
+        elif isinstance(command, Action):
+            cast_spell(game, player, command.card_id, command.target)
+            send_view(client, game, Kind.ACTION)
+
+        else:
+            client.send(error(f"Unexpected message kind: {command.kind}"))
+
+    except ProtocolError as err:
+        logger.debug("Player-%d sent a bad message: %s", player.player_id, err.message)
+        PROTOCOL_ERRORS[err.code].inc()
+        client.send(err.to_dict())
+
+    except GameError as err:
+        logger.debug("Player-%d violated a game rule: %s", player.player_id, err.message)
+        if message_kind is not None:
+            GAME_ERRORS[message_kind].inc()
+        client.send(err.to_dict())
+
+    finally:
+        if message_kind is not None:
+            HANDLE_TIMES[message_kind].observe(time.perf_counter() - started)
+
+        feed = FEEDS.get(game.join_key)
+        if feed is not None:
+            feed.update()
+
+
+async def start(websocket: WebSocketServerProtocol, codec: Codec = JSON) -> None:
+    join_key = new_join_key()
+    if not SESSIONS.admit(join_key):
+        await websocket.send(codec.encode(error("Too many games are running, try again later")))
+        await websocket.close()
+        return
+
+    game = GameSession(join_key, watch_key=new_join_key())
 
     player = game.create_new_player(is_leader=True)
-    clients = {Client(player, websocket)}
+    client = Client(player, websocket, codec)
+    clients = {client}
 
-    STATE[join_key] = game, clients
+    add_session(game, clients)
 
     logger.info("Started game session: %s", id(game))
 
@@ -193,68 +444,382 @@ async def start(websocket: WebSocketServerProtocol) -> None:
         event = {
             "kind": "init",
             "join": join_key,
+            "watch": game.watch_key,
+            "player_id": player.player_id,
+            "resume": game.resume_token(player.player_id),
         }
-        await websocket.send(json.dumps(event))
+        client.send(event)
 
-        await play(websocket, player, game, clients)
+        await play(client, game, clients)
 
     finally:
         logger.info("Cleaning up game: %s", join_key)
-        del STATE[join_key]
+        client.outbox.close()
+        # The session may already be gone, when it expired
+        await close_session(join_key)
 
 
-async def join(websocket: WebSocketServerProtocol, join_key: str) -> None:
+async def join(
+    websocket: WebSocketServerProtocol,
+    join_key: str,
+    codec: Codec = JSON,
+    resume: str | None = None,
+) -> None:
+    """
+    Join a game as a new player during the lobby phase, or take a player's seat again with their resume token.
+
+    Players that resume keep their hand, bets and leadership, so they can play on
+    after they were disconnected, or after the server restarted.
+    """
     logger.debug("Available games: %s", list(STATE.keys()))
 
     try:
         game, clients = STATE[join_key]
     except KeyError:
         logger.info("Game not found for key: %s", join_key)
-        await websocket.send(error("Game not found"))
+        await websocket.send(codec.encode(error("Game not found")))
         await websocket.close()
         return
 
-    # Players must join during the lobby phase
-    if not game.is_lobby_phase:
-        await websocket.send(error("Game has already started"))
+    if resume is not None:
+        player = game.find_resuming_player(resume)
+        if player is None:
+            await websocket.send(codec.encode(error("Unknown resume token")))
+            await websocket.close()
+            return
+
+        if any(other.player is player for other in clients):
+            await websocket.send(codec.encode(error("Player is already connected")))
+            await websocket.close()
+            return
+
+    # New players must join during the lobby phase
+    elif not game.is_lobby_phase:
+        await websocket.send(codec.encode(error("Game has already started")))
         await websocket.close()
+        return
 
-    player = game.create_new_player(is_leader=False)
-    client = Client(player, websocket)
+    else:
+        player = game.create_new_player(is_leader=False)
+
+    client = Client(player, websocket, codec)
+    client.send(
+        {
+            "kind": Kind.INIT.value,
+            "join": join_key,
+            "player_id": player.player_id,
+            "resume": game.resume_token(player.player_id),
+        }
+    )
 
     # Register to receive broadcasted messages
     clients.add(client)
 
     broadcast(clients, Kind.JOINED, {"player_id": player.player_id})
 
+    if not game.is_lobby_phase:
+        # Players that resume a started game need its state to play on
+        send_view(client, game, Kind.STATE, resync=True)
+
     try:
-        await play(websocket, player, game, clients)
+        await play(client, game, clients)
 
     finally:
         clients.remove(client)
+        client.outbox.close()
+
+
+async def watch(websocket: WebSocketServerProtocol, watch_key: str, codec: Codec = JSON) -> None:
+    """
+    Follow a game as a spectator, until either side hangs up.
+    """
+    join_key = WATCH_KEYS.get(watch_key)
+    if join_key is None or join_key not in STATE:
+        logger.info("Game not found for watch key: %s", watch_key)
+        await websocket.send(codec.encode(error("Game not found")))
+        await websocket.close()
+        return
+
+    feed = FEEDS.get(join_key)
+    if feed is None:
+        feed = FEEDS[join_key] = SpectatorFeed(STATE[join_key][0])
+
+    await feed.serve(websocket, codec)
+
+
+def add_session(game: GameSession, clients: set[Client]) -> None:
+    STATE[game.join_key] = game, clients
+    ACTORS[game.join_key] = SessionActor(lambda client, message: apply(client, game, clients, message))
+    if game.watch_key is not None:
+        WATCH_KEYS[game.watch_key] = game.join_key
+
+
+async def close_session(join_key: str) -> set[Client]:
+    """
+    Forget a game session, and disconnect its spectators.
+
+    Returns the players that are still connected.
+    """
+    SESSIONS.remove(join_key)
+    game, clients = STATE.pop(join_key, (None, set()))
+    if game is not None and game.watch_key is not None:
+        WATCH_KEYS.pop(game.watch_key, None)
+
+    actor = ACTORS.pop(join_key, None)
+    if actor is not None:
+        actor.close()
+
+    feed = FEEDS.pop(join_key, None)
+    if feed is not None:
+        await feed.close()
+
+    return clients
 
 
 async def handle(websocket: WebSocketServerProtocol) -> None:
-    message = await websocket.recv()
-    cmd = json.loads(message)
-    assert cmd["kind"] == "init"
+    try:
+        cmd = decode_command(await websocket.recv())
+        if not isinstance(cmd, Init):
+            raise ProtocolError("The first message must be init", field="kind")
+        codec = find_codec(cmd.codec)
+    except ProtocolError as err:
+        PROTOCOL_ERRORS[err.code].inc()
+        await websocket.send(JSON.encode(err.to_dict()))
+        await websocket.close()
+        return
+
+    if codec is not JSON:
+        # Clients learn the tables of compact values before any message that uses them
+        await websocket.send(codec_message(codec))
 
     # Both start and join are handled on the same URI
     # because the join key is considered sensitive information.
     #
     # It is slightly more secure to send it in a message because
     # URIs are recorded in logs.
-    if "join" in cmd:
+    if cmd.join is not None:
         # Second player
-        await join(websocket, cmd["join"])
+        await join(websocket, cmd.join, codec, cmd.resume)
+    elif cmd.watch is not None:
+        await watch(websocket, cmd.watch, codec)
     else:
         # First player starts the game
-        await start(websocket)
+        await start(websocket, codec)
+
+
+def get_games() -> dict[str, GameSession]:
+    return {join_key: game for join_key, (game, _) in STATE.items()}
+
+
+metrics.gauge("sorcerer_sessions", "Game sessions running.", func=lambda: len(STATE))
+metrics.gauge(
+    "sorcerer_clients",
+    "Connected players, in all game sessions.",
+    func=lambda: sum(len(clients) for _, clients in STATE.values()),
+)
+metrics.gauge(
+    "sorcerer_actor_messages",
+    "Player messages waiting to be applied, in all game sessions.",
+    func=lambda: sum(len(actor) for actor in ACTORS.values()),
+)
+metrics.gauge(
+    "sorcerer_outbox_messages",
+    "Messages waiting to be sent, to all connected players.",
+    func=lambda: sum(len(client.outbox) for _, clients in STATE.values() for client in clients),
+)
+metrics.gauge(
+    "sorcerer_spectators",
+    "Connected spectators, in all game sessions.",
+    func=lambda: sum(len(feed) for feed in FEEDS.values()),
+)
+
+
+async def reap(journal: Journal | None = None) -> int:
+    """
+    Close the game sessions that expired, and trim the move history of the others.
+
+    Moves are only trimmed once they were journaled, when journaling is enabled.
+
+    Returns the number of sessions closed.
+    """
+    expired = SESSIONS.expired()
+
+    for join_key in expired:
+        clients = await close_session(join_key)
+        logger.info("Game %s expired, closing %d connections", join_key, len(clients))
+        await asyncio.gather(
+            *(client.websocket.close(1001, "Game session expired") for client in list(clients)),
+            return_exceptions=True,
+        )
+
+    for join_key, game in get_games().items():
+        archived = journal.journaled(join_key) if journal is not None else None
+        if trimmed := SESSIONS.trim(game, archived):
+            logger.debug("Trimmed %d moves of game %s", trimmed, join_key)
+
+    return len(expired)
+
+
+async def reap_forever(journal: Journal | None, interval: float) -> None:
+    """
+    Background task that periodically closes expired game sessions.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        await reap(journal)
 
 
-async def main():
-    async with serve(handle, "localhost", 8765):
+def restore(store: SnapshotStore | None, journal: Journal | None) -> int:
+    """
+    Restore the game sessions of this process's shard, from their snapshots and journals.
+
+    Restored games have no connected players, until they resume their seats with their tokens.
+
+    Returns the number of sessions restored.
+    """
+    games: dict[str, GameSession] = {}
+
+    if store is not None:
+        games.update(store.load(owns))
+
+    if journal is not None:
+        # Journals are written more often than snapshots, so they win when they have more moves.
+        for join_key, game in journal.restore(owns).items():
+            if join_key not in games or games[join_key].move_count < game.move_count:
+                games[join_key] = game
+
+        for game in games.values():
+            journal.resume(game)
+
+    # Restored sessions expire like new ones, when nobody joins them again.
+    for join_key, game in games.items():
+        if game.watch_key is None:
+            game.watch_key = new_join_key()
+        add_session(game, set())
+        SESSIONS.add(join_key)
+
+    return len(games)
+
+
+async def main(config: ServerConfig | None = None) -> None:
+    config = config or ServerConfig()
+
+    # Keep references to background tasks, so they aren't garbage collected.
+    tasks = []
+
+    store = SnapshotStore(Path(SNAPSHOT_DIR)) if SNAPSHOT_DIR else None
+    journal = Journal(Path(JOURNAL_DIR)) if JOURNAL_DIR else None
+
+    count = restore(store, journal)
+    logger.info("Restored %d game sessions", count)
+
+    if store is not None:
+        tasks.append(asyncio.create_task(store.save_forever(get_games, SNAPSHOT_INTERVAL)))
+    if journal is not None:
+        tasks.append(asyncio.create_task(journal.sync_forever(get_games, JOURNAL_INTERVAL)))
+
+    tasks.append(asyncio.create_task(reap_forever(journal, REAP_INTERVAL)))
+
+    if METRICS_PORT:
+        # Each shard's worker serves its own metrics, on the ports following the configured one
+        metrics_port = int(METRICS_PORT) + SHARD_INDEX
+        tasks.append(asyncio.create_task(metrics.serve_metrics("localhost", metrics_port)))
+        tasks.append(asyncio.create_task(metrics.monitor_loop_lag(LOOP_LAG_INTERVAL)))
+
+    if SHARD_PIPE is not None:
+        # The front listener accepts the clients of all shards, and hands over the ones of this shard
+        logger.info("Serving shard %d of %d", SHARD_INDEX, SHARD_COUNT)
+        await take_over(SHARD_PIPE, handle, config)
+        return
+
+    async with serve(handle, config.host, config.port, **config.serve_options()):
+        logger.info("Serving games on %s:%d", config.host, config.port)
         await asyncio.Future()  # run forever
 
 
-asyncio.run(main())
+def parse_args(argv: Sequence[str] | None = None) -> tuple[ServerConfig, Namespace]:
+    defaults = ServerConfig()
+
+    parser = ArgumentParser(description="Serve games over websockets")
+    parser.add_argument("--host", default=defaults.host)
+    parser.add_argument("--port", type=int, default=defaults.port)
+    parser.add_argument(
+        "--max-message-size",
+        type=int,
+        default=defaults.max_message_size,
+        help="Bytes in the largest message accepted from a player",
+    )
+    parser.add_argument(
+        "--compression",
+        choices=["deflate", "none"],
+        default=defaults.compression,
+        help="Compress messages, trading CPU time for bandwidth",
+    )
+    parser.add_argument(
+        "--ping-interval",
+        type=float,
+        default=defaults.ping_interval,
+        help="Seconds between keepalive pings, 0 to disable them",
+    )
+    parser.add_argument("--ping-timeout", type=float, default=defaults.ping_timeout)
+    parser.add_argument(
+        "--write-limit",
+        type=int,
+        default=defaults.write_limit,
+        help="Bytes buffered per connection before sending waits",
+    )
+    parser.add_argument("--backlog", type=int, default=defaults.backlog)
+    parser.add_argument(
+        "--uvloop",
+        action="store_true",
+        default=defaults.uvloop,
+        help="Run on the uvloop event loop",
+    )
+    logs.add_arguments(parser)
+
+    args = parser.parse_args(argv)
+    config = ServerConfig(
+        host=args.host,
+        port=args.port,
+        max_message_size=args.max_message_size,
+        compression=args.compression,
+        ping_interval=args.ping_interval,
+        ping_timeout=args.ping_timeout,
+        write_limit=args.write_limit,
+        backlog=args.backlog,
+        uvloop=args.uvloop,
+    )
+    return config, args
+
+
+def run(argv: Sequence[str] | None = None) -> None:
+    """
+    Entry point of the server.
+    """
+    config, args = parse_args(argv)
+    listener = logs.configure_from_args(args)
+    try:
+        serve_forever(config)
+    finally:
+        listener.stop()
+
+
+def serve_forever(config: ServerConfig) -> None:
+    """
+    Run the server on a new event loop, until interrupted.
+    """
+    if config.uvloop:
+        try:
+            import uvloop  # type: ignore[import-not-found]  # pylint: disable=import-outside-toplevel
+        except ImportError:
+            raise SystemExit("uvloop is not installed, install it or run without --uvloop") from None
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+
+    try:
+        asyncio.run(main(config))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    run()
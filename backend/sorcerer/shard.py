@@ -0,0 +1,407 @@
+"""
+Sharded server mode.
+
+Several worker processes run the regular game server, and each owns its
+own shard of game sessions. Clients all connect to one public listener,
+in the supervisor process. The listener answers the opening handshake,
+reads the first message, which holds the join key, and hands the socket
+over to the worker that owns the game. The worker carries on with the
+connection as if it had accepted it itself, so messages never go through
+a process that doesn't own their game, and only the public port is exposed.
+
+The listener negotiates the connection with the same options as the
+workers, and sends nothing but the handshake response. The worker reads
+the first message again from the bytes handed over with the socket, so
+both ends of the connection start from the same state.
+
+New games are handed out round robin. Workers only hand out join keys that
+map to themselves, so new games stay on the worker that started them.
+
+A supervisor restarts the workers that die. Restarted workers restore
+their own shard's sessions from the snapshots and journals, when those are
+enabled, so players can resume their games.
+"""
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import functools
+import itertools
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import threading
+import zlib
+from argparse import ArgumentParser, Namespace
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Sequence
+
+from websockets.datastructures import Headers
+from websockets.exceptions import InvalidHandshake, WebSocketException
+from websockets.extensions.base import ServerExtensionFactory
+from websockets.extensions.permessage_deflate import enable_server_permessage_deflate
+from websockets.frames import Opcode
+from websockets.http import USER_AGENT
+from websockets.legacy.framing import Frame
+from websockets.legacy.handshake import build_response, check_request
+from websockets.legacy.http import read_request
+from websockets.server import WebSocketServer, WebSocketServerProtocol
+
+from sorcerer import logs
+from sorcerer.codec import decode_command
+from sorcerer.protocol import Init, ProtocolError
+
+if TYPE_CHECKING:
+    from sorcerer.server import ServerConfig
+
+logger = logging.getLogger(__name__)
+
+RESTART_DELAY = 1.0
+"""Seconds between checks for dead workers, which also spaces out the restarts of a crashing worker."""
+
+OPEN_TIMEOUT = 10.0
+"""Seconds a client has to open its connection and send its first message, before it is dropped."""
+
+MAX_REQUEST_SIZE = 8192
+"""Bytes in the largest opening handshake request accepted."""
+
+# Workers start from a fresh interpreter, instead of a fork of the supervisor and its logging thread.
+_CONTEXT = multiprocessing.get_context("spawn")
+
+
+def shard_for(join_key: str, shards: int) -> int:
+    """
+    Determine the shard that owns the game with the given join key.
+
+    The mapping is stable across processes and restarts.
+    """
+    return zlib.crc32(join_key.encode("utf-8")) % shards
+
+
+def route_key(message: str | bytes) -> str | None:
+    """
+    The join key, or watch key, that the first message of a client refers to.
+
+    Returns ``None`` for new games, and for messages that aren't a valid init.
+    """
+    try:
+        command = decode_command(message)
+    except ProtocolError:
+        return None
+
+    if not isinstance(command, Init):
+        return None
+    return command.join if command.join is not None else command.watch
+
+
+def server_extensions(compression: str | None) -> Sequence[ServerExtensionFactory] | None:
+    """
+    The extensions a server negotiates, like ``websockets.serve`` with the given compression.
+    """
+    return enable_server_permessage_deflate(None) if compression == "deflate" else None
+
+
+@dataclass
+class Handoff:
+    """
+    A client connection that the front listener hands over to a worker.
+    """
+
+    sock: socket.socket
+    path: str
+    headers: list[tuple[str, str]]  # Request headers of the opening handshake
+    data: bytes  # Bytes received after the handshake, starting with the first message
+
+
+# =============================================================================
+# Front listener
+
+
+class Front:
+    """
+    Public listener that hands each client connection over to the worker that owns its game.
+    """
+
+    def __init__(self, config: ServerConfig, pipes: list[Connection]) -> None:
+        self.config = config
+        self.pipes = pipes  # Sending end of each worker's handoff pipe, replaced when the worker restarts
+        self._extensions = server_extensions(config.serve_options()["compression"])
+        self._round_robin = itertools.count()
+        self._tasks: set[asyncio.Task] = set()
+
+    async def serve(self, listener: socket.socket) -> None:
+        """
+        Accept connections on a listening socket, until cancelled.
+        """
+        loop = asyncio.get_running_loop()
+        listener.setblocking(False)
+
+        while True:
+            sock, _ = await loop.sock_accept(listener)
+            task = asyncio.create_task(self.route(sock))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def route(self, sock: socket.socket) -> None:
+        """
+        Open a client connection, and hand it over to a worker.
+        """
+        try:
+            handoff, key = await asyncio.wait_for(self._open(sock), OPEN_TIMEOUT)
+        except (OSError, EOFError, asyncio.TimeoutError) as err:
+            logger.debug("Client left during the opening handshake: %r", err)
+            sock.close()
+            return
+
+        if handoff is None:
+            sock.close()
+            return
+
+        shard = shard_for(key, len(self.pipes)) if key is not None else next(self._round_robin) % len(self.pipes)
+        try:
+            # The socket is duplicated for the worker when it is sent
+            self.pipes[shard].send(handoff)
+        except OSError as err:
+            logger.warning("Shard %d can't take connections: %s", shard, err)
+        finally:
+            sock.close()
+
+    async def _open(self, sock: socket.socket) -> tuple[Handoff | None, str | None]:
+        loop = asyncio.get_running_loop()
+        buffer = bytearray()
+
+        async def receive(size: int) -> None:
+            while len(buffer) < size:
+                data = await loop.sock_recv(sock, 65536)
+                if not data:
+                    raise EOFError("Connection closed")
+                buffer.extend(data)
+
+        while (end := buffer.find(b"\r\n\r\n")) < 0:
+            if len(buffer) > MAX_REQUEST_SIZE:
+                await self._reject(sock, "Request is too large")
+                return None, None
+            await receive(len(buffer) + 1)
+        end += 4
+
+        stream = asyncio.StreamReader()
+        stream.feed_data(bytes(buffer[:end]))
+        stream.feed_eof()
+        try:
+            path, request_headers = await read_request(stream)
+            accept_key = check_request(request_headers)
+        except (InvalidHandshake, ValueError) as err:
+            await self._reject(sock, str(err))
+            return None, None
+
+        extensions_header, extensions = WebSocketServerProtocol.process_extensions(request_headers, self._extensions)
+
+        response_headers = Headers()
+        build_response(response_headers, accept_key)
+        if extensions_header is not None:
+            response_headers["Sec-WebSocket-Extensions"] = extensions_header
+        response_headers["Date"] = email.utils.formatdate(usegmt=True)
+        response_headers["Server"] = USER_AGENT
+        await loop.sock_sendall(sock, b"HTTP/1.1 101 Switching Protocols\r\n" + response_headers.serialize())
+
+        offset = end
+
+        async def read(size: int) -> bytes:
+            nonlocal offset
+            await receive(offset + size)
+            offset += size
+            return bytes(buffer[offset - size : offset])
+
+        try:
+            frame = await Frame.read(read, mask=True, max_size=self.config.max_message_size, extensions=extensions)
+        except (WebSocketException, ValueError):
+            # The worker reads the frame again, and closes the connection as it should
+            frame = None
+
+        key = None
+        if frame is not None and frame.fin and frame.opcode in (Opcode.TEXT, Opcode.BINARY):
+            message = frame.data.decode("utf-8", "replace") if frame.opcode == Opcode.TEXT else frame.data
+            key = route_key(message)
+
+        return Handoff(sock, path, list(request_headers.raw_items()), bytes(buffer[end:])), key
+
+    @staticmethod
+    async def _reject(sock: socket.socket, reason: str) -> None:
+        body = f"Failed to open a WebSocket connection: {reason}.\n".encode()
+        response_headers = Headers(
+            [("Content-Length", str(len(body))), ("Content-Type", "text/plain"), ("Connection", "close")]
+        )
+        loop = asyncio.get_running_loop()
+        await loop.sock_sendall(sock, b"HTTP/1.1 400 Bad Request\r\n" + response_headers.serialize() + body)
+
+
+# =============================================================================
+# Workers
+
+
+class HandedOverProtocol(WebSocketServerProtocol):
+    """
+    Server side of a connection whose opening handshake the front listener answered.
+    """
+
+    def __init__(self, *args: Any, handoff: Handoff, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.handoff = handoff
+
+    async def handshake(
+        self,
+        origins: Any = None,
+        available_extensions: Any = None,
+        available_subprotocols: Any = None,
+        extra_headers: Any = None,
+    ) -> str:
+        # The client already got the response. Negotiate the same extensions the front listener did.
+        self.path = self.handoff.path
+        self.request_headers = Headers(self.handoff.headers)
+        _, self.extensions = self.process_extensions(self.request_headers, available_extensions)
+        self.connection_open()
+        return self.path
+
+
+async def take_over(
+    pipe: Connection,
+    handler: Callable[[WebSocketServerProtocol], Awaitable[None]],
+    config: ServerConfig,
+) -> None:
+    """
+    Serve the client connections that the front listener hands over on a pipe, until cancelled.
+    """
+    loop = asyncio.get_running_loop()
+    handoffs: asyncio.Queue[Handoff | None] = asyncio.Queue()
+
+    def receive() -> None:
+        try:
+            while True:
+                loop.call_soon_threadsafe(handoffs.put_nowait, pipe.recv())
+        except (EOFError, OSError):
+            loop.call_soon_threadsafe(handoffs.put_nowait, None)
+
+    # Reading the pipe blocks, in a thread that mustn't hold up the worker's exit
+    threading.Thread(target=receive, name="sorcerer-handoffs", daemon=True).start()
+
+    options = config.serve_options()
+    del options["backlog"]  # Only the front listener accepts connections
+    options["extensions"] = server_extensions(options.pop("compression"))
+    ws_server = WebSocketServer()
+
+    while (handoff := await handoffs.get()) is not None:
+        factory = functools.partial(HandedOverProtocol, handler, ws_server, handoff=handoff, **options)
+        try:
+            _, ws_protocol = await loop.connect_accepted_socket(factory, handoff.sock)
+        except OSError as err:
+            logger.debug("Handed over connection was closed: %r", err)
+            continue
+
+        if handoff.data:
+            ws_protocol.data_received(handoff.data)
+
+    logger.error("Front listener closed the handoff pipe")
+
+
+def run_worker(index: int, shards: int, pipe: Connection, config: ServerConfig, args: Namespace) -> None:
+    """
+    Entry point of a worker process. Serves games for one shard.
+    """
+    from sorcerer import server  # pylint: disable=import-outside-toplevel
+
+    server.SHARD_INDEX = index
+    server.SHARD_COUNT = shards
+    server.SHARD_PIPE = pipe
+
+    listener = logs.configure_from_args(args)
+    try:
+        server.serve_forever(config)
+    finally:
+        listener.stop()
+
+
+def start_worker(index: int, shards: int, config: ServerConfig, args: Namespace) -> tuple[BaseProcess, Connection]:
+    """
+    Start the worker of a shard, and return it with the sending end of its handoff pipe.
+    """
+    receiver, sender = _CONTEXT.Pipe(duplex=False)
+    process = _CONTEXT.Process(
+        target=run_worker,
+        args=(index, shards, receiver, config, args),
+        name=f"sorcerer-shard-{index}",
+        daemon=True,
+    )
+    process.start()
+    receiver.close()
+    return process, sender
+
+
+async def supervise(shards: int, config: ServerConfig, args: Namespace) -> None:
+    """
+    Run one worker per shard behind the front listener, and restart the workers that exit, until cancelled.
+    """
+    listener = socket.create_server((config.host, config.port), backlog=config.backlog)
+
+    started = [start_worker(index, shards, config, args) for index in range(shards)]
+    workers = [process for process, _ in started]
+    front = Front(config, [pipe for _, pipe in started])
+    serving = asyncio.create_task(front.serve(listener))
+    logger.info("Serving %d shards on %s:%d", shards, config.host, config.port)
+
+    try:
+        while True:
+            await asyncio.sleep(RESTART_DELAY)
+            for index, process in enumerate(workers):
+                if not process.is_alive():
+                    logger.warning("Shard %d exited with code %s, restarting it", index, process.exitcode)
+                    front.pipes[index].close()
+                    workers[index], front.pipes[index] = start_worker(index, shards, config, args)
+    finally:
+        serving.cancel()
+        listener.close()
+        for process in workers:
+            process.terminate()
+
+
+# =============================================================================
+# Entry point
+
+
+def parse_args(argv: Sequence[str] | None = None) -> tuple[ServerConfig, Namespace, int]:
+    """
+    Parse the shard options, and pass the others on to the server of each worker.
+
+    Returns the server config and options, and the number of shards.
+    """
+    from sorcerer import server  # pylint: disable=import-outside-toplevel
+
+    parser = ArgumentParser(description="Serve games sharded over multiple worker processes")
+    parser.add_argument("--shards", type=int, default=os.cpu_count() or 1)
+    args, server_argv = parser.parse_known_args(argv)
+    if args.shards < 1:
+        parser.error("--shards must be at least 1")
+
+    config, server_args = server.parse_args(server_argv)
+    return config, server_args, args.shards
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    config, args, shards = parse_args(argv)
+    listener = logs.configure_from_args(args)
+
+    # Being terminated stops the workers too, like an interrupt
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        asyncio.run(supervise(shards, config, args))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        listener.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+"""
+Headless game simulator.
+
+Plays complete games without the websocket server, using scripted
+player policies, and aggregates statistics over many games for
+balancing monsters and cards.
+
+Games are spread over a pool of worker processes. Every game is seeded
+from the base seed and its index, so results do not depend on the
+number of workers.
+"""
+from __future__ import annotations
+
+import logging
+import os
+import random
+import time
+from abc import ABC, abstractmethod
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Sequence
+
+from sorcerer.advisor import BetAdvisor
+from sorcerer.game.cards import Card
+from sorcerer.game.effects import cast_spell, end_round
+from sorcerer.game.game_session import MAX_ROUNDS, GameSession, PlayerSession
+from sorcerer.game.interface import Target, TargetKind
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 500
+"""Number of games sent to a worker process at a time."""
+
+
+# =============================================================================
+# Policies
+
+
+class Policy(ABC):
+    """
+    Decides the moves of a simulated player.
+    """
+
+    name: str
+
+    @abstractmethod
+    def choose_bets(self, game: GameSession, player: PlayerSession, rng: random.Random) -> list[str]:
+        """
+        Choose the monster IDs to bet on during the betting phase.
+        """
+        raise NotImplementedError()
+
+    @abstractmethod
+    def choose_cast(self, game: GameSession, player: PlayerSession, rng: random.Random) -> tuple[Card, Target] | None:
+        """
+        Choose a spell card from the player's hand, and its target.
+
+        Returns ``None`` to pass the turn.
+        """
+        raise NotImplementedError()
+
+
+class RandomPolicy(Policy):
+    """
+    Bets on random monsters, and casts random spells on random monsters.
+    """
+
+    name = "random"
+
+    def choose_bets(self, game: GameSession, player: PlayerSession, rng: random.Random) -> list[str]:
+        count = rng.randint(1, min(3, len(game.monsters)))
+        return [monster.monster_id for monster in rng.sample(game.monsters, count)]
+
+    def choose_cast(self, game: GameSession, player: PlayerSession, rng: random.Random) -> tuple[Card, Target] | None:
+        cards = [card for card in player.cards if card.target == TargetKind.MONSTER]
+        if not cards or not game.monsters:
+            return None
+
+        monster = rng.choice(game.monsters)
+        return rng.choice(cards), Target(TargetKind.MONSTER, monster.monster_id)
+
+
+class SaboteurPolicy(Policy):
+    """
+    Bets on the strongest monster, and weakens the strongest monster it didn't bet on.
+    """
+
+    name = "saboteur"
+
+    def choose_bets(self, game: GameSession, player: PlayerSession, rng: random.Random) -> list[str]:
+        strongest = max(game.monsters, key=lambda monster: (monster.health, rng.random()))
+        return [strongest.monster_id]
+
+    def choose_cast(self, game: GameSession, player: PlayerSession, rng: random.Random) -> tuple[Card, Target] | None:
+        cards = [card for card in player.cards if card.target == TargetKind.MONSTER]
+        rivals = [monster for monster in game.monsters if monster.monster_id not in player.monster_bets]
+        if not cards or not rivals:
+            return None
+
+        monster = max(rivals, key=lambda rival: rival.health)
+        return cards[0], Target(TargetKind.MONSTER, monster.monster_id)
+
+
+class AdvisorPolicy(SaboteurPolicy):
+    """
+    Bets on the monster with the best expected prize according to the bet advisor, and plays like the saboteur.
+    """
+
+    name = "advisor"
+    samples = 200
+
+    def __init__(self) -> None:
+        # No cache, so advice doesn't depend on the games played before.
+        self.advisor = BetAdvisor(cache_size=0)
+
+    def choose_bets(self, game: GameSession, player: PlayerSession, rng: random.Random) -> list[str]:
+        advice = self.advisor.advise(game.get_view(player.player_id), budget=None, samples=self.samples, rng=rng)
+        return advice.best(1)
+
+
+POLICIES: dict[str, type[Policy]] = {
+    RandomPolicy.name: RandomPolicy,
+    SaboteurPolicy.name: SaboteurPolicy,
+    AdvisorPolicy.name: AdvisorPolicy,
+}
+
+
+# =============================================================================
+# Games
+
+
+@dataclass
+class GameResult:
+    monster_ids: list[str]
+    winners: list[str]
+    casts: int
+    deck_exhausted: bool
+
+
+def play_game(seed: int, policies: Sequence[Policy]) -> GameResult:
+    """
+    Play one complete game, with one player per policy.
+    """
+    _, result = simulate(seed, policies)
+    return result
+
+
+def simulate(
+    seed: int,
+    policies: Sequence[Policy],
+    *,
+    resolve: Callable[[GameSession], object] = end_round,
+) -> tuple[GameSession, GameResult]:
+    """
+    Play one complete game, and keep the session with its move history.
+
+    Arguments:
+        resolve: Ends each fight round. The vectorized engine only collects the
+            spells cast instead, and resolves the rounds of many games at once.
+    """
+    rng = random.Random(seed)
+
+    game = GameSession(join_key=f"sim-{seed}", seed=seed)
+    seats = [(game.create_new_player(is_leader=index == 0), policy) for index, policy in enumerate(policies)]
+
+    game.begin_game()
+    deck_exhausted = not game.spells
+
+    for player, policy in seats:
+        game.place_player_bets(player.player_id, policy.choose_bets(game, player, rng))
+
+    casts = 0
+    for round in range(MAX_ROUNDS):
+        if round == 0:
+            game.begin_round(0)
+        else:
+            game.next_round()
+            deck_exhausted = deck_exhausted or not game.spells
+
+        # Every player gets one turn, starting with the first player
+        first = next(index for index, (player, _) in enumerate(seats) if player.player_id == game.turn)
+
+        for player, policy in seats[first:] + seats[:first]:
+            game.turn = player.player_id
+            choice = policy.choose_cast(game, player, rng)
+            if choice is None:
+                continue
+
+            spell_card, target = choice
+            cast_spell(game, player, spell_card.card_id, target)
+            casts += 1
+
+        resolve(game)
+
+    return game, GameResult(
+        monster_ids=[monster.monster_id for monster in game.monsters],
+        winners=winning_monsters(game),
+        casts=casts,
+        deck_exhausted=deck_exhausted,
+    )
+
+
+def winning_monsters(game: GameSession) -> list[str]:
+    """
+    The monsters with the most health left at the end of the game.
+    """
+    if not game.monsters:
+        return []
+
+    best = max(monster.health for monster in game.monsters)
+    return [monster.monster_id for monster in game.monsters if monster.health == best]
+
+
+# =============================================================================
+# Batches
+
+
+@dataclass
+class SimStats:
+    games: int = 0
+    casts: int = 0
+    deck_exhausted: int = 0
+    appearances: Counter[str] = field(default_factory=Counter)
+    wins: Counter[str] = field(default_factory=Counter)
+
+    def add(self, result: GameResult) -> None:
+        self.games += 1
+        self.casts += result.casts
+        self.deck_exhausted += result.deck_exhausted
+        self.appearances.update(result.monster_ids)
+        self.wins.update(result.winners)
+
+    def merge(self, other: SimStats) -> None:
+        self.games += other.games
+        self.casts += other.casts
+        self.deck_exhausted += other.deck_exhausted
+        self.appearances.update(other.appearances)
+        self.wins.update(other.wins)
+
+    def win_rates(self) -> dict[str, float]:
+        """
+        Fraction of the games a monster appeared in, that it won.
+        """
+        return {monster_id: self.wins[monster_id] / count for monster_id, count in sorted(self.appearances.items())}
+
+
+def game_seed(seed: int, index: int) -> int:
+    return seed * 1_000_003 + index
+
+
+def run_chunk(seed: int, start: int, stop: int, policy_names: Sequence[str]) -> SimStats:
+    """
+    Play the games with indices in ``[start, stop)``. Runs inside a worker process.
+    """
+    policies = [POLICIES[name]() for name in policy_names]
+    stats = SimStats()
+
+    for index in range(start, stop):
+        stats.add(play_game(game_seed(seed, index), policies))
+
+    return stats
+
+
+def run_batch(games: int, policy_names: Sequence[str], *, seed: int = 0, workers: int | None = None) -> SimStats:
+    """
+    Play a batch of games, fanned out over a pool of worker processes.
+
+    Arguments:
+        games: Number of games to play.
+        policy_names: The policy of each seat at the table.
+        seed: Base seed, from which each game's seed is derived.
+        workers: Number of worker processes. Defaults to the number of CPUs.
+            When ``1``, games are played in this process.
+    """
+    for name in policy_names:
+        if name not in POLICIES:
+            raise ValueError(f"Unknown policy: {name}")
+
+    chunks = [(seed, start, min(start + CHUNK_SIZE, games), policy_names) for start in range(0, games, CHUNK_SIZE)]
+    stats = SimStats()
+
+    if workers == 1:
+        for chunk in chunks:
+            stats.merge(run_chunk(*chunk))
+        return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for chunk_stats in executor.map(run_chunk, *zip(*chunks)):
+            stats.merge(chunk_stats)
+
+    return stats
+
+
+def report(stats: SimStats, elapsed: float, workers: int) -> str:
+    games = max(stats.games, 1)
+    lines = [
+        f"Games:              {stats.games}",
+        f"Elapsed:            {elapsed:.2f}s",
+        f"Games/second:       {stats.games / elapsed:.0f} ({stats.games / elapsed / workers:.0f} per core)",
+        f"Avg casts/game:     {stats.casts / games:.2f}",
+        f"Deck exhausted:     {stats.deck_exhausted / games:.1%}",
+        "",
+        "Monster              Games      Wins  Win rate",
+    ]
+    for monster_id, rate in stats.win_rates().items():
+        lines.append(f"{monster_id:<18} {stats.appearances[monster_id]:>7} {stats.wins[monster_id]:>9} {rate:>9.1%}")
+
+    return "\n".join(lines)
+
+
+def main(games: int, policy_names: Sequence[str], *, seed: int = 0, workers: int | None = None) -> None:
+    workers = workers or os.cpu_count() or 1
+
+    start = time.perf_counter()
+    stats = run_batch(games, policy_names, seed=seed, workers=workers)
+    elapsed = time.perf_counter() - start
+
+    print(report(stats, elapsed, workers))
@@ -0,0 +1,131 @@
+"""
+Spectators, who watch a game without taking part in it.
+
+Spectators see the public view of the game, without any player's hand or
+bets. All the spectators of a game share one feed, which encodes the view
+once per change and codec, however many spectators there are.
+
+Changes are coalesced: a spectator that is still sending an older view
+skips straight to the latest one, so a slow connection never queues up
+views, or holds up the players.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from websockets.exceptions import ConnectionClosed
+from websockets.server import WebSocketServerProtocol
+
+from sorcerer.codec import JSON, Codec, Message
+from sorcerer.game.game_session import GameSession
+from sorcerer.protocol import Kind
+
+logger = logging.getLogger(__name__)
+
+SPECTATOR_ID = -1
+"""Player ID of the spectators' view, which matches no player."""
+
+
+class SpectatorFeed:
+    """
+    The latest encoded public view of one game, and the spectators following it.
+    """
+
+    def __init__(self, game: GameSession) -> None:
+        self.game = game
+        self.version = 0
+        self.closed = False
+        self._spectators: dict[WebSocketServerProtocol, Codec] = {}
+        self._view: dict | None = None  # Latest published view
+        self._messages: dict[str, Message] = {}  # Latest view, per codec that encoded it
+        self._move_count = -1  # Move count of the game when the view was last encoded
+        self._scheduled = False
+        self._published = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self._spectators)
+
+    def update(self) -> None:
+        """
+        Publish the game's view, if it changed since the last update and anyone is watching.
+
+        The view is encoded once the current event loop iteration is done, so all
+        the changes made by one burst of messages are encoded together.
+        """
+        if self._scheduled or not self._spectators or self.game.move_count == self._move_count:
+            return
+
+        self._scheduled = True
+        asyncio.get_running_loop().call_soon(self._publish)
+
+    def _publish(self) -> None:
+        self._scheduled = False
+        if self.closed:
+            return
+
+        self._move_count = self.game.move_count
+        self.version += 1
+        self._view = self.game.get_view(SPECTATOR_ID, watch_key=True).to_dict()
+        self._messages = {}
+        self._notify()
+
+    def message(self, codec: Codec = JSON) -> Message:
+        """
+        The latest view, encoded with the given codec. Each codec encodes each version once.
+        """
+        message = self._messages.get(codec.name)
+        if message is None:
+            header = {"kind": Kind.WATCH.value, "version": self.version}
+            message = codec.frame(codec.nest(header, "game", codec.dumps(self._view)))
+            self._messages[codec.name] = message
+        return message
+
+    def _notify(self) -> None:
+        # Wake up every spectator waiting for a change, and let later ones wait for the next.
+        published, self._published = self._published, asyncio.Event()
+        published.set()
+
+    async def close(self) -> None:
+        """
+        Stop the feed, and close the connections of all its spectators.
+        """
+        self.closed = True
+        self._notify()
+        await asyncio.gather(
+            *(websocket.close(1001, "Game is over") for websocket in list(self._spectators)),
+            return_exceptions=True,
+        )
+
+    async def serve(self, websocket: WebSocketServerProtocol, codec: Codec = JSON) -> None:
+        """
+        Send the game's view to a spectator until either the spectator or the feed is gone.
+        """
+        self._spectators[websocket] = codec
+        sender = asyncio.create_task(self._send(websocket, codec))
+        try:
+            # Spectators have nothing to say, the connection is only read to notice it close.
+            async for _ in websocket:
+                pass
+        except ConnectionClosed:
+            pass
+        finally:
+            sender.cancel()
+            self._spectators.pop(websocket, None)
+
+    async def _send(self, websocket: WebSocketServerProtocol, codec: Codec) -> None:
+        # The first spectator of a game waits for its view to be encoded
+        self.update()
+
+        sent = 0
+        while not self.closed:
+            if self.version == sent:
+                await self._published.wait()
+                continue
+
+            # Skip any versions published while the last one was sent
+            sent = self.version
+            try:
+                await websocket.send(self.message(codec))
+            except ConnectionClosed:
+                return
@@ -0,0 +1,116 @@
+"""
+Persistence of game sessions on local disk, so games survive a server restart.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from pathlib import Path
+from typing import Callable, Mapping
+
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.snapshot import SnapshotError, dump_session, load_session
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUFFIX = ".snap"
+
+YIELD_EVERY = 200
+"""Number of sessions to snapshot before yielding to other tasks on the event loop."""
+
+
+class SnapshotStore:
+    """
+    A directory of session snapshots, one file per join key.
+
+    Only sessions that changed since the last save are written.
+    """
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._written: dict[str, int] = {}  # Hash of the last snapshot written per join key
+
+    def path(self, join_key: str) -> Path:
+        # Join keys are URL safe base64, which is also safe for file names.
+        return self.directory / f"{join_key}{SNAPSHOT_SUFFIX}"
+
+    async def save(self, games: Mapping[str, GameSession]) -> int:
+        """
+        Snapshot the given sessions, and delete the snapshots of sessions that are gone.
+
+        Sessions are encoded on the event loop, so each snapshot is consistent,
+        but files are written on a worker thread.
+
+        Returns the number of snapshot files written.
+        """
+        changed: dict[str, bytes] = {}
+
+        for index, (join_key, game) in enumerate(list(games.items())):
+            data = dump_session(game)
+            if self._written.get(join_key) != hash(data):
+                changed[join_key] = data
+
+            if index % YIELD_EVERY == YIELD_EVERY - 1:
+                await asyncio.sleep(0)
+
+        removed = [join_key for join_key in self._written if join_key not in games]
+
+        await asyncio.to_thread(self._write, changed, removed)
+
+        for join_key in removed:
+            del self._written[join_key]
+        for join_key, data in changed.items():
+            self._written[join_key] = hash(data)
+
+        return len(changed)
+
+    def _write(self, changed: Mapping[str, bytes], removed: list[str]) -> None:
+        for join_key, data in changed.items():
+            # Write to a temporary file first, so a crash never leaves a half written snapshot.
+            path = self.path(join_key)
+            temp_path = path.with_suffix(".tmp")
+            temp_path.write_bytes(data)
+            os.replace(temp_path, path)
+
+        for join_key in removed:
+            self.path(join_key).unlink(missing_ok=True)
+
+    def load(self, owns: Callable[[str], bool] | None = None) -> dict[str, GameSession]:
+        """
+        Restore the sessions in the directory. Corrupt snapshots are skipped.
+
+        Arguments:
+            owns: Whether to restore the session with a given join key. The snapshots of
+                other sessions are left alone, for the processes that own them.
+        """
+        games = {}
+
+        for path in self.directory.glob(f"*{SNAPSHOT_SUFFIX}"):
+            if owns is not None and not owns(path.stem):
+                continue
+
+            data = path.read_bytes()
+            try:
+                game = load_session(data)
+            except SnapshotError as err:
+                logger.warning("Skipping snapshot %s: %s", path, err)
+                continue
+
+            games[game.join_key] = game
+            self._written[game.join_key] = hash(data)
+
+        return games
+
+    async def save_forever(self, get_games: Callable[[], Mapping[str, GameSession]], interval: float) -> None:
+        """
+        Background task that periodically snapshots the sessions returned by ``get_games``.
+        """
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                count = await self.save(get_games())
+                logger.debug("Wrote %d session snapshots", count)
+            except OSError as err:
+                logger.error("Failed to write session snapshots: %s", err)
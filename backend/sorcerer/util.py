@@ -126,7 +126,3 @@ class Foobar(Base):
 
     def __str__(self) -> str:
         return "foobar"
-
-
-print(str(Foobar()), ", ", repr(Foobar()))
-print(f"{Foobar()} {Foobar()!r}")
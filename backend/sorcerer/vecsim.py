@@ -0,0 +1,439 @@
+"""
+Vectorized fight engine for Monte Carlo simulations.
+
+Many games are resolved at once, as NumPy arrays with one row per game:
+the monsters in the arena, their health, the spells cast each round and
+their targets. Rounds are resolved for all games together, following the
+same rules as :func:`sorcerer.game.effects.end_round`: given the same
+fight, both engines end it with exactly the same monster health.
+
+Only the resolution is vectorized. Each game is set up, dealt and played
+by its own seeded session and policies, exactly like
+:func:`sorcerer.sim.simulate`, so ``sim -e vector`` plays the same games as
+:func:`sorcerer.sim.run_batch` for the same seed. The only choice that
+depends on the outcome of earlier rounds, the saboteur's target, is made
+during the resolution.
+
+NumPy is an optional dependency, only needed for this engine.
+"""
+from __future__ import annotations
+
+import logging
+import time
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover
+    np = None  # type: ignore
+
+from sorcerer.game.cards import get_card_types, get_standard_deck
+from sorcerer.game.effects import Dispel, Eject, card_effects, judge_effect, monster_effects
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.judges import get_judge_types
+from sorcerer.game.monsters import get_monster_types
+from sorcerer.sim import POLICIES, Policy, SaboteurPolicy, SimStats, game_seed, report, simulate
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 10_000
+"""Number of games resolved at once. Bounds the memory used by the spells collected before resolution."""
+
+NO_JUDGEMENT, DISPEL, EJECT = 0, 1, 2
+NO_SPELL = -1
+
+VECTOR_POLICIES = ("random", "saboteur")
+"""Policies of ``sorcerer.sim`` that have a vectorized implementation."""
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("The vectorized engine needs NumPy, install it with: pip install numpy")
+
+
+# =============================================================================
+# Tables
+
+
+@dataclass(frozen=True)
+class Tables:
+    """
+    The game types as arrays, indexed by type.
+    """
+
+    monster_ids: list[str]
+    monster_power: np.ndarray  # Starting health per monster type
+    monster_sign: np.ndarray  # -1 when the monster inverts the power of spells
+    spell_ids: list[str]
+    spell_power: np.ndarray  # Round end power per spell type
+    judge_ids: list[str]
+    judge_mana: np.ndarray  # Mana limit per judge type
+    judge_illegal: np.ndarray  # Judges by spell types, true when the spell breaks the judge's rules
+    judge_judgement: np.ndarray  # Judgement passed per judge type
+    deck: np.ndarray  # Spell type of each card in the standard deck
+
+
+@lru_cache(maxsize=None)
+def tables() -> Tables:
+    """
+    Build the type tables from the game types.
+
+    Raises ``ValueError`` for game rules the engine can't vectorize, like spells that stay on monsters.
+    """
+    _require_numpy()
+
+    # Type attributes are read from instances, because they are declared as dataclass fields
+    monsters = [monster_type() for monster_type in get_monster_types()]
+    monster_signs = []
+    for monster in monsters:
+        effects = monster_effects(monster)
+        sign = 1
+        for effect in effects:
+            sign = effect.transform_power(sign)
+        if sign not in (1, -1) or any(effect.transform_power(2) != 2 * effect.transform_power(1) for effect in effects):
+            raise ValueError(f"Monster effects of '{monster.monster_id}' are not a sign change")
+        monster_signs.append(sign)
+
+    card_types = get_card_types()
+    for card_type in card_types:
+        if card_type.card_type.spell_kind != "direct":
+            raise ValueError(f"Only direct spells can be vectorized: '{card_type.card_type.spell_id}'")
+
+    judges = [judge_type() for judge_type in get_judge_types()]
+    judgements = []
+    for judge in judges:
+        judgement = judge_effect(judge)
+        if judgement is None:
+            judgements.append(NO_JUDGEMENT)
+        elif isinstance(judgement, Dispel):
+            judgements.append(DISPEL)
+        elif isinstance(judgement, Eject):
+            judgements.append(EJECT)
+        else:
+            raise ValueError(f"Judgement of '{judge.judge_id}' can't be vectorized")
+
+    spell_index = {card_type.card_type.spell_id: index for index, card_type in enumerate(card_types)}
+
+    return Tables(
+        monster_ids=[monster.monster_id for monster in monsters],
+        monster_power=np.array([monster.power for monster in monsters], dtype=np.int64),
+        monster_sign=np.array(monster_signs, dtype=np.int64),
+        spell_ids=list(spell_index),
+        spell_power=np.array(
+            [sum(effect.round_power() for effect in card_effects(card_type(0))) for card_type in card_types],
+            dtype=np.int64,
+        ),
+        judge_ids=[judge.judge_id for judge in judges],
+        judge_mana=np.array([judge.mana_limit for judge in judges], dtype=np.int64),
+        judge_illegal=np.array(
+            [
+                [
+                    card_type.card_type.spell_kind in judge.disallows
+                    or (judge.disallow_forbidden and card_type.card_type.forbidden)
+                    for card_type in card_types
+                ]
+                for judge in judges
+            ],
+            dtype=bool,
+        ),
+        judge_judgement=np.array(judgements, dtype=np.int64),
+        deck=np.array([spell_index[card.spell_id] for card in get_standard_deck()], dtype=np.int64),
+    )
+
+
+# =============================================================================
+# Fights
+
+
+@dataclass
+class Fights:
+    """
+    A batch of games, with one row per game.
+    """
+
+    monsters: np.ndarray  # (games, monsters) monster type indices
+    judges: np.ndarray  # (games,) judge type indices
+    spells: np.ndarray  # (games, rounds, casts) spell type indices, NO_SPELL for passed turns
+    targets: np.ndarray  # (games, rounds, casts) target monster positions in the arena
+
+
+def start_health(monsters: np.ndarray, types: Tables) -> np.ndarray:
+    return types.monster_power[monsters]
+
+
+def resolve_round(
+    health: np.ndarray,
+    monsters: np.ndarray,
+    judges: np.ndarray,
+    spells: np.ndarray,
+    targets: np.ndarray,
+    types: Tables,
+) -> None:
+    """
+    Apply the spells cast in one round to the health of the monsters, in place.
+
+    The arguments are the rows of the games, with the spells and targets of this round only.
+    """
+    cast = spells != NO_SPELL
+    power = np.where(cast, types.spell_power[spells], 0)
+    illegal = cast & types.judge_illegal[judges[:, None], spells]
+
+    # One hot (games, casts, monsters) matrix of the monster each spell was cast on
+    on_monster = (targets[:, :, None] == np.arange(health.shape[1])).astype(np.int64)
+
+    total = np.einsum("kc,kcm->km", power, on_monster)
+    illegal_total = np.einsum("kc,kcm->km", np.where(illegal, power, 0), on_monster)
+    illegal_mana = np.einsum("kc,kcm->km", np.where(illegal, np.abs(power), 0), on_monster)
+
+    judgement = types.judge_judgement[judges][:, None]
+    judged = illegal_mana > types.judge_mana[judges][:, None]
+    total = np.where(judged & (judgement == DISPEL), total - illegal_total, total)
+    total = np.where(judged & (judgement == EJECT), 0, total)
+
+    health += types.monster_sign[monsters] * total
+
+
+def resolve(fights: Fights, types: Tables | None = None) -> np.ndarray:
+    """
+    Play out all the rounds of the fights, and return the final health of the monsters.
+    """
+    types = types or tables()
+    health = start_health(fights.monsters, types)
+
+    for round in range(fights.spells.shape[1]):
+        resolve_round(health, fights.monsters, fights.judges, fights.spells[:, round], fights.targets[:, round], types)
+
+    return health
+
+
+def winners(health: np.ndarray) -> np.ndarray:
+    """
+    Mask of the monsters with the most health left in each game.
+    """
+    return health == health.max(axis=1, keepdims=True)
+
+
+def fights_from_sessions(sessions: Sequence[GameSession], types: Tables | None = None) -> Fights:
+    """
+    Record the fights of played game sessions from their move history.
+
+    Rounds are delimited by ``end_round`` moves.
+    """
+    types = types or tables()
+    monster_index = {monster_id: index for index, monster_id in enumerate(types.monster_ids)}
+    spell_index = {spell_id: index for index, spell_id in enumerate(types.spell_ids)}
+    judge_index = {judge_id: index for index, judge_id in enumerate(types.judge_ids)}
+
+    games = []
+    for game in sessions:
+        begin = next(move for move in game.moves if move.move_id == "begin_game")
+        monster_ids = begin.kwargs["monster_ids"]
+        deck = {card_id: spell_id for card_id, spell_id in begin.kwargs["deck"]}
+
+        rounds: list[list[tuple[int, int]]] = [[]]
+        for move in game.moves:
+            if move.move_id == "cast":
+                spell = spell_index[deck[move.kwargs["card_id"]]]
+                rounds[-1].append((spell, monster_ids.index(move.kwargs["target_id"])))
+            elif move.move_id == "end_round":
+                rounds.append([])
+
+        monsters = [monster_index[monster_id] for monster_id in monster_ids]
+        games.append((monsters, judge_index[begin.kwargs["judge_id"]], rounds[:-1]))
+
+    return Fights(
+        monsters=np.array([monsters for monsters, _, _ in games], dtype=np.int64),
+        judges=np.array([judge for _, judge, _ in games], dtype=np.int64),
+        spells=_pad([[[spell for spell, _ in casts] for casts in rounds] for _, _, rounds in games], NO_SPELL),
+        targets=_pad([[[target for _, target in casts] for casts in rounds] for _, _, rounds in games], 0),
+    )
+
+
+def _pad(rows: list[list[list[int]]], fill: int) -> np.ndarray:
+    """
+    Pack the casts of each round of each game into a (games, rounds, casts) array, padded with ``fill``.
+    """
+    round_count = max((len(rounds) for rounds in rows), default=0)
+    cast_count = max((len(casts) for rounds in rows for casts in rounds), default=0)
+
+    result = np.full((len(rows), round_count, cast_count), fill, dtype=np.int64)
+    for row, rounds in enumerate(rows):
+        for round, casts in enumerate(rounds):
+            result[row, round, : len(casts)] = casts
+
+    return result
+
+
+# =============================================================================
+# Monte Carlo
+
+
+@dataclass
+class Deals:
+    """
+    A batch of games played up to the resolution of their rounds, with one row per game.
+    """
+
+    fights: Fights  # The targets of the saboteurs are chosen during the resolution
+    saboteur_bets: np.ndarray  # (games, rounds, casts) arena position a saboteur caster bet on, NO_SPELL otherwise
+    casts: int
+    deck_exhausted: int
+
+
+class RoundCollector:
+    """
+    Ends the fight rounds of a session without resolving them, and collects the spells cast instead.
+    """
+
+    def __init__(self, policies: Sequence[Policy], types: Tables) -> None:
+        self.saboteurs = {seat for seat, policy in enumerate(policies) if isinstance(policy, SaboteurPolicy)}
+        self.spell_index = {spell_id: index for index, spell_id in enumerate(types.spell_ids)}
+        self.rounds: list[list[tuple[int, int, int]]] = []  # Spell type, target and saboteur bet of each cast
+        self._collected = 0  # Moves of the session already collected
+
+    def __call__(self, game: GameSession) -> None:
+        monster_ids = [monster.monster_id for monster in game.monsters]
+        spell_ids = {card.card_id: card.spell_id for monster in game.monsters for card in monster.cards}
+        seats = {player.player_id: seat for seat, player in enumerate(game.players)}
+
+        casts = []
+        for move in game.moves[self._collected :]:
+            if move.move_id != "cast":
+                continue
+
+            seat = seats[move.kwargs["player_id"]]
+            bet = monster_ids.index(game.players[seat].monster_bets[0]) if seat in self.saboteurs else NO_SPELL
+            spell = self.spell_index[spell_ids[move.kwargs["card_id"]]]
+            casts.append((spell, monster_ids.index(move.kwargs["target_id"]), bet))
+
+        self.rounds.append(casts)
+
+        # Only direct spells can be vectorized, and they are all used up at the end of the round
+        used_up = [card for monster in game.monsters for card in monster.cards]
+        for card in used_up:
+            game.discard_card(card)
+
+        # The session's random generator is seeded from its number of moves, so the round still ends with a move
+        game.move("end_round", round=game.round, discarded=[card.card_id for card in used_up])
+        self._collected = game.move_count
+
+
+def deal(seeds: Sequence[int], policy_names: Sequence[str], types: Tables | None = None) -> Deals:
+    """
+    Play one game per seed up to the resolution of its rounds, like :func:`sorcerer.sim.simulate`.
+
+    Besides the saboteur's targets, none of the choices of the players depend on the
+    health of the monsters, so they are the same as when the rounds are resolved.
+    """
+    types = types or tables()
+    monster_index = {monster_id: index for index, monster_id in enumerate(types.monster_ids)}
+    judge_index = {judge_id: index for index, judge_id in enumerate(types.judge_ids)}
+    policies = [POLICIES[name]() for name in policy_names]
+
+    games = []
+    casts = 0
+    deck_exhausted = 0
+    for seed in seeds:
+        collector = RoundCollector(policies, types)
+        game, result = simulate(seed, policies, resolve=collector)
+        assert game.judge is not None
+
+        casts += result.casts
+        deck_exhausted += result.deck_exhausted
+        monsters = [monster_index[monster.monster_id] for monster in game.monsters]
+        games.append((monsters, judge_index[game.judge.judge_id], collector.rounds))
+
+    rounds = [rounds for _, _, rounds in games]
+    fights = Fights(
+        monsters=np.array([monsters for monsters, _, _ in games], dtype=np.int64),
+        judges=np.array([judge for _, judge, _ in games], dtype=np.int64),
+        spells=_pad([[[spell for spell, _, _ in casts] for casts in row] for row in rounds], NO_SPELL),
+        targets=_pad([[[target for _, target, _ in casts] for casts in row] for row in rounds], 0),
+    )
+    saboteur_bets = _pad([[[bet for _, _, bet in casts] for casts in row] for row in rounds], NO_SPELL)
+
+    return Deals(fights=fights, saboteur_bets=saboteur_bets, casts=casts, deck_exhausted=deck_exhausted)
+
+
+def play(deals: Deals, types: Tables | None = None) -> np.ndarray:
+    """
+    Resolve all the rounds of the dealt games, and return the final health of the monsters.
+
+    Saboteurs weaken the strongest monster they didn't bet on, as of the start of the round.
+    """
+    types = types or tables()
+    fights = deals.fights
+    health = start_health(fights.monsters, types)
+    positions = np.arange(health.shape[1])
+
+    for round in range(fights.spells.shape[1]):
+        bets = deals.saboteur_bets[:, round]
+        # The first of equals, like ``max``
+        rivals = np.where(positions == bets[:, :, None], np.iinfo(np.int64).min, health[:, None, :])
+        targets = np.where(bets != NO_SPELL, np.argmax(rivals, axis=2), fights.targets[:, round])
+
+        resolve_round(health, fights.monsters, fights.judges, fights.spells[:, round], targets, types)
+
+    return health
+
+
+def play_batch(seeds: Sequence[int], policy_names: Sequence[str], types: Tables) -> SimStats:
+    """
+    Play a batch of games at once, one per seed, with one seat per policy.
+    """
+    deals = deal(seeds, policy_names, types)
+    health = play(deals, types)
+    arena = deals.fights.monsters
+
+    won = winners(health)
+    monster_count = len(types.monster_ids)
+    appearances = np.bincount(arena.ravel(), minlength=monster_count)
+    wins = np.bincount(arena[won], minlength=monster_count)
+
+    stats = SimStats(games=len(seeds), casts=deals.casts, deck_exhausted=deals.deck_exhausted)
+    for index, monster_id in enumerate(types.monster_ids):
+        if appearances[index]:
+            stats.appearances[monster_id] = int(appearances[index])
+        if wins[index]:
+            stats.wins[monster_id] = int(wins[index])
+
+    return stats
+
+
+def run_batch(games: int, policy_names: Sequence[str], *, seed: int = 0) -> SimStats:
+    """
+    Play a batch of games with the vectorized engine.
+
+    Arguments:
+        games: Number of games to play.
+        policy_names: The policy of each seat at the table.
+        seed: Base seed, from which each game's seed is derived like in :func:`sorcerer.sim.run_batch`.
+    """
+    _require_numpy()
+
+    for name in policy_names:
+        if name not in VECTOR_POLICIES:
+            raise ValueError(f"Policy can't be vectorized: {name}")
+
+    types = tables()
+    stats = SimStats()
+
+    for start in range(0, games, BATCH_SIZE):
+        seeds = [game_seed(seed, index) for index in range(start, min(start + BATCH_SIZE, games))]
+        stats.merge(play_batch(seeds, policy_names, types))
+
+    return stats
+
+
+def main(games: int, policy_names: Sequence[str], *, seed: int = 0) -> None:
+    start = time.perf_counter()
+    stats = run_batch(games, policy_names, seed=seed)
+    elapsed = time.perf_counter() - start
+
+    print(report(stats, elapsed, workers=1))
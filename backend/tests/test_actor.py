@@ -0,0 +1,35 @@
+import asyncio
+import threading
+
+from sorcerer.actor import SessionActor, offload
+
+
+def test_messages_apply_in_order() -> None:
+    applied = []
+
+    async def handler(client: str, message: int) -> None:
+        if message == 2:
+            raise ValueError("Broken message")
+        # Awaiting in a handler must not let later messages overtake it
+        await asyncio.sleep(0.01 if message == 1 else 0)
+        applied.append((client, message))
+
+    async def scenario() -> None:
+        actor = SessionActor(handler)
+        await asyncio.gather(*(actor.submit(f"player-{index % 2}", index) for index in range(5)))
+        while len(actor):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        actor.close()
+
+    asyncio.run(scenario())
+
+    assert applied == [("player-0", 0), ("player-1", 1), ("player-1", 3), ("player-0", 4)]
+
+
+def test_offload() -> None:
+    assert asyncio.run(offload(sum, [1, 2, 3])) == 6
+
+
+def test_offload_off_loop() -> None:
+    assert asyncio.run(offload(threading.get_ident)) != threading.get_ident(), "Work runs on a worker thread by default"
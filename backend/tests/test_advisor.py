@@ -0,0 +1,61 @@
+import random
+
+import pytest
+
+from sorcerer.advisor import BetAdvisor, _Playout
+from sorcerer.game.game_session import MAX_ROUNDS, GameSession, GameView
+from sorcerer.sim import play_game, AdvisorPolicy, RandomPolicy
+
+
+@pytest.fixture(scope="function")
+def view() -> GameView:
+    game = GameSession(join_key="****", seed=1)
+    for index in range(3):
+        game.create_new_player(is_leader=index == 0)
+    game.begin_game()
+
+    return game.get_view(0)
+
+
+def test_advice(view: GameView) -> None:
+    advice = BetAdvisor().advise(view, budget=None, samples=500, rng=random.Random(1))
+
+    assert advice.samples == 500
+    assert [monster.monster_id for monster in advice.monsters] == [monster.monster_id for monster in view.monsters]
+    assert sum(monster.win_probability for monster in advice.monsters) == pytest.approx(1.0)
+    assert advice.best(2)[0] == max(advice.monsters, key=lambda monster: monster.expected_prize).monster_id
+
+
+def test_advice_is_refined(view: GameView) -> None:
+    advisor = BetAdvisor()
+
+    assert advisor.advise(view, budget=None, samples=100).samples == 100
+    assert advisor.advise(view, budget=None, samples=100).samples == 200, "The same state continues sampling"
+
+    view.monsters[0].health += 1
+    assert advisor.advise(view, budget=None, samples=100).samples == 100
+
+
+def test_advice_budget(view: GameView) -> None:
+    advice = BetAdvisor().advise(view, budget=0.002)
+    assert advice.samples > 0
+
+
+def test_clear_favourite(view: GameView) -> None:
+    view.monsters[0].health = 100
+
+    advice = BetAdvisor().advise(view, budget=None, samples=50)
+    assert advice.best() == [view.monsters[0].monster_id]
+    assert advice.monsters[0].win_probability == 1.0
+
+
+def test_advisor_policy() -> None:
+    policies = [AdvisorPolicy(), RandomPolicy()]
+    assert play_game(5, policies) == play_game(5, policies)
+
+
+def test_rounds_left(view: GameView) -> None:
+    assert _Playout(view).rounds == MAX_ROUNDS, "All the rounds are left in the betting phase"
+
+    view.game_round = 1
+    assert _Playout(view).rounds == MAX_ROUNDS - 1
@@ -1,6 +1,14 @@
-from sorcerer.game.cards import Firebolt
+from sorcerer.game.cards import Firebolt, find_card_type
 
 
 def test_card_effect_definition():
     firebolt = Firebolt(card_id=0)
     assert len(firebolt.effect_defs) > 0
+
+
+def test_card_types_are_shared():
+    first, second = Firebolt(card_id=0), Firebolt(card_id=1, owner=0)
+
+    assert not hasattr(first, "__dict__"), "Cards must stay slotted"
+    assert first.card_type is second.card_type
+    assert find_card_type(first.spell_id) is Firebolt
@@ -0,0 +1,104 @@
+import asyncio
+import json
+
+import pytest
+from websockets.client import connect
+from websockets.server import serve
+
+from sorcerer import server
+from sorcerer.codec import JSON, TABLES, compact, decode_command, expand, find_codec
+from sorcerer.protocol import Bet, ProtocolError
+
+msgpack = pytest.importorskip("msgpack")
+
+MSGPACK = find_codec("msgpack")
+
+
+def test_compact() -> None:
+    monster_id = TABLES["monster_id"][1]
+    data = {
+        "kind": "state",
+        "monsters": [{"monster_id": monster_id, "health": 3}],
+        "monster_bets": [monster_id, "unknown"],
+        "message": "state",
+    }
+
+    compacted = compact(data)
+
+    assert compacted["kind"] == TABLES["kind"].index("state")
+    assert compacted["monsters"] == [{"monster_id": 1, "health": 3}]
+    assert compacted["monster_bets"] == [1, "unknown"], "Unknown values are sent as they are"
+    assert compacted["message"] == "state", "Only the fields in the tables are compacted"
+    assert expand(compacted) == data
+
+
+@pytest.mark.parametrize("fields", [1, 20, 70000])
+def test_splice(fields: int) -> None:
+    head = {"kind": "state", "version": 2}
+    body = {f"field_{index}": index for index in range(fields)}
+
+    for codec in (JSON, MSGPACK):
+        message = codec.splice(head, codec.dumps(body))
+        nested = codec.nest(head, "game", codec.dumps(body))
+
+        if codec is JSON:
+            assert json.loads(message) == {**head, **body}
+            assert json.loads(nested) == {**head, "game": body}
+        else:
+            assert expand(msgpack.unpackb(message)) == {**head, **body}
+            assert expand(msgpack.unpackb(nested)) == {**head, "game": body}
+
+
+def test_decode_binary() -> None:
+    monster_ids = TABLES["monster_ids"][:2]
+    message = msgpack.packb({"kind": TABLES["kind"].index("bet"), "monster_ids": [0, 1]})
+
+    assert decode_command(message) == Bet(monster_ids=tuple(monster_ids))
+    assert decode_command(json.dumps({"kind": "bet", "monster_ids": monster_ids})) == Bet(tuple(monster_ids))
+
+    with pytest.raises(ProtocolError) as info:
+        decode_command(b"\xc1")
+    assert info.value.code == "malformed"
+
+
+def test_unknown_codec() -> None:
+    with pytest.raises(ProtocolError) as info:
+        find_codec("cbor")
+    assert info.value.field == "codec"
+
+
+def test_msgpack_connection() -> None:
+    async def recv(websocket) -> dict:
+        message = await asyncio.wait_for(websocket.recv(), timeout=2)
+        assert isinstance(message, bytes)
+        return msgpack.unpackb(message)
+
+    async def scenario() -> tuple[dict, dict, dict, dict]:
+        async with serve(server.handle, "localhost", 0) as ws_server:
+            port = list(ws_server.sockets)[0].getsockname()[1]
+            uri = f"ws://localhost:{port}"
+
+            async with connect(uri) as leader, connect(uri) as player:
+                await leader.send(json.dumps({"kind": "init", "codec": "msgpack"}))
+                tables = await recv(leader)
+                init = expand(await recv(leader))
+
+                # Players that didn't ask for a codec still get JSON
+                await player.send(json.dumps({"kind": "init", "join": init["join"]}))
+                await asyncio.wait_for(player.recv(), timeout=2)  # Their own init, with their resume token
+                joined = json.loads(await asyncio.wait_for(player.recv(), timeout=2))
+
+                await leader.send(msgpack.packb({"kind": TABLES["kind"].index("state")}))
+                joined_leader = expand(await recv(leader))
+                state = expand(await recv(leader))
+
+            return tables, init, joined, {"joined": joined_leader, "state": state}
+
+    tables, init, joined, received = asyncio.run(scenario())
+
+    assert tables == {"kind": "codec", "codec": "msgpack", "tables": TABLES}
+    assert init["kind"] == "init"
+    assert joined == {"kind": "joined", "player_id": 1}
+    assert received["joined"] == joined, "Messages have the same shape with every codec"
+    assert received["state"]["kind"] == "state"
+    assert received["state"]["game"]["player_count"] == 2
@@ -0,0 +1,59 @@
+
+from sorcerer.delta import ViewTracker, apply_patch, diff
+from sorcerer.game.cards import Firebolt
+from sorcerer.game.game_session import GameSession
+
+
+def test_diff_roundtrip():
+    old = {"phase": "lobby", "others": [{"player_id": 1}], "a/b": 1, "gone": True}
+    new = {"phase": "betting", "others": [{"player_id": 1}, {"player_id": 2}], "a/b": 2, "added": None}
+
+    patch = diff(old, new)
+
+    assert {"op": "replace", "path": "/phase", "value": "betting"} in patch
+    assert {"op": "replace", "path": "/a~1b", "value": 2} in patch
+    assert {"op": "remove", "path": "/gone"} in patch
+    assert apply_patch(old, patch) == new
+    assert old["phase"] == "lobby", "Patch must not mutate the original document"
+
+
+def test_diff_list_shrink():
+    old = {"cards": [1, 2, 3, 4]}
+    new = {"cards": [1, 5]}
+
+    assert apply_patch(old, diff(old, new)) == new
+
+
+def test_view_tracker():
+
+    game = GameSession("****", seed=1)
+    player = game.create_new_player(is_leader=True)
+    game.create_new_player()
+    game.begin_game()
+
+    tracker = ViewTracker()
+    first = tracker.update(game.get_view(player.player_id).to_dict())
+    assert first["version"] == 1
+    assert "game" in first
+
+    client_view = first["game"]
+
+    # Spell cast on a monster
+    monster = game.monsters[0]
+    monster.cards.append(Firebolt(card_id=100))
+
+    second = tracker.update(game.get_view(player.player_id).to_dict())
+    assert second["base"] == 1
+    assert second["version"] == 2
+    assert all(op["path"].startswith("/monsters/0/cards") for op in second["patch"])
+
+    client_view = apply_patch(client_view, second["patch"])
+    assert client_view == game.get_view(player.player_id).to_dict()
+
+    # Nothing changed
+    third = tracker.update(game.get_view(player.player_id).to_dict())
+    assert third == {"version": 2, "base": 2, "patch": []}
+
+    resync = tracker.update(game.get_view(player.player_id).to_dict(), resync=True)
+    assert resync["version"] == 3
+    assert resync["game"] == client_view
@@ -0,0 +1,48 @@
+import json
+
+import pytest
+
+from sorcerer import encoding
+from sorcerer.game.game_session import PRIVATE_VIEW_FIELDS, GameSession
+from sorcerer.serialize import convert
+
+
+@pytest.fixture(params=encoding.available_backends())
+def backend(request):
+    encoding.use_backend(request.param)
+    yield request.param
+    encoding.use_backend(encoding.available_backends()[-1])
+
+
+def test_splice(backend: str) -> None:
+    body = encoding.dumps({"b": [1, 2], "c": "x"})
+
+    assert json.loads(encoding.splice({"a": 1}, body)) == {"a": 1, "b": [1, 2], "c": "x"}
+    assert json.loads(encoding.splice({"a": 1}, b"{}")) == {"a": 1}
+    assert encoding.splice({}, body) == body
+
+
+def test_nest(backend: str) -> None:
+    body = encoding.dumps({"b": 2})
+
+    assert json.loads(encoding.nest({"a": 1}, "game", body)) == {"a": 1, "game": {"b": 2}}
+    assert json.loads(encoding.nest({}, "game", body)) == {"game": {"b": 2}}
+
+
+def test_spliced_view(backend: str) -> None:
+
+    game = GameSession("****", seed=1)
+    game.create_new_player(is_leader=True)
+    game.create_new_player()
+    game.begin_game()
+
+    public = game.get_view(-1).to_dict()
+    for name in PRIVATE_VIEW_FIELDS:
+        del public[name]
+    public_body = encoding.dumps(public)
+
+    for player in game.players:
+        game_view = game.get_view(player.player_id)
+        private = {name: convert(getattr(game_view, name)) for name in PRIVATE_VIEW_FIELDS}
+
+        assert json.loads(encoding.splice(private, public_body)) == json.loads(json.dumps(game_view.to_dict()))
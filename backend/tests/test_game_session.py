@@ -1,7 +1,9 @@
 import logging
-import random
 
-from sorcerer.game.game_session import GameSession
+import pytest
+
+from sorcerer.game.cards import Firebolt
+from sorcerer.game.game_session import CardLocation, GameSession
 
 logger = logging.getLogger(__name__)
 JOIN_KEY = "****"
@@ -22,9 +24,7 @@ def test_begin_game() -> None:
 
 
 def test_betting_phase() -> None:
-    random.seed("test_betting_phase")
-
-    game = GameSession(JOIN_KEY)
+    game = GameSession(JOIN_KEY, seed=6)
 
     player_1 = game.create_new_player(is_leader=True)
     player_2 = game.create_new_player(is_leader=False)
@@ -42,9 +42,7 @@ def test_betting_phase() -> None:
 
 
 def test_begin_fight() -> None:
-    random.seed("test_begin_fight")
-
-    game = GameSession(JOIN_KEY)
+    game = GameSession(JOIN_KEY, seed=106)
 
     player_1 = game.create_new_player(is_leader=True)
     player_2 = game.create_new_player(is_leader=False)
@@ -64,3 +62,96 @@ def test_begin_fight() -> None:
     assert game.is_fight_phase
     assert game.round == 0
     assert game.turn == 1  # random
+
+
+def test_indexes() -> None:
+    game = GameSession(JOIN_KEY, seed=3)
+
+    player_1 = game.create_new_player(is_leader=True)
+    player_2 = game.create_new_player(is_leader=False)
+    assert game.find_player(player_2.player_id) is player_2
+    assert game.find_player(99) is None
+
+    game.begin_game()
+
+    for monster in game.monsters:
+        assert game.find_monster(monster.monster_id) is monster
+
+    card = player_1.cards[0]
+    assert game.find_player_card(player_1.player_id, card.card_id) is card
+    assert game.find_player_card(player_2.player_id, card.card_id) is None
+    assert game.resolve_spell_card(card.card_id) is card
+
+    # Casting a card moves it from the hand to the monster
+    monster = game.monsters[0]
+    game.attach_card(card, monster)
+
+    assert card not in player_1.cards
+    assert monster.cards == [card]
+    assert game.find_player_card(player_1.player_id, card.card_id) is None
+    assert game.resolve_spell_card(card.card_id) is card
+
+    location = game.find_card_location(card.card_id)
+    assert location is not None and location.holder is monster
+
+
+def test_seeded_sessions() -> None:
+    games = [GameSession(JOIN_KEY, seed=42), GameSession(JOIN_KEY, seed=42), GameSession(JOIN_KEY, seed=43)]
+    for game in games:
+        game.create_new_player(is_leader=True)
+        game.create_new_player()
+        game.begin_game()
+
+    same, also_same, different = (game.moves for game in games)
+    assert same == also_same
+    assert same != different
+
+
+def deal_one_by_one(game: GameSession, hand_size: int) -> None:
+    """
+    The original dealing algorithm, drawing one card at a time.
+    """
+    players = game.players.copy()
+    index = 0
+
+    while players:
+        if not game.spells:
+            break
+
+        player = players[index]
+
+        if player.card_count < hand_size:
+            spell_card = game.try_draw_spell()
+            if spell_card:
+                player.cards.append(spell_card)
+                game._card_locations[spell_card.card_id] = CardLocation(spell_card, player)
+            index += 1
+        else:
+            players.remove(player)
+
+        if players:
+            index = index % len(players)
+
+
+@pytest.mark.parametrize("players, hand_size, deck_size", [(2, 8, 15), (3, 8, 40), (6, 5, 15), (4, 8, 0)])
+def test_deal_cards_order(players: int, hand_size: int, deck_size: int) -> None:
+    """Dealing in slices must hand out exactly the same cards as dealing one card at a time."""
+    tables = []
+    for deal in (deal_one_by_one, GameSession.deal_cards):
+        game = GameSession(JOIN_KEY, seed=0)
+        for index in range(players):
+            game.create_new_player(is_leader=index == 0)
+        game.spells = [Firebolt(card_id) for card_id in range(deck_size)]
+
+        # Uneven hands, like after a round where some players didn't cast.
+        for player in game.players[::2]:
+            if game.spells:
+                player.cards.append(game.spells.pop(0))
+
+        deal(game, hand_size)
+        tables.append(game)
+
+    one_by_one, sliced = tables
+    assert [player.cards for player in sliced.players] == [player.cards for player in one_by_one.players]
+    assert sliced.spells == one_by_one.spells
+    assert sliced._card_locations == one_by_one._card_locations
@@ -0,0 +1,83 @@
+import asyncio
+from pathlib import Path
+
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.snapshot import dump_session, load_session
+from sorcerer.journal import Journal, read_journal, replay_journal
+from sorcerer.lifecycle import SessionManager
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_manager(clock: Clock, **kwargs) -> SessionManager:
+    settings = {"idle_ttl": 10, "max_age": 100, "max_sessions": 2, "max_moves": 10, **kwargs}
+    return SessionManager(clock=clock, **settings)
+
+
+def test_admission() -> None:
+    sessions = make_manager(Clock())
+
+    assert sessions.admit("a")
+    assert sessions.admit("b")
+    assert not sessions.admit("c"), "Sessions past the cap are refused"
+    assert "c" not in sessions
+
+    sessions.remove("a")
+    assert sessions.admit("c")
+
+
+def test_expiry() -> None:
+    clock = Clock()
+    sessions = make_manager(clock, max_sessions=10)
+    sessions.admit("idle")
+    sessions.admit("busy")
+
+    for _ in range(20):
+        clock.now += 6
+        sessions.touch("busy")
+        if clock.now == 12:
+            assert sessions.expired() == ["idle"]
+
+    assert sessions.expired() == ["idle", "busy"], "Active sessions still expire when too old"
+
+
+def test_trim() -> None:
+    sessions = make_manager(Clock())
+    game = GameSession("****", seed=3)
+    for _ in range(25):
+        game.incr()
+
+    assert sessions.trim(game, archived=8) == 8, "Only archived moves are trimmed"
+    assert sessions.trim(game) == 12
+    assert (len(game.moves), game.moves_trimmed, game.move_count) == (5, 20, 25)
+
+    restored = load_session(dump_session(game))
+    assert restored.moves_trimmed == 20
+
+
+def test_trim_journaled(tmp_path: Path) -> None:
+    sessions = make_manager(Clock())
+    journal = Journal(tmp_path)
+    game = GameSession("****", seed=3)
+    games = {game.join_key: game}
+
+    game.create_new_player(is_leader=True)
+    game.create_new_player()
+    for _ in range(20):
+        game.incr()
+    asyncio.run(journal.sync(games))
+
+    assert sessions.trim(game, journal.journaled(game.join_key)) == 17
+    game.begin_game()
+    asyncio.run(journal.sync(games))
+
+    header, moves, _ = read_journal(journal.path(game.join_key))
+    replayed = replay_journal(header, moves)
+    assert replayed.move_count == game.move_count
+    assert replayed.to_dict()["monsters"] == game.to_dict()["monsters"], "Draws don't depend on trimming"
@@ -0,0 +1,22 @@
+from sorcerer.loadtest import Recorder, percentile
+
+
+def test_percentile() -> None:
+    samples = [float(value) for value in range(1, 101)]
+
+    assert percentile(samples, 50) == 50.0
+    assert percentile(samples, 99) == 99.0
+    assert percentile([], 50) == 0.0
+    assert percentile([3.0], 95) == 3.0
+
+
+def test_report() -> None:
+    recorder = Recorder()
+    recorder.record("state", 0.002)
+    recorder.errors["bet"] += 1
+    recorder.sent = 2
+
+    report = recorder.report(elapsed=1.0)
+
+    assert "state" in report
+    assert "bet" in report
@@ -0,0 +1,47 @@
+import io
+import json
+import logging
+
+import pytest
+
+from sorcerer.logs import Sampler, configure, parse_levels
+
+
+@pytest.fixture
+def restore_logging():
+    root = logging.getLogger()
+    handlers, level = root.handlers[:], root.level
+    yield
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    logging.getLogger("sorcerer.test").setLevel(logging.NOTSET)
+
+
+def test_json_queue(restore_logging) -> None:
+    stream = io.StringIO()
+    listener = configure("WARNING", {"sorcerer.test": "DEBUG"}, json_format=True, stream=stream)
+
+    logging.getLogger("sorcerer.test").debug("Player-%d joined", 1, extra={"join_key": "****"})
+    logging.getLogger("sorcerer.other").info("Not logged")
+    listener.stop()
+
+    lines = stream.getvalue().splitlines()
+    assert len(lines) == 1
+    record = json.loads(lines[0])
+    assert record["message"] == "Player-1 joined"
+    assert (record["level"], record["logger"], record["join_key"]) == ("DEBUG", "sorcerer.test", "****")
+
+
+def test_parse_levels() -> None:
+    assert parse_levels("sorcerer.server=debug, sorcerer.journal=WARNING") == {
+        "sorcerer.server": "DEBUG",
+        "sorcerer.journal": "WARNING",
+    }
+    assert parse_levels("") == {}
+    with pytest.raises(ValueError):
+        parse_levels("DEBUG")
+
+
+def test_sampler() -> None:
+    sample = Sampler(3)
+    assert [sample() for _ in range(7)] == [False, False, True, False, False, True, False]
@@ -0,0 +1,61 @@
+import asyncio
+import socket
+
+from sorcerer.metrics import Counter, Gauge, Histogram, Registry, serve_metrics
+
+
+def test_render() -> None:
+    registry = Registry()
+    messages = registry.register(Counter("messages_total", "Messages handled.", ("kind",)))
+    registry.register(Gauge("sessions", "Sessions running.", func=lambda: 3))
+    latency = registry.register(Histogram("latency_seconds", "Handling time.", buckets=(0.1, 1.0)))
+
+    assert isinstance(messages, Counter) and isinstance(latency, Histogram)
+    bet = messages.labels("bet")
+    assert messages.labels("bet") is bet, "Children are created once per label value"
+    bet.inc()
+    bet.inc(2)
+    for value in (0.05, 0.5, 2.5):
+        latency.observe(value)
+
+    assert registry.render().splitlines() == [
+        "# HELP messages_total Messages handled.",
+        "# TYPE messages_total counter",
+        'messages_total{kind="bet"} 3',
+        "# HELP sessions Sessions running.",
+        "# TYPE sessions gauge",
+        "sessions 3",
+        "# HELP latency_seconds Handling time.",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{le="0.1"} 1',
+        'latency_seconds_bucket{le="1"} 2',
+        'latency_seconds_bucket{le="+Inf"} 3',
+        "latency_seconds_sum 3.05",
+        "latency_seconds_count 3",
+    ]
+
+
+def test_serve_metrics() -> None:
+    registry = Registry()
+    counter = registry.register(Counter("scrapes_total", "Scrapes."))
+    assert isinstance(counter, Counter)
+    counter.inc()
+
+    with socket.socket() as sock:
+        sock.bind(("localhost", 0))
+        port = sock.getsockname()[1]
+
+    async def scrape() -> bytes:
+        server = asyncio.create_task(serve_metrics("localhost", port, registry))
+        await asyncio.sleep(0.05)
+        reader, writer = await asyncio.open_connection("localhost", port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nHost: localhost\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        server.cancel()
+        return response
+
+    response = asyncio.run(scrape())
+
+    assert response.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert response.endswith(b"\nscrapes_total 1\n")
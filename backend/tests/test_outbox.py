@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from sorcerer.outbox import Outbox
+
+
+class SlowSocket:
+    """
+    Websocket whose sends wait until the test lets them through.
+    """
+
+    remote_address = ("127.0.0.1", 0)
+
+    def __init__(self) -> None:
+        self.sent: list[str] = []
+        self.gate = asyncio.Event()
+        self.close_code: int | None = None
+
+    async def send(self, message: str) -> None:
+        await self.gate.wait()
+        self.sent.append(message)
+
+    async def close(self, code: int = 1000, reason: str = "") -> None:
+        self.close_code = code
+
+
+async def _drain() -> None:
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+
+def test_full_view_supersedes_views() -> None:
+    async def scenario() -> list[str]:
+        websocket = SlowSocket()
+        outbox = Outbox(websocket, size=4)  # type: ignore
+
+        outbox.put("view 1", view=True, full=True)
+        await _drain()  # The writer is now stuck sending view 1
+        outbox.put("patch 2", view=True)
+        outbox.put("joined")
+        outbox.put("view 3", view=True, full=True)
+
+        websocket.gate.set()
+        await _drain()
+        return websocket.sent
+
+    assert asyncio.run(scenario()) == ["view 1", "joined", "view 3"]
+
+
+@pytest.mark.parametrize("policy", ["disconnect", "drop"])
+def test_slow_client(policy: str) -> None:
+    async def scenario() -> tuple[SlowSocket, Outbox]:
+        websocket = SlowSocket()
+        outbox = Outbox(websocket, size=2, policy=policy)  # type: ignore
+        outbox.put("incr 0")
+        await _drain()  # The writer is now stuck sending incr 0
+        for index in range(1, 5):
+            outbox.put(f"incr {index}")
+        websocket.gate.set()
+        await _drain()
+        return websocket, outbox
+
+    websocket, outbox = asyncio.run(scenario())
+
+    if policy == "disconnect":
+        assert websocket.close_code == 1013
+        assert outbox.closed and not websocket.sent
+    else:
+        assert websocket.close_code is None
+        assert websocket.sent == ["incr 0", "incr 3", "incr 4"], "Oldest queued messages are dropped"
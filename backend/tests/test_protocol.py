@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+from sorcerer.game.interface import Target, TargetKind
+from sorcerer.protocol import MAX_COMMAND_SIZE, Action, Bet, Init, ProtocolError, State, decode
+
+
+def test_decode() -> None:
+    action = decode(json.dumps({"kind": "action", "card_id": 3, "target": {"kind": "monster", "target_id": "m"}}))
+
+    assert action == Action(card_id=3, target=Target(TargetKind.MONSTER, "m"))
+    assert decode(b'{"kind": "bet", "monster_ids": ["a", "b"]}') == Bet(monster_ids=("a", "b"))
+    assert decode('{"kind": "state"}') == State(resync=False), "Missing fields take their default"
+    assert decode('{"kind": "init", "join": "key", "extra": 1}') == Init(join="key")
+
+
+@pytest.mark.parametrize(
+    "message, code, field",
+    [
+        ("x" * (MAX_COMMAND_SIZE + 1), "too_large", None),
+        ("Hello world!", "malformed", None),
+        ('{"kind": ', "malformed", None),
+        ('{"kind": "nope"}', "unknown_kind", "kind"),
+        ('{"kind": "joined"}', "unknown_kind", "kind"),
+        ('{"kind": "bet"}', "invalid", "monster_ids"),
+        ('{"kind": "bet", "monster_ids": "a"}', "invalid", "monster_ids"),
+        ('{"kind": "action", "card_id": true, "target": {"kind": "monster"}}', "invalid", "card_id"),
+        ('{"kind": "action", "card_id": 1, "target": {"kind": "moon"}}', "invalid", "target.kind"),
+    ],
+)
+def test_reject(message: str, code: str, field: str | None) -> None:
+    with pytest.raises(ProtocolError) as info:
+        decode(message)
+
+    assert (info.value.code, info.value.field) == (code, field)
+    assert info.value.to_dict()["kind"] == "error"
@@ -0,0 +1,125 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+
+from sorcerer.game.effects import cast_spell, end_round
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.interface import Target, TargetKind
+from sorcerer.game.replay import ReplayError, replay
+from sorcerer.journal import Journal, read_journal, replay_journal
+
+
+@pytest.fixture(scope="function")
+def game_fight() -> GameSession:
+    game = GameSession(join_key="****", seed=0)
+
+    player_1 = game.create_new_player(is_leader=True)
+    player_2 = game.create_new_player()
+    game.incr()
+
+    game.begin_game()
+    game.place_player_bets(player_1.player_id, ["monster_succubus"])
+    game.place_player_bets(player_2.player_id, [game.monsters[0].monster_id])
+    game.begin_round(0)
+
+    for player in (player_1, player_2):
+        target = Target(TargetKind.MONSTER, game.monsters[1].monster_id)
+        cast_spell(game, player, player.cards[0].card_id, target)
+
+    end_round(game)
+    game.next_round()
+
+    return game
+
+
+def test_replay(game_fight: GameSession) -> None:
+    replayed = replay(game_fight.join_key, game_fight.moves, created_at=game_fight.created_at, seed=game_fight.seed)
+
+    assert replayed.moves == game_fight.moves
+    assert replayed.to_dict() == game_fight.to_dict()
+
+    # Both sessions continue with the same random choices
+    for game in (game_fight, replayed):
+        end_round(game)
+        game.next_round()
+    assert replayed.turn == game_fight.turn
+    assert replayed.moves == game_fight.moves
+
+
+def test_replay_without_seed(game_fight: GameSession) -> None:
+    replayed = replay(game_fight.join_key, game_fight.moves)
+
+    assert replayed.moves == game_fight.moves
+
+
+def test_replay_wrong_seed(game_fight: GameSession) -> None:
+    with pytest.raises(ReplayError):
+        replay(game_fight.join_key, game_fight.moves, seed=game_fight.seed + 1)
+
+
+def test_replay_error(game_fight: GameSession) -> None:
+    # Casting a card before the game has begun
+    cast = next(move for move in game_fight.moves if move.move_id == "cast")
+
+    with pytest.raises(ReplayError):
+        replay(game_fight.join_key, [cast])
+
+
+def test_journal(tmp_path: Path, game_fight: GameSession) -> None:
+    journal = Journal(tmp_path)
+    games = {game_fight.join_key: game_fight}
+
+    assert asyncio.run(journal.sync(games)) == len(game_fight.moves) + 1  # Header line
+    assert asyncio.run(journal.sync(games)) == 0
+
+    game_fight.incr()
+    assert asyncio.run(journal.sync(games)) == 1
+
+    restored = Journal(tmp_path).restore()
+    assert restored[game_fight.join_key].to_dict() == game_fight.to_dict()
+
+    # The game ended
+    asyncio.run(journal.sync({}))
+    _, moves, closed = read_journal(journal.path(game_fight.join_key))
+    assert closed
+    assert moves == game_fight.moves
+    assert Journal(tmp_path).restore() == {}
+
+
+def test_journal_partial_line(tmp_path: Path, game_fight: GameSession) -> None:
+    journal = Journal(tmp_path)
+    asyncio.run(journal.sync({game_fight.join_key: game_fight}))
+
+    path = journal.path(game_fight.join_key)
+    path.write_bytes(path.read_bytes() + b'{"move_id": "in')
+
+    header, moves, closed = read_journal(path)
+    assert not closed
+    assert replay_journal(header, moves).to_dict() == game_fight.to_dict()
+
+
+def test_journal_resume_after_partial_line(tmp_path: Path, game_fight: GameSession) -> None:
+    journal = Journal(tmp_path)
+    asyncio.run(journal.sync({game_fight.join_key: game_fight}))
+
+    path = journal.path(game_fight.join_key)
+    path.write_bytes(path.read_bytes() + b'{"move_id": "in')
+
+    # The server restarts, and the game goes on
+    journal = Journal(tmp_path)
+    game = journal.restore()[game_fight.join_key]
+    journal.resume(game)
+    game.incr()
+    asyncio.run(journal.sync({game.join_key: game}))
+
+    restored = Journal(tmp_path).restore()[game.join_key]
+    assert restored.to_dict() == game.to_dict(), "Moves made after the crash must not be lost"
+    assert restored.secret == game_fight.secret, "Players resume their seats with the same tokens"
+
+
+def test_journal_malformed_header(tmp_path: Path) -> None:
+    journal = Journal(tmp_path)
+    journal.path("****").write_bytes(b'{"journal": 1, "join_key": "****"}\n')
+
+    assert journal.restore() == {}, "Malformed journals are skipped"
@@ -0,0 +1,57 @@
+import json
+from dataclasses import asdict, fields, is_dataclass
+from typing import Any
+
+from sorcerer.game.cards import Card, Firebolt
+from sorcerer.game.game_session import GameSession, Phase
+from sorcerer.game.moves import Move
+from sorcerer.serialize import serializer, to_dict
+from sorcerer.util import asdict_factory
+
+
+def _reference(value: Any) -> Any:
+    # ``asdict`` can't see the card type fields shared through ``Card.card_type``
+    if isinstance(value, Card):
+        data = {"card_id": value.card_id, **asdict(value.card_type, dict_factory=asdict_factory)}
+        data["owner"] = value.owner
+        data["target"] = data.pop("target")
+        return json.loads(json.dumps(data))
+    if is_dataclass(value):
+        public = [spec.name for spec in fields(value) if spec.metadata.get("serialize") is not False]
+        return asdict_factory([(key, _reference(getattr(value, key))) for key in public])
+    if isinstance(value, (list, tuple)):
+        return [_reference(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _reference(item) for key, item in value.items()}
+    return asdict_factory([("value", value)])["value"]
+
+
+def test_matches_asdict() -> None:
+    game = GameSession("****", seed=1)
+    game.create_new_player(is_leader=True)
+    game.create_new_player()
+    game.begin_game()
+    game.monsters[0].cards.append(Firebolt(card_id=100, owner=0))
+    game.move("card_append", card_id=100, monster_id=game.monsters[0].monster_id)
+
+    for obj in [game, game.get_view(0, join_key=True), game.moves[0]]:
+        # Private fields, like lookup indexes, are not serialized
+        assert json.dumps(to_dict(obj)) == json.dumps(_reference(obj))
+
+
+def test_enums_and_containers() -> None:
+    game = GameSession("****")
+    data = game.to_dict()
+
+    assert data["phase"] == Phase.LOBBY.value
+    assert data["created_at"] == game.created_at.isoformat()
+    assert data["players"] is not game.players, "Containers must not be shared"
+
+
+def test_any_values() -> None:
+    move = Move("power_apply", Phase.FIGHT, card=Firebolt(card_id=1))
+    data = move.to_dict()
+
+    assert data["args"] == ["fight"]
+    assert data["kwargs"]["card"]["spell_id"] == "card_firebolt"
+    assert serializer(Move) is serializer(Move), "Serializers are compiled once"
@@ -0,0 +1,163 @@
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from websockets.client import connect
+from websockets.server import serve
+
+from sorcerer import advisor, server
+from sorcerer.game.game_session import MAX_ROUNDS
+from sorcerer.server import ServerConfig, parse_args
+from sorcerer.storage import SnapshotStore
+
+
+def test_parse_args() -> None:
+    config, _ = parse_args(["--port", "9000", "--compression", "none", "--ping-interval", "0"])
+
+    assert (config.port, config.compression) == (9000, "none")
+    options = config.serve_options()
+    assert options["compression"] is None
+    assert options["ping_interval"] is None, "0 disables pings"
+    assert options["max_size"] == ServerConfig().max_message_size
+
+
+def test_unknown_compression() -> None:
+    with pytest.raises(ValueError):
+        ServerConfig(compression="brotli").serve_options()
+
+
+async def recv(websocket, kind: str) -> dict:
+    """
+    Receive the next message of the given kind, skipping the others.
+    """
+    while True:
+        data = json.loads(await asyncio.wait_for(websocket.recv(), timeout=2))
+        if data["kind"] == kind:
+            return data
+
+
+def test_resume_after_restart(tmp_path: Path) -> None:
+    async def scenario() -> tuple[dict, dict, dict, dict]:
+        store = SnapshotStore(tmp_path)
+
+        async with serve(server.handle, "localhost", 0) as ws_server:
+            uri = f"ws://localhost:{list(ws_server.sockets)[0].getsockname()[1]}"
+            async with connect(uri) as leader, connect(uri) as player:
+                await leader.send(json.dumps({"kind": "init"}))
+                init = await recv(leader, "init")
+                await player.send(json.dumps({"kind": "init", "join": init["join"]}))
+                joined = await recv(player, "init")
+
+                await leader.send(json.dumps({"kind": "begin"}))
+                state = await recv(leader, "state")
+                before = await recv(player, "state")
+                monster_id = state["game"]["monsters"][0]["monster_id"]
+                for websocket in (leader, player):
+                    await websocket.send(json.dumps({"kind": "bet", "monster_ids": [monster_id]}))
+                    await recv(websocket, "bet")
+
+                await store.save(server.get_games())
+
+        # The server restarts, with the sessions it snapshotted
+        assert not server.STATE
+        assert server.restore(SnapshotStore(tmp_path), None) == 1
+
+        try:
+            async with serve(server.handle, "localhost", 0) as ws_server:
+                uri = f"ws://localhost:{list(ws_server.sockets)[0].getsockname()[1]}"
+                async with connect(uri) as leader, connect(uri) as player:
+                    await leader.send(json.dumps({"kind": "init", "join": init["join"], "resume": init["resume"]}))
+                    await player.send(json.dumps({"kind": "init", "join": init["join"], "resume": joined["resume"]}))
+                    resumed = await recv(player, "state")
+
+                    # The leader can still start the fight
+                    await leader.send(json.dumps({"kind": "next_round"}))
+                    next_round = await recv(player, "next_round")
+
+                    async with connect(uri) as stranger:
+                        await stranger.send(json.dumps({"kind": "init", "join": init["join"], "resume": "nope"}))
+                        refused = await recv(stranger, "error")
+        finally:
+            for join_key in list(server.STATE):
+                await server.close_session(join_key)
+
+        return before, resumed, next_round, refused
+
+    before, resumed, next_round, refused = asyncio.run(scenario())
+
+    assert resumed["game"]["player_id"] == 1
+    assert resumed["game"]["cards"] == before["game"]["cards"], "Players get their hand back"
+    assert resumed["game"]["monster_bets"] == [before["game"]["monsters"][0]["monster_id"]], "And their bets"
+    assert next_round["game"]["game_phase"] == "fight"
+    assert refused["message"] == "Unknown resume token"
+
+
+def test_next_round_after_last_round() -> None:
+    async def scenario() -> tuple[dict, str, int, dict, int]:
+        async with serve(server.handle, "localhost", 0) as ws_server:
+            uri = f"ws://localhost:{list(ws_server.sockets)[0].getsockname()[1]}"
+            async with connect(uri) as leader:
+                await leader.send(json.dumps({"kind": "init"}))
+                init = await recv(leader, "init")
+                await leader.send(json.dumps({"kind": "begin"}))
+                state = await recv(leader, "state")
+                monster_id = state["game"]["monsters"][0]["monster_id"]
+                await leader.send(json.dumps({"kind": "bet", "monster_ids": [monster_id]}))
+                await recv(leader, "bet")
+
+                # The fight begins, and every round but the last one is resolved and followed by the next.
+                for _ in range(MAX_ROUNDS):
+                    await leader.send(json.dumps({"kind": "next_round"}))
+                    await recv(leader, "next_round")
+
+                game, _ = server.STATE[init["join"]]
+                await leader.send(json.dumps({"kind": "next_round"}))
+                await recv(leader, "next_round")
+                last_move = game.moves[-1].to_dict()
+                phase = str(game.phase)
+
+                move_count = game.move_count
+                await leader.send(json.dumps({"kind": "next_round"}))
+                refused = await recv(leader, "error")
+                return last_move, phase, move_count, refused, game.move_count
+
+    last_move, phase, move_count, refused, after = asyncio.run(scenario())
+
+    assert last_move["move_id"] == "end_round", "The spells of the last round must be resolved"
+    assert last_move["kwargs"]["round"] == MAX_ROUNDS - 1
+    assert phase == "end"
+    assert refused["message"] == "The game is over"
+    assert after == move_count, "A refused next round must not change the game"
+
+
+def test_advice_once_per_move(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    def advise(view):
+        calls.append(view)
+        return advisor.Advice(samples=len(calls))
+
+    monkeypatch.setattr(advisor, "advise", advise)
+
+    async def scenario() -> list[dict]:
+        async with serve(server.handle, "localhost", 0) as ws_server:
+            uri = f"ws://localhost:{list(ws_server.sockets)[0].getsockname()[1]}"
+            async with connect(uri) as leader:
+                await leader.send(json.dumps({"kind": "init"}))
+                await recv(leader, "init")
+                await leader.send(json.dumps({"kind": "begin"}))
+                await recv(leader, "state")
+
+                replies = []
+                for kind in ("advice", "advice", "incr", "advice"):
+                    await leader.send(json.dumps({"kind": kind}))
+                    if kind == "advice":
+                        replies.append(await recv(leader, "advice"))
+                return replies
+
+    first, again, changed = asyncio.run(scenario())
+
+    assert len(calls) == 2, "Asking again before the game changes must not sample again"
+    assert first == again
+    assert changed["samples"] == 2
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import multiprocessing
+import socket
+
+import pytest
+from websockets.client import connect
+
+from sorcerer import server, shard
+from sorcerer.shard import Front, route_key, shard_for, take_over
+
+
+def test_shard_for_stable() -> None:
+    assert shard_for("qTzwT1eZ0EWioSQA", 4) == shard_for("qTzwT1eZ0EWioSQA", 4)
+    assert shard_for("qTzwT1eZ0EWioSQA", 1) == 0
+
+    # Keys are spread over all shards
+    shards = {shard_for(f"key-{index}", 4) for index in range(100)}
+    assert shards == {0, 1, 2, 3}
+
+
+def test_parse_args() -> None:
+    config, _, shards = shard.parse_args(["--shards", "3", "--port", "8000"])
+
+    assert shards == 3
+    assert config.port == 8000, "Other options are the server's"
+
+
+def test_route_key() -> None:
+    assert route_key(json.dumps({"kind": "init", "join": "abc"})) == "abc"
+    assert route_key(json.dumps({"kind": "init", "watch": "def"})) == "def"
+    assert route_key(json.dumps({"kind": "init"})) is None, "New games have no key yet"
+    assert route_key(json.dumps({"kind": "incr"})) is None
+    assert route_key("not json") is None
+
+
+def test_handoff(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(server, "SHARD_COUNT", 2)
+    handled: list[int] = []
+
+    async def scenario() -> tuple[str, dict, dict]:
+        pipes = [multiprocessing.Pipe(duplex=False) for _ in range(2)]
+        front = Front(server.ServerConfig(), [sender for _, sender in pipes])
+
+        def handler(index: int):
+            async def handle(websocket) -> None:
+                handled.append(index)
+                await server.handle(websocket)
+
+            return handle
+
+        # Both shards' workers run in this process, and share its games
+        workers = [
+            asyncio.create_task(take_over(receiver, handler(index), server.ServerConfig()))
+            for index, (receiver, _) in enumerate(pipes)
+        ]
+
+        with socket.create_server(("localhost", 0)) as listener:
+            serving = asyncio.create_task(front.serve(listener))
+            uri = f"ws://localhost:{listener.getsockname()[1]}"
+            try:
+                async with connect(uri) as leader, connect(uri) as player:
+                    await leader.send(json.dumps({"kind": "init"}))
+                    init = json.loads(await asyncio.wait_for(leader.recv(), timeout=2))
+
+                    await player.send(json.dumps({"kind": "init", "join": init["join"]}))
+                    joined = json.loads(await asyncio.wait_for(player.recv(), timeout=2))
+
+                    # The leader keeps playing on the worker it was handed over to
+                    await leader.send(json.dumps({"kind": "incr"}))
+                    incr = json.loads(await asyncio.wait_for(leader.recv(), timeout=2))
+                    while incr["kind"] != "incr":
+                        incr = json.loads(await asyncio.wait_for(leader.recv(), timeout=2))
+            finally:
+                serving.cancel()
+                for worker in workers:
+                    worker.cancel()
+
+        return init["join"], joined, incr
+
+    join_key, joined, incr = asyncio.run(scenario())
+
+    assert joined["kind"] == "init"
+    assert incr["count"] == 1
+    assert handled[1] == shard_for(join_key, 2), "Players are handed over to the shard that owns their game"
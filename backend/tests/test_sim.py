@@ -0,0 +1,28 @@
+from sorcerer.sim import RandomPolicy, SaboteurPolicy, play_game, run_batch
+
+
+def test_play_game_reproducible() -> None:
+    policies = [RandomPolicy(), SaboteurPolicy(), RandomPolicy()]
+
+    result_1 = play_game(42, policies)
+    result_2 = play_game(42, policies)
+
+    assert result_1 == result_2
+    assert result_1.winners, "A game must have a winner"
+    assert set(result_1.winners) <= set(result_1.monster_ids)
+
+
+def test_run_batch() -> None:
+    stats = run_batch(20, ["random", "saboteur"], seed=7, workers=1)
+
+    assert stats.games == 20
+    assert sum(stats.appearances.values()) == 20 * 5
+    assert all(0.0 <= rate <= 1.0 for rate in stats.win_rates().values())
+
+
+def test_run_batch_workers() -> None:
+    """Results must not depend on how games are spread over workers."""
+    serial = run_batch(20, ["random", "random"], seed=3, workers=1)
+    parallel = run_batch(20, ["random", "random"], seed=3, workers=2)
+
+    assert serial == parallel
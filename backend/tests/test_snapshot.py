@@ -0,0 +1,72 @@
+import pytest
+
+from sorcerer import encoding
+from sorcerer.game.effects import EffectContext, on_cast
+from sorcerer.game.game_session import GameSession
+from sorcerer.game.interface import Target, TargetKind
+from sorcerer.game.snapshot import SnapshotError, dump_session, load_session
+
+
+@pytest.fixture(scope="function")
+def game_fight() -> GameSession:
+    game = GameSession(join_key="****", seed=0, watch_key="watch")
+
+    player_1 = game.create_new_player(is_leader=True)
+    player_2 = game.create_new_player()
+
+    game.begin_game()
+    game.place_player_bets(player_1.player_id, ["monster_succubus"])
+    game.place_player_bets(player_2.player_id, ["monster_dragon"])
+    game.begin_round(0)
+
+    monster = game.monsters[0]
+    monster.health -= 3
+    target = Target(TargetKind.MONSTER, monster.monster_id)
+    on_cast(EffectContext(game, player_1.cards[0], target, monster, caster=player_1))
+
+    return game
+
+
+def test_roundtrip(game_fight: GameSession) -> None:
+    data = dump_session(game_fight)
+    restored = load_session(data)
+
+    assert restored == game_fight
+    assert restored.to_dict() == game_fight.to_dict()
+    assert dump_session(restored) == data
+
+
+def test_restored_indexes(game_fight: GameSession) -> None:
+    restored = load_session(dump_session(game_fight))
+
+    monster = restored.monsters[0]
+    assert restored.find_monster(monster.monster_id) is monster
+    assert restored.resolve_spell_card(monster.cards[0].card_id) is monster.cards[0]
+
+
+def test_compact(game_fight: GameSession) -> None:
+    assert len(dump_session(game_fight)) < len(str(game_fight.to_dict())) / 4
+
+
+def test_corrupt() -> None:
+    with pytest.raises(SnapshotError):
+        load_session(b"nope")
+
+    data = dump_session(GameSession("****"))
+    with pytest.raises(SnapshotError, match="version"):
+        load_session(data[:3] + b"\xff" + data[4:])
+
+    with pytest.raises(SnapshotError):
+        load_session(data[:-3])
+
+
+def test_corrupt_move() -> None:
+    game = GameSession("****")
+    game.incr()
+    data = dump_session(game)
+
+    # A move blob that is valid JSON, but not a list of arguments and keyword arguments
+    blob = encoding.dumps([[], {}])
+    assert blob in data
+    with pytest.raises(SnapshotError):
+        load_session(data.replace(blob, encoding.dumps([[], []])))
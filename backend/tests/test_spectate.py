@@ -0,0 +1,54 @@
+import asyncio
+import json
+
+from websockets.client import connect
+from websockets.server import serve
+
+from sorcerer import server
+
+
+async def _recv(websocket) -> dict:
+    return json.loads(await asyncio.wait_for(websocket.recv(), timeout=2))
+
+
+def test_watch() -> None:
+    async def scenario() -> list[dict]:
+        async with serve(server.handle, "localhost", 0) as ws_server:
+            port = list(ws_server.sockets)[0].getsockname()[1]
+            uri = f"ws://localhost:{port}"
+
+            async with connect(uri) as leader, connect(uri) as spectator:
+                await leader.send(json.dumps({"kind": "init"}))
+                init = await _recv(leader)
+
+                await spectator.send(json.dumps({"kind": "init", "watch": init["watch"]}))
+                views = [await _recv(spectator)]
+
+                # Changes made in one burst reach spectators as a single view
+                for _ in range(3):
+                    await leader.send(json.dumps({"kind": "incr"}))
+                for _ in range(3):
+                    await _recv(leader)
+                views.append(await _recv(spectator))
+
+            return views
+
+    first, latest = asyncio.run(scenario())
+
+    assert first["kind"] == "watch"
+    assert latest["version"] > first["version"]
+    assert latest["game"]["player_count"] == 1
+    assert latest["game"]["join_key"] is None, "Spectators must not be able to join"
+    assert latest["game"]["cards"] == []
+    assert not server.STATE and not server.FEEDS and not server.WATCH_KEYS, "Closed sessions are forgotten"
+
+
+def test_watch_unknown_game() -> None:
+    async def scenario() -> dict:
+        async with serve(server.handle, "localhost", 0) as ws_server:
+            port = list(ws_server.sockets)[0].getsockname()[1]
+            async with connect(f"ws://localhost:{port}") as spectator:
+                await spectator.send(json.dumps({"kind": "init", "watch": "nope"}))
+                return await _recv(spectator)
+
+    assert asyncio.run(scenario())["kind"] == "error"
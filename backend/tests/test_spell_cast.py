@@ -1,20 +1,27 @@
 """
 Integration tests for casting spells on entities.
 """
-import random
-
 import pytest
 
 from sorcerer.game.game_session import GameSession
-from sorcerer.game.interface import Target, TargetKind
-from sorcerer.game.cards import Firebolt
-from sorcerer.game.effects import EffectContext, on_cast, on_round_end
+from sorcerer.game.monsters import Demon, Skeleton
+from sorcerer.game.interface import Target, TargetKind, effect
+from sorcerer.game.cards import Card, CardType, Firebolt, Frostbolt, MagicMissile
+from sorcerer.game.effects import (
+    EffectContext,
+    Power,
+    card_effects,
+    compile_effects,
+    end_round,
+    on_cast,
+    on_round_end,
+)
+from sorcerer.game.errors import GameError
 
 
 @pytest.fixture(scope="function")
 def game_fight() -> GameSession:
-    random.seed("game_fight")
-    game = GameSession(join_key="****")
+    game = GameSession(join_key="****", seed=0)
 
     player_1 = game.create_new_player(is_leader=True)
     player_2 = game.create_new_player()
@@ -49,3 +56,53 @@ def test_direct_spell(game_fight: GameSession):
     on_round_end(context)
 
     assert demon.health == 4
+
+
+def test_card_effects_are_cached():
+    effects = card_effects(Firebolt(0))
+
+    assert effects == (Power(power=-5),)
+    assert card_effects(Firebolt(1)) is effects
+    assert card_effects(Frostbolt(2)) is not effects
+
+
+def test_unknown_card_effect():
+    class Broken(Card):
+        __slots__ = ()
+        card_type = CardType("card_broken", "direct", False, (effect("DoesNotExist"),), TargetKind.MONSTER)
+
+    with pytest.raises(GameError):
+        compile_effects(Broken)
+
+
+def test_end_round(game_fight: GameSession):
+    game_fight.monsters = [Demon(), Skeleton()]
+    game_fight.rebuild_indexes()
+    demon, skeleton = game_fight.monsters
+
+    game_fight.attach_card(Firebolt(100), demon)
+    game_fight.attach_card(Frostbolt(101), demon)
+    game_fight.attach_card(MagicMissile(102), skeleton)
+    move_count = len(game_fight.moves)
+
+    health = end_round(game_fight)
+
+    assert health == {"monster_demon": 9 - 5 - 4, "monster_skeleton": 3 + 4}, "Undead invert spell power"
+    assert not demon.cards and not skeleton.cards, "Direct spells are used up"
+    assert [card.card_id for card in game_fight.discarded_spells] == [100, 101, 102]
+    assert [move.move_id for move in game_fight.moves[move_count:]] == ["end_round"]
+
+
+def test_end_round_judgement(game_fight: GameSession):
+    demon = game_fight.find_monster("monster_demon")
+    assert demon is not None
+    assert game_fight.judge is not None and game_fight.judge.mana_limit == 12
+
+    # Moira tolerates direct spells, until there are too many on one monster
+    for card_id in range(100, 104):
+        game_fight.attach_card(Frostbolt(card_id), demon)
+
+    health = end_round(game_fight)
+
+    assert health["monster_demon"] == 9
+    assert not demon.cards
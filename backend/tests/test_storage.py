@@ -0,0 +1,30 @@
+import asyncio
+from pathlib import Path
+
+from sorcerer.game.game_session import GameSession
+from sorcerer.storage import SnapshotStore
+
+
+def test_save_and_load(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    games = {"key_1": GameSession("key_1"), "key_2": GameSession("key_2")}
+    games["key_1"].create_new_player(is_leader=True)
+
+    assert asyncio.run(store.save(games)) == 2
+    assert asyncio.run(store.save(games)) == 0, "Unchanged sessions must not be written again"
+
+    games["key_2"].create_new_player(is_leader=True)
+    del games["key_1"]
+    assert asyncio.run(store.save(games)) == 1
+    assert not store.path("key_1").exists()
+
+    restored = SnapshotStore(tmp_path).load()
+    assert list(restored) == ["key_2"]
+    assert restored["key_2"] == games["key_2"]
+
+
+def test_skip_corrupt(tmp_path: Path) -> None:
+    store = SnapshotStore(tmp_path)
+    store.path("broken").write_bytes(b"SRC\x01\xff")
+
+    assert store.load() == {}
@@ -0,0 +1,45 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from sorcerer import cli, sim, vecsim
+
+
+def test_same_fights_same_health() -> None:
+    """The vectorized engine must resolve recorded fights exactly like the object engine."""
+    policies = [sim.RandomPolicy(), sim.SaboteurPolicy(), sim.RandomPolicy()]
+    played = [sim.simulate(seed, policies) for seed in range(200)]
+
+    fights = vecsim.fights_from_sessions([game for game, _ in played])
+    health = vecsim.resolve(fights)
+    won = vecsim.winners(health)
+
+    for row, (game, result) in enumerate(played):
+        assert health[row].tolist() == [monster.health for monster in game.monsters]
+        assert [game.monsters[index].monster_id for index in np.flatnonzero(won[row])] == result.winners
+
+
+def test_same_seeds_same_games() -> None:
+    """The vectorized engine must play the same games as the object engine, seed for seed."""
+    policy_names = ["random", "saboteur", "random"]
+    seeds = [sim.game_seed(1, index) for index in range(200)]
+    policies = [sim.POLICIES[name]() for name in policy_names]
+
+    health = vecsim.play(vecsim.deal(seeds, policy_names))
+
+    for row, seed in enumerate(seeds):
+        game, _ = sim.simulate(seed, policies)
+        assert health[row].tolist() == [monster.health for monster in game.monsters]
+
+
+def test_run_batch() -> None:
+    stats = vecsim.run_batch(300, ["saboteur", "random", "saboteur", "random"], seed=2)
+    expected = sim.run_batch(300, ["saboteur", "random", "saboteur", "random"], seed=2, workers=1)
+
+    assert stats == expected
+
+
+@pytest.mark.parametrize("options", [["-w", "2"], ["-p", "advisor", "random"]])
+def test_cli_rejects_unsupported_options(options: list[str]) -> None:
+    with pytest.raises(SystemExit):
+        cli.parse_args(["sim", "-e", "vector", *options])
@@ -11,9 +11,144 @@ export enum WebsocketAction {
 
 export type NextCallback = (next: any) => void
 
+// Encoding of the messages the server sends, asked for in the init message.
+// Text frames are always JSON, binary frames are always MessagePack.
+export type Codec = "json" | "msgpack"
+
+// Values the server sends as indexes with the msgpack codec, per field name.
+export type CodecTables = Record<string, string[]>
+
+// Minimal MessagePack decoder, for the types the server sends:
+// nil, booleans, integers, floats, strings, arrays and maps.
+export function decodeMessagePack(buffer: ArrayBuffer): unknown {
+  const bytes = new Uint8Array(buffer)
+  const view = new DataView(buffer)
+  const text = new TextDecoder()
+  let offset = 0
+
+  // Skip over the next bytes, and return where they start
+  const take = (size: number) => {
+    const start = offset
+    offset += size
+    return start
+  }
+
+  const str = (length: number) => text.decode(bytes.subarray(take(length), offset))
+
+  const array = (length: number) => {
+    const value: unknown[] = []
+    for (let index = 0; index < length; index++) {
+      value.push(read())
+    }
+    return value
+  }
+
+  const map = (length: number) => {
+    const value: Record<string, unknown> = {}
+    for (let index = 0; index < length; index++) {
+      const key = read() as string
+      value[key] = read()
+    }
+    return value
+  }
+
+  const read = (): unknown => {
+    const type = bytes[take(1)]
+    if (type <= 0x7f) return type
+    if (type <= 0x8f) return map(type & 0x0f)
+    if (type <= 0x9f) return array(type & 0x0f)
+    if (type <= 0xbf) return str(type & 0x1f)
+    if (type >= 0xe0) return type - 0x100
+
+    switch (type) {
+      case 0xc0:
+        return null
+      case 0xc2:
+        return false
+      case 0xc3:
+        return true
+      case 0xca:
+        return view.getFloat32(take(4))
+      case 0xcb:
+        return view.getFloat64(take(8))
+      case 0xcc:
+        return view.getUint8(take(1))
+      case 0xcd:
+        return view.getUint16(take(2))
+      case 0xce:
+        return view.getUint32(take(4))
+      case 0xcf:
+        return Number(view.getBigUint64(take(8)))
+      case 0xd0:
+        return view.getInt8(take(1))
+      case 0xd1:
+        return view.getInt16(take(2))
+      case 0xd2:
+        return view.getInt32(take(4))
+      case 0xd3:
+        return Number(view.getBigInt64(take(8)))
+      case 0xd9:
+        return str(view.getUint8(take(1)))
+      case 0xda:
+        return str(view.getUint16(take(2)))
+      case 0xdb:
+        return str(view.getUint32(take(4)))
+      case 0xdc:
+        return array(view.getUint16(take(2)))
+      case 0xdd:
+        return array(view.getUint32(take(4)))
+      case 0xde:
+        return map(view.getUint16(take(2)))
+      case 0xdf:
+        return map(view.getUint32(take(4)))
+      default:
+        throw new Error(`Unsupported MessagePack type: 0x${type.toString(16)}`)
+    }
+  }
+
+  return read()
+}
+
+// Replace the indexes of compact values with the values from the tables, at any depth.
+export function expandMessage(value: unknown, tables: CodecTables, key?: string): unknown {
+  const table = key === undefined ? undefined : tables[key]
+
+  if (Array.isArray(value)) {
+    return value.map((item) =>
+      table === undefined ? expandMessage(item, tables) : typeof item === "number" ? table[item] ?? item : item,
+    )
+  }
+  if (value !== null && typeof value === "object") {
+    return Object.fromEntries(Object.entries(value).map(([name, item]) => [name, expandMessage(item, tables, name)]))
+  }
+  if (table !== undefined && typeof value === "number") {
+    return table[value] ?? value
+  }
+  return value
+}
+
+// Decode the messages of one connection, whatever their codec.
+// The msgpack codec sends its tables first, in a "codec" message that isn't itself compacted.
+export function createDeserializer(): (event: MessageEvent) => unknown {
+  let tables: CodecTables = {}
+
+  return (event: MessageEvent) => {
+    if (typeof event.data === "string") {
+      return JSON.parse(event.data)
+    }
+
+    const msg = decodeMessagePack(event.data) as any
+    if (msg?.kind === "codec") {
+      tables = msg.tables
+      return msg
+    }
+    return expandMessage(msg, tables)
+  }
+}
+
 export function connect(address: string, next?: NextCallback): WebSocketSubject<unknown> {
   console.log(`websocket connect: ${address}`)
-  const subject = webSocket(address)
+  const subject = webSocket({ url: address, binaryType: "arraybuffer", deserializer: createDeserializer() })
 
   subject.subscribe({
     next: (msg) => {
@@ -77,11 +212,13 @@ export function apiMiddleware() {
 
 export interface CreateApiOptions {
   baseUrl: string
+  codec?: Codec
 }
 
 export interface Api {
   middleware: any
   connect: () => void
+  init: (join?: string, resume?: string) => void
   getSubject: () => WebSocketSubject<unknown> | undefined
   connectSubject: BehaviorSubject<WebSocketSubject<unknown>>
 }
@@ -93,7 +230,7 @@ export function createApi(options: CreateApiOptions): Api {
   const handler = (msg: any) => {}
 
   const connect = () => {
-    subject = webSocket(options.baseUrl)
+    subject = webSocket({ url: options.baseUrl, binaryType: "arraybuffer", deserializer: createDeserializer() })
 
     subject.subscribe({
       next: (msg) => {
@@ -111,6 +248,12 @@ export function createApi(options: CreateApiOptions): Api {
     connectSubject.next(subject)
   }
 
+  // Start a game, or join one, asking for the configured codec.
+  // Players take their seat again with the resume token of their last init reply.
+  const init = (join?: string, resume?: string) => {
+    subject?.next({ kind: "init", join, resume, codec: options.codec ?? "json" })
+  }
+
   const middleware = (store) => {
     // Redux store is ready...
 
@@ -135,6 +278,7 @@ export function createApi(options: CreateApiOptions): Api {
   return {
     middleware,
     connect,
+    init,
     getSubject: () => subject,
     connectSubject,
   }
@@ -1,7 +1,6 @@
 from contextlib import contextmanager
 from enum import Enum
 from argparse import ArgumentParser
-import subprocess
 import os, sys
 from pathlib import Path
 
@@ -18,7 +17,7 @@ class Cmd(Enum):
 
 @contextmanager
 def chdir(file_path):
-    olddir = os.curdir
+    olddir = os.getcwd()
     try:
         os.chdir(file_path)
         yield os.curdir
@@ -26,29 +25,34 @@ def chdir(file_path):
         os.chdir(olddir)
 
 
-def serve():
-    backend_path = Path(__file__).parent / BACKEND
-    python_path = sys.executable
+def serve(server_args):
+    backend_path = Path(__file__).resolve().parent / BACKEND
+    sys.path.insert(0, str(backend_path))
+
+    from sorcerer import server
+
     with chdir(backend_path):
-        server_path = backend_path / "sorcerer" / "server.py"
-        exit_code = subprocess.call([python_path, server_path])
-        exit(exit_code)
+        server.run(server_args)
 
 
 def parse_args():
     parser = ArgumentParser()
     subparsers = parser.add_subparsers(dest="cmd")
 
-    serve_cmd = subparsers.add_parser("serve")
+    subparsers.add_parser("serve", help="Run the game server. Other arguments are passed to it")
 
-    return parser, parser.parse_args()
+    # Unknown arguments are the server's own options
+    args, extra_args = parser.parse_known_args()
+    if extra_args and args.cmd != Cmd.SERVE.value:
+        parser.error(f"unrecognized arguments: {' '.join(extra_args)}")
+    return parser, args, extra_args
 
 
 def main():
-    parser, args = parse_args()
+    parser, args, extra_args = parse_args()
 
     if args.cmd == Cmd.SERVE.value:
-        serve()
+        serve(extra_args)
     else:
         parser.print_help()
 